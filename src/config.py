@@ -1,5 +1,5 @@
 import secrets
-from typing import List
+from typing import Dict, List
 import dotenv
 import os
 dotenv.load_dotenv("secrets.env")
@@ -15,3 +15,44 @@ _allowed_users_str = os.getenv("ALLOWED_USERS", "")
 ALLOWED_USERS: List[str] = [
     email.strip() for email in _allowed_users_str.split(",") if email.strip()
 ]
+
+# --- DATABASE (SQLite engine profile) ---
+# "production": WAL + tuned pragmas (recommended). "default": SQLite's stock behaviour.
+DB_PROFILE = os.getenv("DB_PROFILE", "production").strip().lower()
+
+_DB_PROFILES = {
+    "production": {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "busy_timeout": "15000",        # ms to wait on a locked DB before raising
+        "cache_size": "-65536",         # negative = KiB (64 MiB page cache per connection)
+        "mmap_size": "268435456",       # 256 MiB memory-mapped I/O
+        "temp_store": "MEMORY",
+        "foreign_keys": "ON",
+    },
+    "default": {},
+}
+if DB_PROFILE not in _DB_PROFILES:
+    raise ValueError(f"Unknown DB_PROFILE '{DB_PROFILE}'. Expected one of: {list(_DB_PROFILES)}")
+
+# Any single pragma can be overridden, e.g. DB_SYNCHRONOUS=FULL, DB_BUSY_TIMEOUT=30000
+DB_PRAGMAS: Dict[str, str] = dict(_DB_PROFILES[DB_PROFILE])
+for _pragma in ("journal_mode", "synchronous", "busy_timeout", "cache_size", "mmap_size", "temp_store", "foreign_keys"):
+    _override = os.getenv(f"DB_{_pragma.upper()}")
+    if _override:
+        DB_PRAGMAS[_pragma] = _override.strip()
+
+# Connection pool: "queue" keeps connections (and their pragmas) warm; "null" opens one per checkout.
+DB_POOL_CLASS = os.getenv("DB_POOL_CLASS", "queue").strip().lower()
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+DB_POOL_TIMEOUT = int(os.getenv("DB_POOL_TIMEOUT", "30"))
+
+# Startup EXPLAIN QUERY PLAN check of the hot queries (warns about full table scans)
+DB_AUDIT_QUERY_PLANS = os.getenv("DB_AUDIT_QUERY_PLANS", "1").strip().lower() in ("1", "true", "yes")
+
+# Opt-in SQL instrumentation (statement counts, timings and N+1 detection per page/service call)
+DB_PROFILE_SQL = os.getenv("DB_PROFILE_SQL", "0").strip().lower() in ("1", "true", "yes")
+SQL_PROFILE_MAX_STATEMENTS = int(os.getenv("SQL_PROFILE_MAX_STATEMENTS", "25"))   # Per scope
+SQL_PROFILE_REPEAT_THRESHOLD = int(os.getenv("SQL_PROFILE_REPEAT_THRESHOLD", "5")) # Same shape N times = N+1
+SQL_PROFILE_SLOW_MS = int(os.getenv("SQL_PROFILE_SLOW_MS", "200"))                 # Per scope total
@@ -0,0 +1,91 @@
+# src/core/bitmap_index.py
+import re
+from array import array
+from bisect import bisect_right
+from typing import Dict, Hashable, Iterable, Iterator, List, Optional, Tuple
+
+# Runs of set bits in a (reversed) binary string
+_ONES_RE = re.compile(r"1+")
+
+def _to_bits(positions: Iterable[int], size: int) -> int:
+    """Bitset from positions, built in a bytearray (OR-ing growing ints per card is quadratic)."""
+    buffer = bytearray((size + 7) // 8)
+    for position in positions:
+        buffer[position >> 3] |= 1 << (position & 7)
+    return int.from_bytes(buffer, "little")
+
+class DeckBitmapIndex:
+    """
+    Filter index of one deck: cards get a position (ascending card ID) and every tag and
+    difficulty level keeps a bitset of positions (a Python int, so AND/OR run in C).
+    A filter combination resolves with a few bitwise operations; matching IDs come out
+    as runs of consecutive IDs, ready for CompactQueue.from_runs.
+    """
+    __slots__ = ("stamp", "card_ids", "_breaks", "by_difficulty", "by_tag")
+
+    def __init__(self, stamp: Hashable, cards: Iterable[Tuple[int, int]], links: Iterable[Tuple[int, int]]):
+        """
+        stamp: Version of the deck the index was built from (compared on every lookup).
+        cards: (card_id, base_difficulty) rows. links: (card_id, tag_id) rows.
+        """
+        self.stamp = stamp
+        self.card_ids = array("q")
+
+        position_of: Dict[int, int] = {}
+        difficulty_positions: Dict[int, List[int]] = {}
+        for position, (card_id, difficulty) in enumerate(sorted(cards)):
+            self.card_ids.append(card_id)
+            position_of[card_id] = position
+            difficulty_positions.setdefault(difficulty, []).append(position)
+
+        tag_positions: Dict[int, List[int]] = {}
+        for card_id, tag_id in links:
+            position = position_of.get(card_id)
+            if position is not None:
+                tag_positions.setdefault(tag_id, []).append(position)
+
+        size = len(self.card_ids)
+        self.by_difficulty = {d: _to_bits(positions, size) for d, positions in difficulty_positions.items()}
+        self.by_tag = {t: _to_bits(positions, size) for t, positions in tag_positions.items()}
+
+        # Positions where the next card ID is not previous + 1 (a bulk-imported deck has none)
+        ids = self.card_ids
+        self._breaks: List[int] = [p for p in range(1, len(ids)) if ids[p] != ids[p - 1] + 1]
+
+    def __len__(self) -> int:
+        return len(self.card_ids)
+
+    def match(self, difficulty_range: Tuple[int, int], tag_ids: Optional[List[int]] = None) -> int:
+        """
+        Bitset of the cards with a difficulty inside the range AND (if tags are given)
+        at least one of the tags: same semantics as the SQL candidate query.
+        """
+        min_diff, max_diff = difficulty_range
+        bits = 0
+        for difficulty, difficulty_bits in self.by_difficulty.items():
+            if min_diff <= difficulty <= max_diff:
+                bits |= difficulty_bits
+
+        if tag_ids:
+            tag_bits = 0
+            for tag_id in tag_ids:
+                tag_bits |= self.by_tag.get(tag_id, 0)
+            bits &= tag_bits
+        return bits
+
+    def count(self, difficulty_range: Tuple[int, int], tag_ids: Optional[List[int]] = None) -> int:
+        return self.match(difficulty_range, tag_ids).bit_count()
+
+    def id_runs(self, bits: int) -> Iterator[Tuple[int, int]]:
+        """Matching cards as ascending (first_id, length) runs of consecutive IDs."""
+        ids, breaks = self.card_ids, self._breaks
+        # Reversed binary string: character i is the bit of position i
+        for match in _ONES_RE.finditer(bin(bits)[:1:-1]):
+            start, end = match.span()
+            # Split the position run wherever the IDs are not consecutive
+            i = bisect_right(breaks, start)
+            while i < len(breaks) and breaks[i] < end:
+                yield ids[start], breaks[i] - start
+                start = breaks[i]
+                i += 1
+            yield ids[start], end - start
@@ -0,0 +1,161 @@
+# src/core/compact_queue.py
+from array import array
+from bisect import bisect_right
+from typing import Iterable, List, Optional, Tuple, Union
+
+# --- CONSTANTS ---
+FEISTEL_ROUNDS = 6
+MIN_HALF_BITS = 4       # Tiny domains shuffle poorly: walk a 256-slot domain at least
+_MASK64 = (1 << 64) - 1
+
+def _mix(value: int, key: int) -> int:
+    """SplitMix64-style integer hash (stable across processes, unlike hash())."""
+    x = ((value ^ key) * 0x9E3779B97F4A7C15) & _MASK64
+    x ^= x >> 30
+    x = (x * 0xBF58476D1CE4E5B9) & _MASK64
+    x ^= x >> 27
+    x = (x * 0x94D049BB133111EB) & _MASK64
+    return x ^ (x >> 31)
+
+def permute_index(index: int, size: int, seed: int) -> int:
+    """
+    Seeded bijection on [0, size): position -> shuffled position, without materializing
+    the permutation. A small Feistel network over the next even power of two, cycle-walking
+    until the result falls inside the range (expected < 4 walks for sizes above 256).
+    """
+    if size <= 1:
+        return index
+    half = max(((size - 1).bit_length() + 1) // 2, MIN_HALF_BITS)
+    mask = (1 << half) - 1
+
+    # Independent round keys (seed + r would make neighbouring seeds share rounds)
+    round_keys = [_mix(seed, r) for r in range(FEISTEL_ROUNDS)]
+
+    x = index
+    while True:
+        left, right = x >> half, x & mask
+        for round_key in round_keys:
+            left, right = right, left ^ (_mix(right, round_key) & mask)
+        x = (left << half) | right
+        if x < size:
+            return x
+
+class CompactQueue:
+    """
+    Study queue stored as:
+    - the sorted candidate IDs, range-compressed into runs of consecutive IDs
+      (a bulk-imported deck is one run however many cards it has),
+    - an optional PRNG seed: position i maps to candidate permute_index(i) on demand,
+    - a small tail of requeued misses, served after the base set.
+    Behaves like a read-only list for len() / indexing / slicing, plus append() for the tail.
+    """
+    __slots__ = ("_starts", "_offsets", "size", "seed", "tail")
+
+    def __init__(self, starts: array, offsets: array, seed: Optional[int] = None, tail: Optional[List[int]] = None):
+        self._starts = starts        # First ID of every run
+        self._offsets = offsets      # Cumulative run lengths (offsets[-1] == size)
+        self.size = offsets[-1] if offsets else 0
+        self.seed = seed
+        self.tail: List[int] = tail if tail is not None else []
+
+    @classmethod
+    def from_ids(cls, card_ids: Iterable[int], seed: Optional[int] = None) -> "CompactQueue":
+        """card_ids: Candidate set (any order, duplicates ignored). seed: None keeps ascending order."""
+        starts, offsets = array("q"), array("q")
+        previous = None
+        count = 0
+        for card_id in sorted(set(card_ids)):
+            if previous is None or card_id != previous + 1:
+                if previous is not None:
+                    offsets.append(count)
+                starts.append(card_id)
+            previous = card_id
+            count += 1
+        if previous is not None:
+            offsets.append(count)
+        return cls(starts, offsets, seed)
+
+    @classmethod
+    def from_runs(cls, runs: Iterable[Tuple[int, int]], seed: Optional[int] = None) -> "CompactQueue":
+        """runs: Ascending, non-overlapping (first_id, length) pairs; touching runs are merged."""
+        starts, offsets = array("q"), array("q")
+        previous_end = None
+        count = 0
+        for start, length in runs:
+            if not length:
+                continue
+            if start == previous_end:
+                offsets[-1] += length
+            else:
+                starts.append(start)
+                offsets.append(count + length)
+            count += length
+            previous_end = start + length
+        return cls(starts, offsets, seed)
+
+    # --- LIST BEHAVIOUR ---
+
+    def __len__(self) -> int:
+        return self.size + len(self.tail)
+
+    def __getitem__(self, position: Union[int, slice]) -> Union[int, List[int]]:
+        if isinstance(position, slice):
+            return [self._at(i) for i in range(*position.indices(len(self)))]
+        if position < 0:
+            position += len(self)
+        if not 0 <= position < len(self):
+            raise IndexError("CompactQueue index out of range")
+        return self._at(position)
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self._at(i)
+
+    def append(self, card_id: int):
+        """Requeues a card at the end (missed cards)."""
+        self.tail.append(card_id)
+
+    def _at(self, position: int) -> int:
+        if position >= self.size:
+            return self.tail[position - self.size]
+        if self.seed is not None:
+            position = permute_index(position, self.size, self.seed)
+        run = bisect_right(self._offsets, position)
+        run_offset = self._offsets[run - 1] if run else 0
+        return self._starts[run] + (position - run_offset)
+
+    # --- SERIALIZATION ---
+
+    def to_dict(self) -> dict:
+        """
+        Compact JSON-able form: runs as flat [gap, length, gap, length, ...] deltas
+        (gap = distance from the end of the previous run).
+        """
+        runs = []
+        previous_end = 0
+        previous_offset = 0
+        for start, offset in zip(self._starts, self._offsets):
+            length = offset - previous_offset
+            runs.extend((start - previous_end, length))
+            previous_end = start + length
+            previous_offset = offset
+        return {"runs": runs, "seed": self.seed, "tail": self.tail}
+
+    @classmethod
+    def from_dict(cls, data: Union[dict, list]) -> "CompactQueue":
+        """Inverse of `to_dict`. A plain list (pre-compact sessions) is kept as an explicit tail."""
+        if isinstance(data, list):
+            return cls(array("q"), array("q"), tail=list(data))
+
+        starts, offsets = array("q"), array("q")
+        runs = data["runs"]
+        previous_end = 0
+        count = 0
+        for i in range(0, len(runs), 2):
+            start = previous_end + runs[i]
+            length = runs[i + 1]
+            starts.append(start)
+            count += length
+            offsets.append(count)
+            previous_end = start + length
+        return cls(starts, offsets, data.get("seed"), list(data.get("tail", [])))
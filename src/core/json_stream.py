@@ -0,0 +1,179 @@
+# src/core/json_stream.py
+import codecs
+import json
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+# Safety valve: if a single pending value grows beyond this without decoding,
+# the file is treated as malformed instead of buffering it forever.
+MAX_PENDING_CHARS = 4 * 1024 * 1024
+
+_WHITESPACE = " \t\n\r"
+
+class JSONStreamError(ValueError):
+    """Raised when the streamed document is not valid JSON (or not the expected shape)."""
+    pass
+
+class ObjectArrayStreamParser:
+    """
+    Incremental parser for a root JSON object in which ONE key holds a (potentially huge) array.
+
+    Usage:
+        parser = ObjectArrayStreamParser("cards")
+        for chunk in chunks:
+            for item in parser.feed(chunk): ...
+        for item in parser.close(): ...
+        parser.header  # Every other root field, fully decoded.
+
+    Array items are returned as soon as they are complete, so memory is bounded by
+    one item plus one read chunk, regardless of the array length.
+    """
+
+    def __init__(self, array_key: str):
+        self.array_key = array_key
+        self.header: Dict[str, Any] = {}
+        self.array_seen: bool = False
+        self.done: bool = False
+
+        self._decoder = json.JSONDecoder()
+        self._text_decoder = codecs.getincrementaldecoder("utf-8-sig")()
+        self._buf = ""
+        self._pos = 0
+        self._state = "start"
+        self._key: Optional[str] = None
+
+    # --- PUBLIC API ---
+
+    def feed(self, data: bytes) -> List[Any]:
+        """Consumes a chunk of raw bytes. Returns the array items completed by it."""
+        self._append(self._text_decoder.decode(data))
+        return list(self._drain(eof=False))
+
+    def close(self) -> List[Any]:
+        """Signals end of input. Returns any remaining items and validates completeness."""
+        self._append(self._text_decoder.decode(b"", final=True))
+        items = list(self._drain(eof=True))
+        if not self.done:
+            raise JSONStreamError("Unexpected end of JSON file.")
+        return items
+
+    # --- INTERNALS ---
+
+    def _append(self, text: str):
+        # Drop the consumed prefix so the buffer only holds unparsed text
+        self._buf = self._buf[self._pos:] + text
+        self._pos = 0
+
+    def _skip_whitespace(self) -> bool:
+        """Advances past whitespace. Returns True if a significant char is available."""
+        buf, pos = self._buf, self._pos
+        while pos < len(buf) and buf[pos] in _WHITESPACE:
+            pos += 1
+        self._pos = pos
+        return pos < len(buf)
+
+    def _decode_value(self, eof: bool) -> Tuple[bool, Any]:
+        """
+        Tries to decode one complete JSON value at the cursor.
+        Returns (False, None) when more input is needed.
+        """
+        try:
+            value, end = self._decoder.raw_decode(self._buf, self._pos)
+        except json.JSONDecodeError as e:
+            if eof or len(self._buf) - self._pos > MAX_PENDING_CHARS:
+                raise JSONStreamError(f"Invalid JSON file format: {e.msg}.")
+            return False, None
+
+        # A value touching the end of the buffer may be truncated (e.g. the number '12' of '123').
+        # Every value in a valid document is followed by a delimiter, so wait for it.
+        if not eof:
+            probe = end
+            while probe < len(self._buf) and self._buf[probe] in _WHITESPACE:
+                probe += 1
+            if probe >= len(self._buf):
+                return False, None
+
+        self._pos = end
+        return True, value
+
+    def _expect(self, char: str, expected: str):
+        raise JSONStreamError(f"Invalid JSON file format: expected {expected}, found '{char}'.")
+
+    def _drain(self, eof: bool) -> Iterator[Any]:
+        while self._skip_whitespace():
+            char = self._buf[self._pos]
+            state = self._state
+
+            if state == "start":
+                if char != "{":
+                    self._expect(char, "a JSON object")
+                self._pos += 1
+                self._state = "first_key"
+
+            elif state in ("first_key", "key"):
+                if char == "}" and state == "first_key":
+                    self._pos += 1
+                    self._finish()
+                    continue
+                if char != '"':
+                    self._expect(char, "a field name")
+                ok, key = self._decode_value(eof)
+                if not ok:
+                    return
+                self._key = key
+                self._state = "colon"
+
+            elif state == "colon":
+                if char != ":":
+                    self._expect(char, "':'")
+                self._pos += 1
+                self._state = "array_open" if self._key == self.array_key else "value"
+
+            elif state == "value":
+                ok, value = self._decode_value(eof)
+                if not ok:
+                    return
+                self.header[self._key] = value
+                self._state = "after_value"
+
+            elif state == "array_open":
+                if char != "[":
+                    raise JSONStreamError(f"Field '{self.array_key}' must be an array.")
+                self._pos += 1
+                self.array_seen = True
+                self._state = "first_item"
+
+            elif state in ("first_item", "item"):
+                if char == "]" and state == "first_item":
+                    self._pos += 1
+                    self._state = "after_value"
+                    continue
+                ok, item = self._decode_value(eof)
+                if not ok:
+                    return
+                self._state = "after_item"
+                yield item
+
+            elif state == "after_item":
+                if char == ",":
+                    self._state = "item"
+                elif char == "]":
+                    self._state = "after_value"
+                else:
+                    self._expect(char, "',' or ']'")
+                self._pos += 1
+
+            elif state == "after_value":
+                if char == ",":
+                    self._state = "key"
+                elif char == "}":
+                    self._finish()
+                else:
+                    self._expect(char, "',' or '}'")
+                self._pos += 1
+
+            else:  # "end"
+                raise JSONStreamError("Invalid JSON file format: unexpected data after the root object.")
+
+    def _finish(self):
+        self._state = "end"
+        self.done = True
@@ -0,0 +1,158 @@
+# src/core/pagination.py
+import base64
+import json
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, Hashable, List, Optional, Sequence, Tuple
+from sqlalchemy import tuple_
+from src.core.log_manager import logger
+
+# --- CONSTANTS ---
+CURSOR_NEXT = "n"               # Rows after the cursor (older)
+CURSOR_PREV = "p"               # Rows before the cursor (newer)
+TOTALS_TTL_SECONDS = 60         # How long a cached COUNT(*) may be served
+
+class InvalidCursorError(ValueError):
+    """Raised when a cursor can't be decoded (tampered, truncated or from another listing)."""
+    pass
+
+# --- OPAQUE CURSORS ---
+
+def _encode_value(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return {"dt": value.isoformat()}
+    return value
+
+def _decode_value(value: Any) -> Any:
+    if isinstance(value, dict) and "dt" in value:
+        return datetime.fromisoformat(value["dt"])
+    return value
+
+def encode_cursor(values: Sequence[Any], direction: str) -> str:
+    """
+    Packs the sort-key values of a boundary row into a URL-safe token.
+    Opaque to the UI: only the service that issued it knows what the values mean.
+    """
+    payload = json.dumps([direction, [_encode_value(v) for v in values]], separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii").rstrip("=")
+
+def decode_cursor(cursor: str, key_length: int) -> Tuple[List[Any], str]:
+    """
+    Inverse of `encode_cursor`.
+    Returns: (sort-key values, direction).
+    Raises: InvalidCursorError.
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        direction, values = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        values = [_decode_value(v) for v in values]
+    except Exception as e:
+        raise InvalidCursorError(f"Malformed cursor: {e}")
+
+    if direction not in (CURSOR_NEXT, CURSOR_PREV) or len(values) != key_length:
+        raise InvalidCursorError("Cursor does not match this listing.")
+    return values, direction
+
+def read_cursor(cursor: Optional[str], key_length: int) -> Optional[Tuple[List[Any], str]]:
+    """
+    Lenient `decode_cursor` for request handlers: a bad cursor falls back to the first page.
+    Returns: Decoded cursor, or None for the first page.
+    """
+    if not cursor:
+        return None
+    try:
+        return decode_cursor(cursor, key_length)
+    except InvalidCursorError as e:
+        logger.warning(f"Ignoring pagination cursor: {e}")
+        return None
+
+# --- KEYSET QUERIES ---
+
+def apply_keyset(statement, sort_keys: Sequence, cursor: Optional[Tuple[List[Any], str]], page_size: int):
+    """
+    Adds the keyset WHERE / ORDER BY / LIMIT to a select.
+    sort_keys: Columns (or expressions) the listing is ordered by, all DESC, ending in a unique column.
+    cursor: Decoded cursor or None for the first page.
+    Fetches page_size + 1 rows: the extra one only tells whether there is more in that direction.
+    """
+    key = tuple_(*sort_keys)
+    direction = cursor[1] if cursor else CURSOR_NEXT
+
+    if cursor:
+        boundary = tuple_(*cursor[0])
+        statement = statement.where(key < boundary if direction == CURSOR_NEXT else key > boundary)
+
+    if direction == CURSOR_NEXT:
+        statement = statement.order_by(*[k.desc() for k in sort_keys])
+    else:
+        # Walk backwards from the cursor, then flip the rows (see `build_page`)
+        statement = statement.order_by(*[k.asc() for k in sort_keys])
+
+    return statement.limit(page_size + 1)
+
+def build_page(
+    rows: List,
+    cursor: Optional[Tuple[List[Any], str]],
+    page_size: int,
+    key_of
+) -> Tuple[List, Optional[str], Optional[str]]:
+    """
+    Trims the look-ahead row and issues the cursors of the neighbouring pages.
+    key_of: Callable returning the sort-key values of a row.
+    Returns: (rows in display order, next cursor, prev cursor). A None cursor means no page there.
+    """
+    direction = cursor[1] if cursor else CURSOR_NEXT
+    has_more = len(rows) > page_size
+    rows = list(rows[:page_size])
+
+    if direction == CURSOR_NEXT:
+        has_next, has_prev = has_more, cursor is not None
+    else:
+        rows.reverse()
+        has_next, has_prev = True, has_more
+
+    next_cursor = encode_cursor(key_of(rows[-1]), CURSOR_NEXT) if rows and has_next else None
+    prev_cursor = encode_cursor(key_of(rows[0]), CURSOR_PREV) if rows and has_prev else None
+    return rows, next_cursor, prev_cursor
+
+def needs_first_page(rows: List, cursor: Optional[Tuple[List[Any], str]], page_size: int) -> bool:
+    """
+    True when a cursor led nowhere useful because rows were removed meanwhile: either
+    nothing is left past it, or paging backwards hit the start with fewer rows than a page.
+    Callers re-query the first page instead of showing an empty/short one.
+    """
+    if cursor is None:
+        return False
+    return not rows or (cursor[1] == CURSOR_PREV and len(rows) < page_size)
+
+# --- CACHED TOTALS ---
+
+class TotalsCache:
+    """
+    Short-lived cache of listing totals (COUNT(*)), so paging doesn't recount every time.
+    Write paths invalidate their key; the TTL bounds the drift from anything else.
+    """
+
+    def __init__(self, ttl: float = TOTALS_TTL_SECONDS):
+        self.ttl = ttl
+        self._data: Dict[Hashable, Tuple[float, int]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[int]:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                return None
+            return entry[1]
+
+    def set(self, key: Hashable, total: int):
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, total)
+
+    def invalidate(self, key: Hashable):
+        with self._lock:
+            self._data.pop(key, None)
+
+# Process-wide cache shared by every paginated listing
+listing_totals = TotalsCache()
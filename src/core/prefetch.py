@@ -0,0 +1,44 @@
+# src/core/prefetch.py
+import math
+
+# --- CONSTANTS ---
+EWMA_ALPHA = 0.3                    # Weight of the newest sample
+INITIAL_ANSWER_SECONDS = 8.0        # Assumed pace before the first answer (conservative: small batches)
+INITIAL_FETCH_SECONDS = 0.25
+MAX_ANSWER_SAMPLE_SECONDS = 120.0   # A user who walked away should not define the pace
+PREFETCH_HORIZON_SECONDS = 30.0     # A batch covers this much study time
+SAFETY_FACTOR = 2.0                 # Refill while the buffer still lasts this many fetch latencies
+MIN_LOW_WATER = 2
+MIN_BATCH_SIZE = 2
+MAX_BATCH_SIZE = 30
+
+class PrefetchPlanner:
+    """
+    Sizes the study card buffer from the observed pace (moving averages of the seconds spent
+    per answer and per batch fetch):
+    - `low_water`: refill once the buffered cards would run out before SAFETY_FACTOR fetches complete,
+    - `batch_size`: fetch about PREFETCH_HORIZON_SECONDS worth of cards.
+    Fast reviewers get deep buffers and never wait on a fetch; slow ones hold only the
+    couple of cards they are about to see.
+    """
+
+    def __init__(self):
+        self.answer_seconds = INITIAL_ANSWER_SECONDS
+        self.fetch_seconds = INITIAL_FETCH_SECONDS
+
+    def record_answer(self, seconds: float):
+        sample = min(max(seconds, 0.0), MAX_ANSWER_SAMPLE_SECONDS)
+        self.answer_seconds += EWMA_ALPHA * (sample - self.answer_seconds)
+
+    def record_fetch(self, seconds: float):
+        self.fetch_seconds += EWMA_ALPHA * (max(seconds, 0.0) - self.fetch_seconds)
+
+    def low_water(self) -> int:
+        """Buffered cards below which a refill starts."""
+        cards_per_fetch = self.fetch_seconds / max(self.answer_seconds, 0.1)
+        return min(max(MIN_LOW_WATER, math.ceil(cards_per_fetch * SAFETY_FACTOR) + 1), MAX_BATCH_SIZE)
+
+    def batch_size(self) -> int:
+        """Cards to request per refill (always enough to get back above the low water mark)."""
+        horizon = math.ceil(PREFETCH_HORIZON_SECONDS / max(self.answer_seconds, 0.1))
+        return min(max(MIN_BATCH_SIZE, horizon, self.low_water()), MAX_BATCH_SIZE)
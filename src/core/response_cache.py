@@ -0,0 +1,171 @@
+# src/core/response_cache.py
+import asyncio
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional, Tuple
+from src.core.log_manager import logger
+
+# --- CONSTANTS ---
+RESPONSE_CACHE_MAX_ENTRIES = 256    # LRU bound (keys include client-supplied cursors)
+FLIGHT_WAIT_SECONDS = 30            # Waiters re-check the cache at least this often
+METRICS_LOG_EVERY = 1000            # Lookups between two metrics log lines
+
+_FAILED = object()
+
+class _Flight:
+    """One in-progress computation; sync waiters block on the event, async ones await a future."""
+    __slots__ = ("generation", "done", "waiters")
+
+    def __init__(self, generation: int):
+        self.generation = generation     # Cache generation the computation started in
+        self.done = threading.Event()
+        self.waiters: List[Tuple[asyncio.AbstractEventLoop, asyncio.Future]] = []
+
+    def finish(self):
+        self.done.set()
+        for loop, future in self.waiters:
+            loop.call_soon_threadsafe(lambda f=future: f.done() or f.set_result(None))
+
+class ResponseCache:
+    """
+    Process-wide TTL cache of computed responses, shared by every client.
+    Misses are single-flight: concurrent callers of the same key wait for the first
+    one instead of computing it again. `invalidate` drops everything, and a result
+    computed across an invalidation is returned to its caller but not stored.
+    Values are shared: only cache immutable ones (or copy them on the way out).
+    """
+
+    def __init__(self, name: str, ttl: float, max_entries: int = RESPONSE_CACHE_MAX_ENTRIES):
+        self.name = name
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()     # key -> (stored_at, value)
+        self._flights: Dict[Hashable, _Flight] = {}
+        self._generation = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.invalidations = 0
+        self._served_age_total = 0.0
+        self._lookups = 0
+
+    # --- PUBLIC API ---
+
+    def get_or_compute(self, key: Hashable, compute: Callable[[], Any]) -> Any:
+        """Returns: The cached value of `key`, computing it (once across callers) when missing or expired."""
+        first = True
+        while True:
+            value, flight, owner = self._lookup(key, count=first)
+            if flight is None:
+                return value
+            if owner:
+                return self._compute(key, flight, compute)
+            first = False
+            flight.done.wait(FLIGHT_WAIT_SECONDS)
+
+    async def get_or_compute_async(self, key: Hashable, compute: Callable[[], Awaitable[Any]]) -> Any:
+        """Async variant of `get_or_compute`."""
+        first = True
+        while True:
+            value, flight, owner = self._lookup(key, count=first)
+            if flight is None:
+                return value
+            if owner:
+                try:
+                    value = await compute()
+                except BaseException:
+                    self._land(key, flight, _FAILED)
+                    raise
+                self._land(key, flight, value)
+                return value
+            first = False
+            future = asyncio.get_running_loop().create_future()
+            with self._lock:
+                if flight.done.is_set():
+                    continue
+                flight.waiters.append((asyncio.get_running_loop(), future))
+            try:
+                await asyncio.wait_for(future, FLIGHT_WAIT_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+
+    def invalidate(self):
+        """
+        Drops every entry. Computations already running won't store their (possibly stale)
+        result, and new callers start a fresh one instead of waiting for them.
+        """
+        with self._lock:
+            self._entries.clear()
+            self._flights.clear()
+            self._generation += 1
+            self.invalidations += 1
+
+    def stats(self) -> Dict:
+        """Metrics snapshot: hits, misses, coalesced, hit_ratio, mean_age_seconds (of hits), oldest_age_seconds, entries, invalidations."""
+        with self._lock:
+            now = time.monotonic()
+            lookups = self.hits + self.misses + self.coalesced
+            oldest = min((stored_at for stored_at, _ in self._entries.values()), default=None)
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "coalesced": self.coalesced,
+                # Coalesced requests were served without computing too
+                "hit_ratio": round((self.hits + self.coalesced) / lookups, 3) if lookups else 0.0,
+                "mean_age_seconds": round(self._served_age_total / self.hits, 1) if self.hits else 0.0,
+                "oldest_age_seconds": round(now - oldest, 1) if oldest is not None else 0.0,
+                "entries": len(self._entries),
+                "invalidations": self.invalidations,
+            }
+
+    # --- INTERNALS ---
+
+    def _lookup(self, key: Hashable, count: bool) -> Tuple[Any, Optional[_Flight], bool]:
+        """
+        count: False when a waiter re-checks (each request is counted once, as a hit, miss or coalesced).
+        Returns: (value, None, False) on a hit, else (None, flight, is_owner).
+        """
+        with self._lock:
+            self._lookups += count
+            log_metrics = count and self._lookups % METRICS_LOG_EVERY == 0
+            entry = self._entries.get(key)
+            now = time.monotonic()
+            if entry is not None and now - entry[0] < self.ttl:
+                self._entries.move_to_end(key)
+                if count:
+                    self.hits += 1
+                    self._served_age_total += now - entry[0]
+                result = (entry[1], None, False)
+            elif key in self._flights:
+                self.coalesced += count
+                result = (None, self._flights[key], False)
+            else:
+                self.misses += count
+                flight = self._flights[key] = _Flight(self._generation)
+                result = (None, flight, True)
+        if log_metrics:
+            logger.info(f"Response cache '{self.name}': {self.stats()}")
+        return result
+
+    def _compute(self, key: Hashable, flight: _Flight, compute: Callable[[], Any]) -> Any:
+        try:
+            value = compute()
+        except BaseException:
+            self._land(key, flight, _FAILED)
+            raise
+        self._land(key, flight, value)
+        return value
+
+    def _land(self, key: Hashable, flight: _Flight, value: Any):
+        """Ends a flight: stores the value (unless it failed or was invalidated meanwhile) and wakes its waiters."""
+        with self._lock:
+            if self._flights.get(key) is flight:
+                del self._flights[key]
+            if value is not _FAILED and flight.generation == self._generation:
+                self._entries[key] = (time.monotonic(), value)
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+            flight.finish()
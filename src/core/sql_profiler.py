@@ -0,0 +1,143 @@
+# src/core/sql_profiler.py
+import functools
+import heapq
+import inspect
+import re
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Iterator, List, Optional, Tuple
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from src.config import DB_PROFILE_SQL, SQL_PROFILE_MAX_STATEMENTS, SQL_PROFILE_REPEAT_THRESHOLD, SQL_PROFILE_SLOW_MS
+from src.core.log_manager import logger
+
+# --- CONSTANTS ---
+SLOWEST_KEPT = 3            # Slowest statements listed in a summary
+SHAPE_PREVIEW_CHARS = 160   # SQL shown per statement in a summary
+
+# Collapses expanded IN lists "(?, ?, ?)" so they count as one shape
+_IN_LIST_RE = re.compile(r"\((?:\s*\?\s*,)+\s*\?\s*\)")
+_WHITESPACE_RE = re.compile(r"\s+")
+
+def statement_shape(statement: str) -> str:
+    """Parameter-free, whitespace-normalized SQL: identical shapes differ only in bound values."""
+    return _WHITESPACE_RE.sub(" ", _IN_LIST_RE.sub("(?)", statement)).strip()
+
+class QueryProfile:
+    """Statements executed while one page handler / service call was running."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.count = 0
+        self.total_seconds = 0.0
+        self.shapes: Counter = Counter()
+        self._slowest: List[Tuple[float, int, str]] = []   # min-heap of (seconds, seq, sql)
+
+    def record(self, statement: str, seconds: float):
+        self.count += 1
+        self.total_seconds += seconds
+        shape = statement_shape(statement)
+        self.shapes[shape] += 1
+
+        entry = (seconds, self.count, shape)
+        if len(self._slowest) < SLOWEST_KEPT:
+            heapq.heappush(self._slowest, entry)
+        elif seconds > self._slowest[0][0]:
+            heapq.heapreplace(self._slowest, entry)
+
+    def slowest(self) -> List[Tuple[float, str]]:
+        return [(seconds, sql) for seconds, _, sql in sorted(self._slowest, reverse=True)]
+
+    def repeated_shapes(self) -> List[Tuple[str, int]]:
+        """Shapes executed SQL_PROFILE_REPEAT_THRESHOLD+ times: probable N+1 queries."""
+        return [(shape, n) for shape, n in self.shapes.most_common() if n >= SQL_PROFILE_REPEAT_THRESHOLD]
+
+    def summary(self) -> str:
+        lines = [f"SQL profile '{self.name}': {self.count} statements, {self.total_seconds * 1000:.1f} ms total"]
+        for shape, n in self.repeated_shapes():
+            lines.append(f"  probable N+1 ({n}x): {shape[:SHAPE_PREVIEW_CHARS]}")
+        for seconds, sql in self.slowest():
+            lines.append(f"  slow {seconds * 1000:.1f} ms: {sql[:SHAPE_PREVIEW_CHARS]}")
+        return "\n".join(lines)
+
+    def exceeds_thresholds(self) -> bool:
+        return (
+            self.count > SQL_PROFILE_MAX_STATEMENTS
+            or self.total_seconds * 1000 > SQL_PROFILE_SLOW_MS
+            or bool(self.repeated_shapes())
+        )
+
+# The profile of the running request (copied into tasks/threads spawned from it)
+_current_profile: ContextVar[Optional[QueryProfile]] = ContextVar("current_sql_profile", default=None)
+
+# --- ENGINE HOOKS ---
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _current_profile.get() is not None:
+        conn.info.setdefault("sql_profiler_started", []).append(time.perf_counter())
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    profile = _current_profile.get()
+    started = conn.info.get("sql_profiler_started")
+    if profile is None or not started:
+        return
+    profile.record(statement, time.perf_counter() - started.pop())
+
+def install_sql_profiler(*engines: Engine):
+    """
+    Hooks the profiler into the given engines (pass `async_engine.sync_engine` for async ones).
+    Only called when DB_PROFILE_SQL is on: otherwise the engines carry no extra listeners.
+    """
+    for target in engines:
+        event.listen(target, "before_cursor_execute", _before_cursor_execute)
+        event.listen(target, "after_cursor_execute", _after_cursor_execute)
+    logger.info("SQL profiler enabled.")
+
+# --- PROFILING SCOPES ---
+
+@contextmanager
+def profile_sql(name: str) -> Iterator[Optional[QueryProfile]]:
+    """
+    Collects the statements run inside the block and logs a summary when a threshold is exceeded.
+    Nested scopes fold into the outermost one, so a page reports everything it triggered.
+    Yields the active profile (None when profiling is disabled).
+    """
+    if not DB_PROFILE_SQL or _current_profile.get() is not None:
+        yield _current_profile.get()
+        return
+
+    profile = QueryProfile(name)
+    token = _current_profile.set(profile)
+    try:
+        yield profile
+    finally:
+        _current_profile.reset(token)
+        if profile.exceeds_thresholds():
+            logger.warning(profile.summary())
+
+def profiled(name: Optional[str] = None) -> Callable:
+    """
+    Decorator form of `profile_sql` for page handlers and service calls (sync or async).
+    A no-op when DB_PROFILE_SQL is off: the function is returned unchanged.
+    """
+    def decorator(func: Callable) -> Callable:
+        if not DB_PROFILE_SQL:
+            return func
+        scope = name or f"{func.__module__}.{func.__qualname__}"
+
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with profile_sql(scope):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with profile_sql(scope):
+                return func(*args, **kwargs)
+        return wrapper
+
+    return decorator
@@ -0,0 +1,64 @@
+# src/core/srs.py
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Optional
+
+# --- SM-2 CONSTANTS ---
+DEFAULT_EASE = 2.5
+MIN_EASE = 1.3
+FIRST_INTERVAL_DAYS = 1.0
+SECOND_INTERVAL_DAYS = 6.0
+RELEARN_DELAY = timedelta(minutes=10)   # A lapsed card comes back the same day
+MASTERED_INTERVAL_DAYS = 21.0           # Cards scheduled this far ahead count as mastered
+MAX_INTERVAL_DAYS = 3650.0              # Cap: unbounded growth eventually overflows datetime
+
+# Study answers -> SM-2 quality (0-5). 'DISCARD' is not a review.
+GRADE_BY_RESULT = {
+    'KNOW': 4,
+    'MISS': 1,
+}
+
+@dataclass
+class ReviewState:
+    """Scheduling fields of one card (mirrors models.CardReviewState)."""
+    due_at: Optional[datetime] = None
+    interval_days: float = 0.0
+    ease: float = DEFAULT_EASE
+    repetitions: int = 0
+    lapses: int = 0
+    last_reviewed_at: Optional[datetime] = None
+
+def review(state: ReviewState, grade: int, now: datetime) -> ReviewState:
+    """
+    SM-2 step: returns the new state after answering with `grade` (0-5) at `now`.
+    Grades below 3 are lapses: the card restarts its interval ladder.
+    """
+    ease = max(MIN_EASE, state.ease + 0.1 - (5 - grade) * (0.08 + (5 - grade) * 0.02))
+
+    if grade >= 3:
+        if state.repetitions == 0:
+            interval = FIRST_INTERVAL_DAYS
+        elif state.repetitions == 1:
+            interval = SECOND_INTERVAL_DAYS
+        else:
+            interval = min(round(state.interval_days * state.ease, 2), MAX_INTERVAL_DAYS)
+        return ReviewState(
+            due_at=now + timedelta(days=interval),
+            interval_days=interval,
+            ease=ease,
+            repetitions=state.repetitions + 1,
+            lapses=state.lapses,
+            last_reviewed_at=now,
+        )
+
+    return ReviewState(
+        due_at=now + RELEARN_DELAY,
+        interval_days=0.0,
+        ease=ease,
+        repetitions=0,
+        lapses=state.lapses + 1,
+        last_reviewed_at=now,
+    )
+
+def is_mastered(state: Optional[ReviewState]) -> bool:
+    return state is not None and state.interval_days >= MASTERED_INTERVAL_DAYS
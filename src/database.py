@@ -1,27 +1,155 @@
 # src/database.py
 from sqlmodel import SQLModel, create_engine, Session
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import QueuePool, NullPool, AsyncAdaptedQueuePool
+from sqlmodel.ext.asyncio.session import AsyncSession
 import os
+import re
+from typing import List, Tuple
+from src.config import DB_PRAGMAS, DB_POOL_CLASS, DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_POOL_TIMEOUT, DB_PROFILE_SQL
+from src.core.sql_profiler import install_sql_profiler
 
 # Define the database file path (in the root directory)
 DB_FILE = "db/study_app.db"
 DATABASE_URL = f"sqlite:///{DB_FILE}"
+ASYNC_DATABASE_URL = f"sqlite+aiosqlite:///{DB_FILE}"
+
+# Pragma values are interpolated into SQL, so only allow plain tokens/numbers
+_PRAGMA_VALUE_RE = re.compile(r"^-?[A-Za-z0-9_]+$")
+
+def _pool_kwargs(is_async: bool = False) -> dict:
+    """Pool configuration selected through src/config.py (DB_POOL_CLASS & co)."""
+    if DB_POOL_CLASS == "null":
+        return {"poolclass": NullPool}
+    if DB_POOL_CLASS == "queue":
+        return {
+            "poolclass": AsyncAdaptedQueuePool if is_async else QueuePool,
+            "pool_size": DB_POOL_SIZE,
+            "max_overflow": DB_MAX_OVERFLOW,
+            "pool_timeout": DB_POOL_TIMEOUT,
+        }
+    raise ValueError(f"Unknown DB_POOL_CLASS '{DB_POOL_CLASS}'. Expected 'queue' or 'null'.")
 
 # Create the engine
 # check_same_thread=False is needed for SQLite with NiceGUI/FastAPI concurrency
-engine = create_engine(DATABASE_URL, echo=False, connect_args={"check_same_thread": False})
+engine = create_engine(
+    DATABASE_URL,
+    echo=False,
+    connect_args={"check_same_thread": False},
+    **_pool_kwargs()
+)
+
+# Async engine (aiosqlite) for code running on the NiceGUI event loop.
+# Same file, same pragmas; queries await instead of blocking every connected client.
+async_engine = create_async_engine(ASYNC_DATABASE_URL, echo=False, **_pool_kwargs(is_async=True))
+
+@event.listens_for(engine, "connect")
+@event.listens_for(async_engine.sync_engine, "connect")
+def _apply_sqlite_pragmas(dbapi_connection, connection_record):
+    """
+    Applies the configured SQLite profile (WAL, synchronous, busy_timeout, ...)
+    once per new DBAPI connection. Pooled connections keep them for their lifetime.
+    """
+    if not DB_PRAGMAS:
+        return
+    cursor = dbapi_connection.cursor()
+    try:
+        for pragma, value in DB_PRAGMAS.items():
+            if not _PRAGMA_VALUE_RE.match(value):
+                raise ValueError(f"Invalid value for PRAGMA {pragma}: '{value}'")
+            cursor.execute(f"PRAGMA {pragma}={value}")
+    finally:
+        cursor.close()
+
+# Opt-in statement counting/timing (see src/core/sql_profiler.py)
+if DB_PROFILE_SQL:
+    install_sql_profiler(engine, async_engine.sync_engine)
+
+# Columns added after tables were first created: create_all() never alters existing tables.
+# (table, column, column DDL)
+_COLUMN_MIGRATIONS: List[Tuple[str, str, str]] = [
+    ("deck", "card_count", "INTEGER NOT NULL DEFAULT 0"),
+    ("deck", "adoption_count", "INTEGER NOT NULL DEFAULT 0"),
+    ("deck", "trending_score", "FLOAT NOT NULL DEFAULT -1000000000"),   # models.NO_TRENDING_SCORE
+]
+
+def _migrate_columns() -> List[str]:
+    """Adds missing columns to existing tables. Returns the 'table.column' names added."""
+    added = []
+    with engine.begin() as conn:
+        for table, column, ddl in _COLUMN_MIGRATIONS:
+            existing = {row[1] for row in conn.exec_driver_sql(f"PRAGMA table_info({table})")}
+            if column not in existing:
+                conn.exec_driver_sql(f"ALTER TABLE {table} ADD COLUMN {column} {ddl}")
+                added.append(f"{table}.{column}")
+    return added
+
+def _ensure_indexes() -> List[str]:
+    """
+    create_all() only builds indexes together with a new table, so indexes added to
+    the models later never reach existing databases. Creates the missing ones (idempotent).
+    Returns: Names of the indexes created.
+    """
+    created = []
+    with engine.begin() as conn:
+        existing = {row[0] for row in conn.exec_driver_sql("SELECT name FROM sqlite_master WHERE type = 'index'")}
+        for table in SQLModel.metadata.sorted_tables:
+            for index in table.indexes:
+                if index.name not in existing:
+                    index.create(conn, checkfirst=True)
+                    created.append(index.name)
+    return created
 
 def init_db():
     """
     Creates the database tables based on the models.
     Should be called on app startup.
     """
-    from src.models import User, Deck, Card, ActiveDeck # Import to register models
+    from src.models import User, Deck, Card, ActiveDeck, ImportJob, StudySessionSnapshot, StudySessionEvent, ReviewEvent, DeckStats, DeckTagLink # Import to register models
+    os.makedirs(os.path.dirname(DB_FILE), exist_ok=True)
+    with engine.connect() as conn:
+        existing_tables = {row[0] for row in conn.exec_driver_sql("SELECT name FROM sqlite_master WHERE type = 'table'")}
     SQLModel.metadata.create_all(engine)
-    print(f"Database initialized at {DB_FILE}")
+
+    added_columns = _migrate_columns()
+    if added_columns:
+        print(f"Database migrated: added columns {added_columns}")
+    if "deck.card_count" in added_columns:
+        from src.services.deck_service import repair_deck_card_counts
+        repair_deck_card_counts()
+    from src.services.popularity_service import rebuild_popularity, has_linear_trending_scores
+    if "deck.adoption_count" in added_columns or (existing_tables and has_linear_trending_scores()):
+        # New columns, or trending scores written before they were kept in log2 space
+        rebuild_popularity()
+
+    from src.services.stats_service import rebuild_deck_stats, has_markup_previews
+    if existing_tables and DeckStats.__tablename__ not in existing_tables:
+        # Rollups start empty on a database that already has answers: backfill them once
+        rebuild_deck_stats()
+    elif existing_tables and has_markup_previews():
+        # Hardest-card previews stored as HTML by an older version: rewrite them as plain text
+        rebuild_deck_stats()
+
+    if existing_tables and DeckTagLink.__tablename__ not in existing_tables:
+        # Decks imported before facets existed: derive their tags and counts once
+        from src.services.facet_service import rebuild_facets
+        rebuild_facets()
+
+    from src.services.search_service import create_search_tables, rebuild_search_index
+    created_search_tables = create_search_tables()
+    if existing_tables and created_search_tables:
+        # Decks and cards imported before search existed: index them once
+        rebuild_search_index()
+
+    created_indexes = _ensure_indexes()
+    if created_indexes:
+        print(f"Database migrated: created indexes {created_indexes}")
+    print(f"Database initialized at {DB_FILE} (pragmas: {DB_PRAGMAS or 'SQLite defaults'})")
 
 def get_db_session():
     """
-    Yields a database session. 
+    Yields a database session.
     Use with context manager: `with get_db_session() as session:`
     """
     with Session(engine) as session:
@@ -30,3 +158,15 @@ def get_db_session():
 # Direct session factory for when generators aren't suitable
 def create_session():
     return Session(engine)
+
+def create_async_session() -> AsyncSession:
+    """
+    Async session for event-loop code: `async with create_async_session() as session:`
+    Objects stay usable after commit (no implicit refresh), but relationships are
+    never lazy-loaded in async mode: select what you need explicitly.
+    """
+    return AsyncSession(async_engine, expire_on_commit=False)
+
+async def dispose_async_engine():
+    """Shutdown hook: closes pooled aiosqlite connections (their threads keep the process alive)."""
+    await async_engine.dispose()
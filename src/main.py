@@ -2,8 +2,12 @@
 from nicegui import ui, app
 import os
 import sys
-from src.config import SECRET_KEY
-from src.database import init_db
+from src.config import SECRET_KEY, DB_AUDIT_QUERY_PLANS
+from src.database import init_db, dispose_async_engine
+from src.services.query_plan_service import audit_query_plans
+from src.services.import_job_service import recover_interrupted_import_jobs, shutdown_import_workers
+from src.services.study_session_store import shutdown_study_sessions
+from src.services.review_log_service import shutdown_review_log
 
 # Get the directory of the current file (e.g., /path/to/src)
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
@@ -35,8 +39,19 @@ else:
 
 ui.add_css("global.css", shared=True)
 
+# Server process only (not the reload supervisor): re-queue imports a previous process left behind
+app.on_startup(recover_interrupted_import_jobs)
+# Let the running import finish (and drop queued ones) on shutdown
+app.on_shutdown(shutdown_import_workers)
+# Write pending study session deltas before the engines go away
+app.on_shutdown(shutdown_study_sessions)
+app.on_shutdown(shutdown_review_log)
+app.on_shutdown(dispose_async_engine)
+
 # --- STARTUP ---
 if __name__ in {"__main__", "__mp_main__"}:
     init_db()
+    if DB_AUDIT_QUERY_PLANS:
+        audit_query_plans()
     # Start the NiceGUI server
     ui.run(title=T("app_title", use_fallback=True), reload=True, port=8080, storage_secret=SECRET_KEY)
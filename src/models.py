@@ -1,7 +1,7 @@
 from typing import Optional, List
 from datetime import datetime, timezone
-from enum import IntEnum
-from sqlmodel import SQLModel, Field, Relationship
+from enum import IntEnum, Enum
+from sqlmodel import SQLModel, Field, Relationship, Index
 import json
 
 class Difficulty(IntEnum):
@@ -14,16 +14,37 @@ class Difficulty(IntEnum):
     HARD = 4
     HARDEST = 5
 
+class ImportJobStatus(str, Enum):
+    """
+    Lifecycle of a background deck import.
+    """
+    QUEUED = "queued"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+
 # --- JOIN TABLES (Many-to-Many) ---
 
 class CardTagLink(SQLModel, table=True):
     """
     Link table to allow one Card to have multiple Tags,
     and one Tag to belong to multiple Cards.
+    The primary key (tag_id, card_id) already serves tag -> cards lookups;
+    the extra index serves card -> tags joins.
     """
+    __table_args__ = (Index("ix_cardtaglink_card_tag", "card_id", "tag_id"),)
+
     tag_id: Optional[int] = Field(default=None, foreign_key="tag.id", primary_key=True)
     card_id: Optional[int] = Field(default=None, foreign_key="card.id", primary_key=True)
 
+class DeckTagLink(SQLModel, table=True):
+    """
+    Distinct tags of a deck's cards, written once at import (see services/facet_service.py),
+    so tag filters don't scan cards. The primary key (tag_id, deck_id) serves tag -> decks.
+    """
+    tag_id: int = Field(foreign_key="tag.id", primary_key=True)
+    deck_id: int = Field(foreign_key="deck.id", primary_key=True)
+
 # --- 1. STATIC CONTENT (The Book) ---
 
 class User(SQLModel, table=True):
@@ -37,7 +58,18 @@ class User(SQLModel, table=True):
     owned_decks: List["Deck"] = Relationship(back_populates="owner")
     active_decks: List["ActiveDeck"] = Relationship(back_populates="user")
 
+# Deck.trending_score of a deck nobody holds (below any real score, see popularity_service)
+NO_TRENDING_SCORE = -1e9
+
 class Deck(SQLModel, table=True):
+    # Public library listing: WHERE is_public [AND language pair] ORDER BY created_at|adoption_count|trending_score, id
+    __table_args__ = (
+        Index("ix_deck_public_created", "is_public", "created_at"),
+        Index("ix_deck_public_languages_created", "is_public", "front_language", "back_language", "created_at"),
+        Index("ix_deck_public_adoption", "is_public", "adoption_count"),
+        Index("ix_deck_public_trending", "is_public", "trending_score"),
+    )
+
     id: Optional[int] = Field(default=None, primary_key=True)
     owner_id: int = Field(foreign_key="user.id")
     
@@ -46,6 +78,11 @@ class Deck(SQLModel, table=True):
     is_public: bool = Field(default=False)
     version: int = Field(default=1)
     created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+    # Denormalized COUNT(card) maintained by every card write path (see repair_deck_card_counts)
+    card_count: int = Field(default=0)
+    # Popularity, maintained with every ActiveDeck add/remove (see popularity_service)
+    adoption_count: int = Field(default=0)      # Bookshelves holding the deck
+    trending_score: float = Field(default=NO_TRENDING_SCORE)  # log2 of the decayed adds
     
     front_language: str = Field(default="en", description="ISO code for front side")
     back_language: str = Field(default="en", description="ISO code for back side")
@@ -66,6 +103,9 @@ class Tag(SQLModel, table=True):
     cards: List["Card"] = Relationship(back_populates="tags", link_model=CardTagLink)
 
 class Card(SQLModel, table=True):
+    # Study candidates: WHERE deck_id = ? AND base_difficulty BETWEEN ? AND ?
+    __table_args__ = (Index("ix_card_deck_difficulty", "deck_id", "base_difficulty"),)
+
     id: Optional[int] = Field(default=None, primary_key=True)
     deck_id: int = Field(foreign_key="deck.id")
     
@@ -86,6 +126,12 @@ class ActiveDeck(SQLModel, table=True):
     Represents the User's copy of a Deck.
     Stores high-level stats.
     """
+    __table_args__ = (
+        Index("ix_activedeck_user_favorite_played", "user_id", "is_favorite", "last_played_at"),
+        Index("ix_activedeck_user_deck", "user_id", "deck_id"),
+        Index("ix_activedeck_deck_created", "deck_id", "created_at"),   # A deck's adds (trending recompute)
+    )
+
     id: Optional[int] = Field(default=None, primary_key=True)
     user_id: int = Field(foreign_key="user.id")
     deck_id: int = Field(foreign_key="deck.id")
@@ -99,4 +145,140 @@ class ActiveDeck(SQLModel, table=True):
     user: User = Relationship(back_populates="active_decks")
     deck: Deck = Relationship(back_populates="active_instances")
 
+class CardReviewState(SQLModel, table=True):
+    """
+    Spaced-repetition state of one Card inside one ActiveDeck (i.e. per user, per card).
+    Maintained by the scheduler (see services/scheduler_service.py).
+    """
+    __table_args__ = (
+        Index("ix_cardreviewstate_deck_card", "active_deck_id", "card_id", unique=True),
+        # "Due now" queue: one range scan per deck
+        Index("ix_cardreviewstate_deck_due", "active_deck_id", "due_at"),
+    )
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    active_deck_id: int = Field(foreign_key="activedeck.id")
+    card_id: int = Field(foreign_key="card.id")
+
+    due_at: datetime
+    interval_days: float = Field(default=0.0)
+    ease: float = Field(default=2.5)
+    repetitions: int = Field(default=0, description="Consecutive successful reviews")
+    lapses: int = Field(default=0)
+    last_reviewed_at: Optional[datetime] = None
+
+class DeckStats(SQLModel, table=True):
+    """
+    Rollup of the review events of one ActiveDeck, updated incrementally on every review
+    log flush (see services/stats_service.py), so listings read it with one joined row.
+    """
+    active_deck_id: int = Field(primary_key=True, foreign_key="activedeck.id")
+
+    reviews: int = Field(default=0, description="Answers, including discarded cards")
+    correct: int = Field(default=0)
+    wrong: int = Field(default=0)
+    mastered_cards: int = Field(default=0)
+    # Top cards by lapses: [{"card_id": int, "lapses": int, "front": str}, ...]
+    hardest_json: str = Field(default="[]")
+    updated_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+
+# --- 3. BACKGROUND JOBS ---
+
+class ImportJob(SQLModel, table=True):
+    """
+    A deck import executed off the event loop by the import worker pool.
+    `cards_written` is persisted when the job finishes; live progress is kept in memory.
+    """
+    id: Optional[int] = Field(default=None, primary_key=True)
+    user_id: int = Field(foreign_key="user.id", index=True)
+    deck_id: Optional[int] = Field(default=None, foreign_key="deck.id")
+
+    deck_title: str
+    header_json: str = Field(description="Validated DeckMetadataDTO as JSON (restarts an interrupted job)")
+    status: str = Field(default=ImportJobStatus.QUEUED.value, index=True)
+    cards_total: int = Field(default=0)
+    cards_written: int = Field(default=0)
+    error: Optional[str] = None
+
+    created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+# --- 4. STUDY SESSIONS (Server-side store, see services/study_session_store.py) ---
+
+class StudySessionSnapshot(SQLModel, table=True):
+    """
+    Base state of a user's running study session (at most one per user).
+    Written when the session starts and when its event log is compacted;
+    every change in between is a StudySessionEvent with seq > event_seq.
+    """
+    user_id: int = Field(foreign_key="user.id", primary_key=True)
+    # No FK: removing the deck from the bookshelf must not be blocked by a stale session
+    active_deck_id: int
+    start_time: datetime
+
+    queue_json: str = Field(description="CompactQueue.to_dict(): candidate ID runs, shuffle seed, requeue tail (JSON)")
+    fetch_index: int = Field(default=0)
+    correct: int = Field(default=0)
+    wrong: int = Field(default=0)
+    combo: int = Field(default=0)
+    mistakes_json: str = Field(default="{}", description="{card_id: miss count} (JSON)")
+
+    event_seq: int = Field(default=0, description="Last event already folded into this snapshot")
+    updated_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+
+class StudySessionEvent(SQLModel, table=True):
+    """
+    A delta of a running study session: a cursor move ('fetch') or an answer ('answer').
+    Replayed in seq order on top of the user's StudySessionSnapshot.
+    """
+    __table_args__ = (Index("ix_studysessionevent_user_seq", "user_id", "seq"),)
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    user_id: int = Field(foreign_key="user.id")
+    seq: int
+
+    kind: str
+    card_id: Optional[int] = None
+    result: Optional[str] = None        # 'KNOW' | 'MISS' | 'DISCARD' (answers)
+    fetch_index: Optional[int] = None   # New cursor position (fetches)
+
+# --- 5. REVIEW HISTORY ---
+
+class ReviewEvent(SQLModel, table=True):
+    """
+    One answer given in a study session (append-only).
+    Written in batches by the review log buffer (see services/review_log_service.py).
+    """
+    __table_args__ = (Index("ix_reviewevent_deck_reviewed", "active_deck_id", "reviewed_at"),)
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    user_id: int = Field(foreign_key="user.id")
+    # No FK: the history may outlive the ActiveDeck (removed from the bookshelf)
+    active_deck_id: int
+    card_id: int
+
+    result: str                             # 'KNOW' | 'MISS' | 'DISCARD'
+    latency_ms: Optional[int] = None        # Card shown -> answer
+    reviewed_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+
+# --- 6. PUBLIC LIBRARY FACETS (Public deck counts, see services/facet_service.py) ---
+
+class LanguagePairFacet(SQLModel, table=True):
+    # Sidebar: most used pairs first
+    __table_args__ = (Index("ix_languagepairfacet_count", "deck_count"),)
+
+    front_language: str = Field(primary_key=True)
+    back_language: str = Field(primary_key=True)
+    deck_count: int = Field(default=0)
+
+class DeckSizeFacet(SQLModel, table=True):
+    bucket: str = Field(primary_key=True)     # Key of facet_service.DECK_SIZE_BUCKETS
+    deck_count: int = Field(default=0)
+
+class TagFacet(SQLModel, table=True):
+    # Sidebar: most used tags first
+    __table_args__ = (Index("ix_tagfacet_count", "deck_count"),)
 
+    tag_id: int = Field(primary_key=True, foreign_key="tag.id")
+    deck_count: int = Field(default=0)
@@ -1,20 +1,22 @@
 from src.core.log_manager import logger
-from nicegui import ui, app, run
+from nicegui import ui, app
 from math import ceil
 from functools import partial
 from src.pages.common import setup_page, create_navbar
 from src.core.locale_manager import T
+from src.core.sql_profiler import profiled
 from src.services.bookshelf_service import (
-    get_user_bookshelf, 
-    get_user_favorites, 
-    toggle_favorite_status, 
-    remove_deck_from_bookshelf
+    get_user_bookshelf_async, 
+    get_user_favorites_async, 
+    toggle_favorite_status_async, 
+    remove_deck_from_bookshelf_async
 )
 
 PAGE_SIZE = 9
 
 @ui.page('/app/my-bookshelf')
-def my_bookshelf_page():
+@profiled('page:/app/my-bookshelf')
+async def my_bookshelf_page():
     if not setup_page(restricted=True):
         return
     create_navbar()
@@ -27,7 +29,10 @@ def my_bookshelf_page():
         return
 
     # --- State ---
+    # Keyset pagination: we only move to the neighbouring page through its cursor
     current_page = 1
+    current_cursor = None
+    page_info = {"total": 0, "next_cursor": None, "prev_cursor": None}
     
     # State container for the deck currently being processed
     deletion_state = {"id": None, "title": ""}
@@ -53,8 +58,8 @@ def my_bookshelf_page():
 
         print(notification)  # DEBUG: Check notification object
         try:
-            # Run SQL in separate thread
-            success = await run.io_bound(remove_deck_from_bookshelf, user_id, deck_id)
+            # Awaited on the async engine (does not block the event loop)
+            success = await remove_deck_from_bookshelf_async(user_id, deck_id)
             
             # FIX 2: Check if notification object exists before dismissing
             if notification:
@@ -62,7 +67,7 @@ def my_bookshelf_page():
             
             if success:
                 ui.notify(f"Successfully deleted '{title}'", type='positive')
-                refresh_ui()
+                await refresh_ui()
             else:
                 ui.notify("Error: Could not delete deck.", type='negative')
                 
@@ -96,11 +101,16 @@ def my_bookshelf_page():
         
         delete_dialog.open()
 
-    def refresh_ui():
+    @profiled('bookshelf.refresh_ui')
+    async def refresh_ui():
         """Refreshes both Favorites and Main Library lists."""
-        favorites = get_user_favorites(user_id)
-        all_decks, total_count = get_user_bookshelf(user_id, page=current_page, page_size=PAGE_SIZE)
-        total_pages = ceil(total_count / PAGE_SIZE) if total_count > 0 else 1
+        nonlocal current_page, page_info
+        favorites = await get_user_favorites_async(user_id)
+        all_decks, page_info = await get_user_bookshelf_async(user_id, cursor=current_cursor, page_size=PAGE_SIZE)
+        if not page_info["prev_cursor"]:
+            current_page = 1
+        # The total is cached (approximate): never show fewer pages than we have walked
+        total_pages = max(ceil(page_info["total"] / PAGE_SIZE), current_page, 1)
 
         content_wrapper.clear()
         with content_wrapper:
@@ -139,13 +149,13 @@ def my_bookshelf_page():
                         render_book_card(deck)
 
                 # Pagination
-                if total_pages > 1:
+                if page_info["prev_cursor"] or page_info["next_cursor"]:
                     with ui.row().classes('w-full justify-center gap-4 mt-8'):
                         ui.button(icon='chevron_left', on_click=lambda: change_page(-1)) \
-                            .props(f'flat round color=white {"disabled" if current_page <= 1 else ""}')
+                            .props(f'flat round color=white {"disabled" if not page_info["prev_cursor"] else ""}')
                         ui.label(f"{current_page}").classes('text-white self-center font-bold text-lg')
                         ui.button(icon='chevron_right', on_click=lambda: change_page(1)) \
-                            .props(f'flat round color=white {"disabled" if current_page >= total_pages else ""}')
+                            .props(f'flat round color=white {"disabled" if not page_info["next_cursor"] else ""}')
 
     def render_book_card(deck, is_favorite_list=False):
         border_class = 'border-yellow-500/50' if is_favorite_list else 'border-white/10'
@@ -157,18 +167,18 @@ def my_bookshelf_page():
             with ui.row().classes('w-full justify-between items-start'):
                 # Lang Badge
                 with ui.row().classes('items-center gap-1 bg-black/40 px-2 py-0.5 rounded text-[10px] text-gray-400 border border-white/5'):
-                    ui.label(deck['front_lang'].upper())
+                    ui.label(deck.front_lang.upper())
                     ui.icon('arrow_forward', size='xs').classes('opacity-50')
-                    ui.label(deck['back_lang'].upper())
+                    ui.label(deck.back_lang.upper())
 
                 # Right: Actions
                 with ui.row().classes('items-center gap-0'):
                     
                     # Favorite Toggle
-                    star_icon = 'star' if deck['is_favorite'] else 'star_border'
-                    star_color = 'text-yellow-400' if deck['is_favorite'] else 'text-gray-600'
+                    star_icon = 'star' if deck.is_favorite else 'star_border'
+                    star_color = 'text-yellow-400' if deck.is_favorite else 'text-gray-600'
                     
-                    ui.button(icon=star_icon, on_click=partial(toggle_fav_handler, deck['active_id'])) \
+                    ui.button(icon=star_icon, on_click=partial(toggle_fav_handler, deck.active_id)) \
                         .props('flat round dense') \
                         .classes(f'{star_color} hover:text-yellow-200 transition-colors z-10')
                     
@@ -178,49 +188,69 @@ def my_bookshelf_page():
                             # Menu Item: Delete
                             ui.menu_item(
                                 'Remove', 
-                                on_click=partial(open_delete_dialog, deck['active_id'], deck['title'])
+                                on_click=partial(open_delete_dialog, deck.active_id, deck.title)
                             ).props('active-class="bg-red-900/50 text-red-200"').classes('text-red-400 hover:bg-red-900/30')
 
             # --- Middle: Content ---
             with ui.column().classes('w-full gap-1 mt-2'):
-                ui.label(deck['title']).classes('text-xl font-bold text-gray-100 leading-tight line-clamp-1')
-                ui.label(deck['description'] or T("deck_without_description")).classes('text-xs text-gray-400 line-clamp-2 leading-snug')
-
-            # --- Stats Row ---
-            # with ui.row().classes('w-full mt-auto mb-2 gap-4'):
-            #     with ui.column().classes('gap-0'):
-            #         ui.label(str(deck['total_sessions'])).classes('text-lg font-bold text-indigo-300 leading-none')
-            #         ui.label(T("sessions")).classes('text-[10px] text-gray-500 uppercase')
-                
-            #     with ui.column().classes('gap-0'):
-            #         ui.label(deck['last_played']).classes('text-sm font-bold text-gray-300 leading-tight mt-1')
-            #         ui.label(T("last_activity")).classes('text-[10px] text-gray-500 uppercase')
+                ui.label(deck.title).classes('text-xl font-bold text-gray-100 leading-tight line-clamp-1')
+                ui.label(deck.description or T("deck_without_description")).classes('text-xs text-gray-400 line-clamp-2 leading-snug')
+
+            # --- Stats Row (precomputed rollup, see stats_service.py) ---
+            with ui.row().classes('w-full mt-auto mb-2 gap-4 items-end'):
+                with ui.column().classes('gap-0'):
+                    ui.label(str(deck.total_sessions)).classes('text-lg font-bold text-indigo-300 leading-none')
+                    ui.label(T("sessions")).classes('text-[10px] text-gray-500 uppercase')
+
+                with ui.column().classes('gap-0'):
+                    accuracy = f"{deck.accuracy}%" if deck.accuracy is not None else "-"
+                    ui.label(accuracy).classes('text-lg font-bold text-green-300 leading-none')
+                    ui.label(T("accuracy")).classes('text-[10px] text-gray-500 uppercase')
+
+                with ui.column().classes('gap-0'):
+                    ui.label(f"{deck.mastered_cards}/{deck.card_count}").classes('text-lg font-bold text-yellow-300 leading-none')
+                    ui.label(T("mastered_cards")).classes('text-[10px] text-gray-500 uppercase')
+
+                with ui.column().classes('gap-0'):
+                    ui.label(deck.last_played).classes('text-sm font-bold text-gray-300 leading-tight mt-1')
+                    ui.label(T("last_activity")).classes('text-[10px] text-gray-500 uppercase')
+
+            if deck.hardest_cards:
+                with ui.column().classes('w-full gap-0 mb-2'):
+                    ui.label(T("hardest_cards")).classes('text-[10px] text-gray-500 uppercase')
+                    for hard in deck.hardest_cards:
+                        ui.label(f"{hard['front']} ({hard['lapses']}x)").classes('text-xs text-red-300/80 line-clamp-1')
 
             # --- Bottom: Action ---
             with ui.row().classes('w-[calc(100%+2rem)] -ml-4 -mb-4 pt-3 pb-3 px-4 border-t border-white/10 bg-black/20 justify-between items-center'):
-                 ui.label(T("card_count_info").format(count=deck['card_count'])).classes('text-xs text-gray-500')
+                 ui.label(T("card_count_info").format(count=deck.card_count)).classes('text-xs text-gray-500')
                  
-                 ui.button(T("start_session"), icon="play_arrow", on_click=partial(start_session, deck['active_id'])) \
+                 ui.button(T("start_session"), icon="play_arrow", on_click=partial(start_session, deck.active_id)) \
                     .props("dense color=green-7 text-color=white no-caps") \
                     .classes('shadow-lg shadow-green-900/50 px-4 font-semibold hover:scale-105 transition-transform')
 
     # --- Handlers ---
 
-    def toggle_fav_handler(active_deck_id):
+    async def toggle_fav_handler(active_deck_id):
         logger.info(f"Toggling favorite status for ActiveDeck ID {active_deck_id}")
-        new_state = toggle_favorite_status(active_deck_id)
+        new_state = await toggle_favorite_status_async(active_deck_id)
         state_msg = T("pinned2fav") if new_state else T("removed_from_fav")
         ui.notify(state_msg, type='positive' if new_state else 'info', position='bottom')
-        refresh_ui()
+        await refresh_ui()
 
     def start_session(active_deck_id):
         ui.notify(T("starting_session").format(id=active_deck_id), type='positive')
         ui.navigate.to(f'/app/study?deck_id={active_deck_id}')
 
-    def change_page(delta):
-        nonlocal current_page
+    async def change_page(delta):
+        """Moves one page forward (+1) or back (-1) through the cursors of the current page."""
+        nonlocal current_page, current_cursor
+        target = page_info["next_cursor"] if delta > 0 else page_info["prev_cursor"]
+        if not target:
+            return
+        current_cursor = target
         current_page += delta
-        refresh_ui()
+        await refresh_ui()
 
     # Initial Load
-    refresh_ui()
+    await refresh_ui()
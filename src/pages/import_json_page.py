@@ -1,9 +1,15 @@
-from nicegui import ui, app, events
+from nicegui import ui, app, events, run
 import os
 from src.core.locale_manager import T
 from src.core.log_manager import logger
 from src.pages.common import setup_page, create_navbar
-from src.services.import_service import parse_and_preview_deck, save_dto_to_db
+from src.services.import_service import scan_deck_stream, STREAM_READ_CHUNK
+from src.services.import_job_service import submit_import_job, get_import_job, ImportQueueFullError
+from src.models import ImportJobStatus
+
+# Uploads are streamed (never loaded whole), so large decks are fine
+MAX_UPLOAD_BYTES = 100 * 1024 * 1024
+JOB_POLL_INTERVAL = 0.5  # Seconds between import job status checks
 
 @ui.page('/app/import-json')
 def import_json_page():
@@ -24,20 +30,23 @@ def import_json_page():
     ''')
 
     # --- STATE ---
-    # We store the DTO here temporarily to pass it from Step 2 -> Step 3
-    current_import_data = {"dto": None} 
+    # We keep the validated deck fields and the upload handle to pass them from Step 2 -> Step 3.
+    # The cards themselves are re-streamed from the file on confirm.
+    current_import_data = {"header": None, "file": None, "card_count": 0}
 
     async def handle_parsing(e: events.UploadEventArguments, stepper_element):
         """Step 2 -> Step 3: Parse File & Show Preview"""
         try:
-            content = await e.file.text()
-            # 1. Parse & Stats
-            result = parse_and_preview_deck(content)
-            dto = result['dto']
+            # 1. Stream-Parse, Validate & Stats
+            result = await scan_deck_stream(e.file.iterate(chunk_size=STREAM_READ_CHUNK))
+            dto = result['header']
             stats = result['stats']
+            preview_cards = result['preview']
             
             # Save to state for the next step
-            current_import_data['dto'] = dto
+            current_import_data['header'] = dto
+            current_import_data['file'] = e.file
+            current_import_data['card_count'] = stats['card_count']
 
             # 2. Build the Review UI (Step 3)
             review_container.clear()
@@ -54,7 +63,7 @@ def import_json_page():
                         # Badge: Card Count
                         with ui.row().classes('items-center bg-indigo-500/20 px-3 py-1 rounded-full border border-indigo-500/50'):
                             ui.icon('style', size='xs').classes('mr-2')
-                            ui.label(T("card_count_info", count=len(dto.cards))).classes('font-bold')
+                            ui.label(T("card_count_info", count=stats['card_count'])).classes('font-bold')
 
                 # -- STATS GRID --
                 with ui.grid(columns=2).classes('w-full gap-4 mt-4'):
@@ -81,10 +90,14 @@ def import_json_page():
                             ui.label(T("no_sources_detected")).classes('text-gray-600 italic text-sm')
 
                 # -- COLLAPSIBLE PREVIEW --
-                with ui.expansion(T("view_all_cards", card_count=len(dto.cards)), icon="visibility").classes('w-full mt-4 bg-black/20 rounded-lg border border-white/10').props("header-class='text-indigo-300'"):
+                if len(preview_cards) < stats['card_count']:
+                    preview_title = T("view_first_cards", shown=len(preview_cards), card_count=stats['card_count'])
+                else:
+                    preview_title = T("view_all_cards", card_count=stats['card_count'])
+                with ui.expansion(preview_title, icon="visibility").classes('w-full mt-4 bg-black/20 rounded-lg border border-white/10').props("header-class='text-indigo-300'"):
                      with ui.scroll_area().classes('h-64 w-full preview-scroll p-2'):
                          with ui.column().classes('gap-2 w-full'):
-                             for i, card in enumerate(dto.cards, 1):
+                             for i, card in enumerate(preview_cards, 1):
                                  with ui.row().classes('w-full items-start p-2 bg-black/30 rounded border border-white/5'):
                                      ui.label(f"#{i}").classes('text-gray-500 text-xs mt-1 mr-2 w-6')
                                      with ui.column().classes('w-full'):
@@ -92,7 +105,7 @@ def import_json_page():
                                          front_preview = (card.front_content[:75] + '...') if len(card.front_content) > 75 else card.front_content
                                          ui.markdown(front_preview).classes('text-sm text-gray-200')
 
-            ui.notify(T("import_json_step2_success", deck_title=dto.title, card_count=len(dto.cards)), type='positive')
+            ui.notify(T("import_json_step2_success", deck_title=dto.title, card_count=stats['card_count']), type='positive')
             stepper_element.next() # Go to Step 3
 
         except ValueError as err:
@@ -102,17 +115,69 @@ def import_json_page():
             ui.notify("Error parsing file", type='negative')
 
     async def finalize_import(stepper_element):
-        """Step 3 -> Step 4: Save to DB"""
-        if not current_import_data['dto']:
+        """Step 3 -> Step 4: Queue the import as a background job and poll it"""
+        if not current_import_data['header']:
             return
 
         user_id = app.storage.user.get('id')
+        confirm_btn.disable()
         try:
-            deck_title = save_dto_to_db(user_id, current_import_data['dto'])
-            ui.notify(T("import_json_step3_success", deck_title=deck_title), type='positive')
-            stepper_element.next() # Go to Step 4
+            job_id = await submit_import_job(
+                user_id,
+                current_import_data['header'],
+                current_import_data['file'],
+                current_import_data['card_count']
+            )
+        except ImportQueueFullError as e:
+            ui.notify(str(e), type='warning')
+            confirm_btn.enable()
+            return
         except Exception as e:
             ui.notify(f"{T('import_json_step3_db_error')}{e}", type='negative')
+            confirm_btn.enable()
+            return
+
+        current_import_data['header'] = None
+        current_import_data['file'] = None
+        save_progress_row.set_visibility(True)
+        save_progress_bar.set_value(0)
+        save_progress_label.set_text(T("import_json_queued"))
+
+        def stop_polling(message):
+            """Ends the polling of a job we can no longer follow (the page stays usable)."""
+            poll_timer.cancel()
+            confirm_btn.enable()
+            save_progress_row.set_visibility(False)
+            ui.notify(message, type='negative')
+
+        async def poll_job():
+            try:
+                job = await run.io_bound(get_import_job, user_id, job_id)
+            except Exception as e:
+                logger.error(f"Polling import job {job_id} failed: {e}")
+                stop_polling(f"{T('import_json_step3_db_error')}{e}")
+                return
+            if not job:
+                stop_polling(T("import_json_job_not_found"))
+                return
+
+            total = job['cards_total']
+            if job['status'] == ImportJobStatus.QUEUED.value:
+                save_progress_label.set_text(T("import_json_queued"))
+            elif job['status'] == ImportJobStatus.RUNNING.value:
+                save_progress_bar.set_value(min(job['cards_written'] / total, 1.0) if total else 0.0)
+                save_progress_label.set_text(T("import_json_saving_progress", done=job['cards_written'], total=total))
+            else:
+                poll_timer.cancel()
+                confirm_btn.enable()
+                save_progress_row.set_visibility(False)
+                if job['status'] == ImportJobStatus.DONE.value:
+                    ui.notify(T("import_json_step3_success", deck_title=job['deck_title']), type='positive')
+                    stepper_element.next() # Go to Step 4
+                else:
+                    ui.notify(f"{T('import_json_step3_db_error')}{job['error']}", type='negative')
+
+        poll_timer = ui.timer(JOB_POLL_INTERVAL, poll_job)
 
     with ui.column().classes('w-screen min-h-screen gradient-bg text-white p-8 overflow-y-auto overflow-x-auto'):
         
@@ -137,7 +202,7 @@ def import_json_page():
                     ui.markdown(T("import_json_step_2_desc")).classes('text-lg text-gray-300 leading-relaxed')
                     ui.upload(
                         on_upload=lambda e: handle_parsing(e, stepper),
-                        max_file_size=1_000_000, 
+                        max_file_size=MAX_UPLOAD_BYTES, 
                         multiple=False,
                         auto_upload=True
                     ).props('accept=".json" color="indigo-10" flat bordered').classes('w-full mt-4 bg-black/40 rounded-md')
@@ -147,10 +212,16 @@ def import_json_page():
                 with ui.step("import_json_step3", T("import_json_step_3_title")).classes('text-md text-gray-300 leading-relaxed'):
                     ui.markdown(T("import_json_step_3_desc")).classes('text-lg text-gray-300 leading-relaxed')
                     review_container = ui.column().classes('w-full')
+                    # Import job progress (visible while the job is queued/running)
+                    with ui.column().classes('w-full mt-4 gap-1') as save_progress_row:
+                        save_progress_label = ui.label("").classes('text-sm text-gray-400 font-mono')
+                        save_progress_bar = ui.linear_progress(value=0, show_value=False)\
+                            .props('size="10px" color="green-5" track-color="grey-8" rounded')
+                    save_progress_row.set_visibility(False)
                     # Navigation
                     with ui.row().classes('mt-6 w-full justify-between'):
                         ui.button(T("cancel_or_reupload"), icon="arrow_upward", on_click=stepper.previous).classes('border border-red-500 text-red-400 transparent')
-                        ui.button(T("confirm_import"), icon="check_circle", on_click=lambda: finalize_import(stepper)).classes('bg-green-600 text-white hover:bg-green-500')
+                        confirm_btn = ui.button(T("confirm_import"), icon="check_circle", on_click=lambda: finalize_import(stepper)).classes('bg-green-600 text-white hover:bg-green-500')
 
                 # STEP 4: SUCCESS
                 with ui.step("import_json_step4", T("import_json_step_4_title")).classes('text-md text-gray-300 leading-relaxed').props("active-color='green'"):
@@ -1,33 +1,68 @@
+from dataclasses import replace
 from nicegui import ui, app
 from math import ceil
 from src.pages.common import setup_page, create_navbar
 from src.core.locale_manager import T
-from src.services.deck_service import get_public_decks, activate_deck, is_already_active
+from src.core.sql_profiler import profiled
+from src.schemas import LibraryFilters
+from src.services.popularity_service import LIBRARY_SORTS, DEFAULT_LIBRARY_SORT
+from src.services.deck_service import get_public_decks_async, search_public_decks_async, get_library_facets_async, activate_deck_async
 
 # Constants
 PAGE_SIZE = 9
+SEARCH_DEBOUNCE_MS = 300        # Typing pause before a search runs
 
 # We don't need the global handle_add_deck anymore, 
 # logic is moved inside render_deck_card to access UI elements
 
 @ui.page('/app/public-library')
-def public_library_page():
+@profiled('page:/app/public-library')
+async def public_library_page():
     if not setup_page(restricted=True):
         return
     create_navbar()
     ui.add_css('assets/global.css')
     
     # --- UI State ---
+    # Keyset pagination: we only move to the neighbouring page through its cursor
     current_page = 1
+    current_cursor = None
+    page_info = {"total": 0, "next_cursor": None, "prev_cursor": None}
+    search_text = ""
+    filters = LibraryFilters()  # Facet selection
+    sort = DEFAULT_LIBRARY_SORT # Listing order (searches rank by relevance)
+    search_request = 0          # Responses of superseded searches are dropped
     
     # Containers
     with ui.column().classes('w-screen h-screen gradient-bg overflow-auto pb-10 pt-6') as page_container:
+            # Outside content_area: refreshing the grid must not rebuild (and blur) the search box
+            with ui.row().classes('w-full max-w-6xl mx-auto px-6 pt-6'):
+                ui.input(placeholder=T("search_public_decks"), on_change=lambda e: on_search(e.value)) \
+                    .props(f'dark outlined dense clearable debounce={SEARCH_DEBOUNCE_MS}') \
+                    .classes('w-full md:w-96') \
+                    .add_slot('prepend', '<q-icon name="search" />')
             content_area = ui.column().classes('w-full max-w-6xl mx-auto p-6 gap-6')
     
-    def refresh_grid():
-        """Reloads the grid based on current_page."""       
-        decks, total_count = get_public_decks(page=current_page, page_size=PAGE_SIZE)
-        total_pages = ceil(total_count / PAGE_SIZE) if total_count > 0 else 1
+    @profiled('public_library.refresh_grid')
+    async def refresh_grid():
+        """Reloads the grid based on current_cursor."""
+        nonlocal current_page, page_info, search_request
+        search_request += 1
+        request = search_request
+        # Membership comes flagged on every row: no per-card query
+        user_id = app.storage.user.get('id')
+        if search_text:
+            decks, info = await search_public_decks_async(search_text, current_cursor, PAGE_SIZE, user_id, filters)
+        else:
+            decks, info = await get_public_decks_async(current_cursor, PAGE_SIZE, user_id, filters, sort)
+        facets = await get_library_facets_async()
+        if request != search_request:
+            return
+        page_info = info
+        if not page_info["prev_cursor"]:
+            current_page = 1
+        # The total is cached (approximate): never show fewer pages than we have walked
+        total_pages = max(ceil(page_info["total"] / PAGE_SIZE), current_page, 1)
         
         with page_container:
             content_area.clear()
@@ -37,29 +72,75 @@ def public_library_page():
                     with ui.column().classes('gap-1'):
                         ui.label(T("public_library_page_title")).classes('text-4xl font-bold text-white')
                         ui.label(T("public_library_page_subtitle")).classes('text-gray-400')
-                    ui.label(T("page_info", current_page=current_page, total_pages=total_pages)).classes('text-gray-500 font-mono text-sm')
-
-                # -- Grid --
-                if not decks:
-                    with ui.column().classes('w-full items-center justify-center py-20 opacity-50'):
-                        ui.icon('sentiment_dissatisfied', size='4rem').classes('text-gray-600')
-                        ui.label(T("no_public_decks_found")).classes('text-xl text-gray-500 mt-4')
-                else:
-                    with ui.grid(columns='1', rows='1').classes('w-full sm:grid-cols-2 lg:grid-cols-3 gap-6'):
-                        for deck in decks:
-                            render_deck_card(deck)
+                    with ui.row().classes('items-center gap-4'):
+                        if not search_text:
+                            ui.select(
+                                {key: T(f"sort_{key}") for key in LIBRARY_SORTS}, value=sort, label=T("sort_by"),
+                                on_change=lambda e: set_sort(e.value)
+                            ).props('dark outlined dense options-dense').classes('w-40')
+                        ui.label(T("page_info", current_page=current_page, total_pages=total_pages)).classes('text-gray-500 font-mono text-sm')
+
+                with ui.row().classes('w-full gap-6 items-start no-wrap'):
+                    # -- Facet Sidebar (precomputed counts) --
+                    render_facets(facets)
+
+                    with ui.column().classes('flex-1 min-w-0 gap-6'):
+                        # -- Grid --
+                        if not decks:
+                            with ui.column().classes('w-full items-center justify-center py-20 opacity-50'):
+                                ui.icon('sentiment_dissatisfied', size='4rem').classes('text-gray-600')
+                                ui.label(T("no_search_results") if search_text or filters else T("no_public_decks_found")).classes('text-xl text-gray-500 mt-4')
+                        else:
+                            with ui.grid(columns='1', rows='1').classes('w-full sm:grid-cols-2 lg:grid-cols-3 gap-6'):
+                                for deck in decks:
+                                    render_deck_card(deck)
                 
-                # -- Pagination Controls --
-                if total_pages > 1:
-                    with ui.row().classes('w-full justify-center gap-4 mt-8'):
-                        ui.button(icon='chevron_left', on_click=lambda: change_page(-1)) \
-                            .props(f'flat round color=white {"disabled" if current_page <= 1 else ""}')
+                        # -- Pagination Controls --
+                        if page_info["prev_cursor"] or page_info["next_cursor"]:
+                            with ui.row().classes('w-full justify-center gap-4 mt-8'):
+                                ui.button(icon='chevron_left', on_click=lambda: change_page(-1)) \
+                                    .props(f'flat round color=white {"disabled" if not page_info["prev_cursor"] else ""}')
                         
-                        # (Pagination logic omitted for brevity, same as your code)
-                        ui.label(f"{current_page} / {total_pages}").classes('text-white self-center') # Simplified for snippet
+                                ui.label(f"{current_page} / {total_pages}").classes('text-white self-center')
+
+                                ui.button(icon='chevron_right', on_click=lambda: change_page(1)) \
+                                    .props(f'flat round color=white {"disabled" if not page_info["next_cursor"] else ""}')
+
+    def render_facets(facets):
+        """Sidebar: one entry per facet value with its public deck count; a click toggles it."""
+        def facet_entry(label, count, selected, on_click):
+            color = 'text-indigo-300 bg-indigo-500/20' if selected else 'text-gray-400'
+            with ui.row().classes(f'w-full justify-between items-center px-2 py-1 rounded cursor-pointer hover:bg-white/5 {color}') \
+                    .on('click', on_click):
+                ui.label(label).classes('text-sm truncate')
+                ui.label(str(count)).classes('text-xs font-mono opacity-70')
+
+        with ui.column().classes('w-56 shrink-0 gap-4 hidden md:flex'):
+            if filters:
+                ui.button(T("clear_filters"), icon='filter_alt_off', on_click=lambda: set_filters(LibraryFilters())) \
+                    .props('flat dense no-caps color=indigo').classes('text-sm')
+
+            with ui.column().classes('w-full gap-1'):
+                ui.label(T("filter_languages")).classes('text-xs uppercase tracking-wider text-gray-500 mb-1')
+                for front, back, count in facets["language_pairs"]:
+                    selected = (filters.front_language, filters.back_language) == (front, back)
+                    pair = LibraryFilters() if selected else replace(filters, front_language=front, back_language=back)
+                    facet_entry(f"{front.upper()} → {back.upper()}", count, selected, lambda _, f=pair: set_filters(f))
 
-                        ui.button(icon='chevron_right', on_click=lambda: change_page(1)) \
-                            .props(f'flat round color=white {"disabled" if current_page >= total_pages else ""}')
+            with ui.column().classes('w-full gap-1'):
+                ui.label(T("filter_deck_size")).classes('text-xs uppercase tracking-wider text-gray-500 mb-1')
+                for bucket, count in facets["sizes"]:
+                    selected = filters.size == bucket
+                    size = replace(filters, size=None if selected else bucket)
+                    facet_entry(T(f"deck_size_{bucket}"), count, selected, lambda _, f=size: set_filters(f))
+
+            if facets["tags"]:
+                with ui.column().classes('w-full gap-1'):
+                    ui.label(T("filter_tags")).classes('text-xs uppercase tracking-wider text-gray-500 mb-1')
+                    for tag_id, name, count in facets["tags"]:
+                        selected = filters.tag_id == tag_id
+                        tag = replace(filters, tag_id=None if selected else tag_id)
+                        facet_entry(name, count, selected, lambda _, f=tag: set_filters(f))
 
     def render_deck_card(deck):
         """Renders a single deck card."""
@@ -70,15 +151,15 @@ def public_library_page():
                 with ui.row().classes('w-full justify-between items-start'):
                     # Languages Badge
                     with ui.row().classes('items-center gap-1 bg-white/5 px-2 py-0.5 rounded text-xs text-indigo-300 border border-white/5'):
-                        ui.label(deck['front_lang'].upper())
+                        ui.label(deck.front_lang.upper())
                         ui.icon('arrow_forward', size='xs').classes('opacity-50')
-                        ui.label(deck['back_lang'].upper())
+                        ui.label(deck.back_lang.upper())
 
-                    ui.label(f"ID: {deck['id']}").classes('text-[10px] text-gray-600 italic font-mono')
-                    ui.label(deck['timestamp']).classes('text-[10px] text-gray-600 italic font-mono')
+                    ui.label(f"ID: {deck.id}").classes('text-[10px] text-gray-600 italic font-mono')
+                    ui.label(deck.timestamp).classes('text-[10px] text-gray-600 italic font-mono')
 
-                ui.label(deck['title']).classes('text-xl font-bold text-gray-100 leading-tight line-clamp-1')
-                ui.label(deck['description'] or "No description provided.").classes('text-sm text-gray-400 line-clamp-3 leading-snug')
+                ui.label(deck.title).classes('text-xl font-bold text-gray-100 leading-tight line-clamp-1')
+                ui.label(deck.description or "No description provided.").classes('text-sm text-gray-400 line-clamp-3 leading-snug')
 
             # --- Bottom Section ---
             with ui.column().classes('w-full gap-3 mt-auto'):
@@ -87,11 +168,15 @@ def public_library_page():
                 with ui.row().classes('w-full items-center gap-4 text-xs text-gray-500'):
                     with ui.row().classes('items-center gap-1'):
                         ui.icon('style', size='xs')
-                        ui.label(T("card_count_info", count=deck['card_count']))
+                        ui.label(T("card_count_info", count=deck.card_count))
                     
                     with ui.row().classes('items-center gap-1'):
                         ui.icon('person', size='xs')
-                        ui.label(deck['author']).classes('truncate max-w-[100px]')
+                        ui.label(deck.author).classes('truncate max-w-[100px]')
+
+                    with ui.row().classes('items-center gap-1'):
+                        ui.icon('group', size='xs')
+                        ui.label(T("adoption_count_info", count=deck.adoption_count))
 
                 # --- Dynamic Action Button Container ---
                 # We define a container specifically for the button/label area
@@ -101,7 +186,7 @@ def public_library_page():
                         """Helper to render the static label."""
                         ui.label("Already in Bookshelf").classes('text-sm text-green-400 italic')
 
-                    def on_add_click():
+                    async def on_add_click():
                         """Local handler that has access to 'action_container'."""
                         user_id = app.storage.user.get('id')
                         if not user_id:
@@ -109,7 +194,7 @@ def public_library_page():
                             return
 
                         # 1. Call Backend
-                        success = activate_deck(user_id, deck['id'])
+                        success = await activate_deck_async(user_id, deck.id)
                         
                         if success:
                             ui.notify(T("added_successfully2bookshelf"), type='positive')
@@ -122,7 +207,7 @@ def public_library_page():
                             ui.notify(T("error_adding_deck2bookshelf"), type='negative')
 
                     # Initial Render Logic
-                    if is_already_active(app.storage.user.get('id'), deck['id']):
+                    if deck.on_bookshelf:
                         render_already_added()
                     else:
                         ui.button(T("add_to_bookshelf"), icon="bookmark_add", on_click=on_add_click) \
@@ -130,15 +215,44 @@ def public_library_page():
                             .classes('text-sm font-semibold hover:bg-indigo-500/10 px-3 rounded')
 
     # --- Event Handlers ---
-    def change_page(delta):
-        nonlocal current_page
-        current_page += delta
-        refresh_grid()
+    async def set_filters(new_filters):
+        """Applies a facet selection from the first page (cursors belong to one selection)."""
+        nonlocal filters, current_cursor, current_page
+        filters = new_filters
+        current_cursor = None
+        current_page = 1
+        await refresh_grid()
 
-    def set_page(page_num):
-        nonlocal current_page
-        current_page = page_num
-        refresh_grid()
+    async def set_sort(new_sort):
+        """Switches the listing order from the first page (cursors belong to one ordering)."""
+        nonlocal sort, current_cursor, current_page
+        if new_sort == sort:
+            return
+        sort = new_sort
+        current_cursor = None
+        current_page = 1
+        await refresh_grid()
+
+    async def on_search(text):
+        """Runs a new search (or back to the full listing) from the first page."""
+        nonlocal search_text, current_cursor, current_page
+        text = (text or "").strip()
+        if text == search_text:
+            return
+        search_text = text
+        current_cursor = None
+        current_page = 1
+        await refresh_grid()
+
+    async def change_page(delta):
+        """Moves one page forward (+1) or back (-1) through the cursors of the current page."""
+        nonlocal current_page, current_cursor
+        target = page_info["next_cursor"] if delta > 0 else page_info["prev_cursor"]
+        if not target:
+            return
+        current_cursor = target
+        current_page += delta
+        await refresh_grid()
 
     # Initial Load
-    refresh_grid()
+    await refresh_grid()
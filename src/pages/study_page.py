@@ -1,33 +1,47 @@
+import asyncio
+import time
 from typing import List, Optional, Dict
-from nicegui import ui, app, events
+from nicegui import ui, app, events, background_tasks
 from sqlmodel import select
 
 from src.pages.common import setup_page, create_navbar
 from src.core.locale_manager import T
 from src.core.log_manager import logger
+from src.core.sql_profiler import profiled
+from src.core.prefetch import PrefetchPlanner
 from src.database import create_session
-from src.models import ActiveDeck, Tag, CardTagLink, Card
+from src.models import ActiveDeck, Tag, CardTagLink
+from src.schemas import CardView
 
 from src.services.study_service import (
-    initialize_session, 
-    get_next_batch, 
-    update_session_state, 
-    finalize_session,
+    initialize_session_async, 
+    count_matching_cards_async,
+    get_next_batch_async, 
+    update_session_state_async, 
+    finalize_session_async,
 )
-from src.services.deck_service import get_study_metadata
+from src.services.deck_service import get_study_metadata_async
 
 class StudyPageState:
     def __init__(self):
-        self.current_card: Optional[Card] = None
+        self.current_card: Optional[CardView] = None
         self.is_revealed: bool = False
+        self.shown_at: Optional[float] = None # monotonic time the current card appeared (answer latency)
+        self.is_loading: bool = False # True while an answer awaits the next card
         self.combo: int = 0
         self.total_cards: int = 0
         self.cards_done: int = 0
         self.active_deck_title: str = "Loading..."
         self.available_tags: Dict[int, str] = {}
+        # Card buffer refills (see core/prefetch.py)
+        self.prefetch = PrefetchPlanner()
+        self.prefetch_task: Optional[asyncio.Task] = None
+        self.queue_exhausted: bool = False # Last fetch came back empty (reset when a MISS requeues a card)
+        self.fetch_generation: int = 0     # Bumped per requeued MISS: older empty fetches can't end the run
 
 @ui.page('/app/study')
-def study_page(deck_id: int = None):
+@profiled('page:/app/study')
+async def study_page(deck_id: int = None):
     # 1. Security & Setup
     if not setup_page(restricted=True, remove_url_params=True):
         return
@@ -42,12 +56,13 @@ def study_page(deck_id: int = None):
     
     # --- STATE & INITIALIZATION ---
     state = StudyPageState()
-    local_buffer: List[Card] = []
+    local_buffer: List[CardView] = []
+    page_client = ui.context.client # UI context for the background refills
 
     # 2. Fetch Deck Metadata
     try:
         user_id = app.storage.user.get('id')
-        metadata = get_study_metadata(user_id, deck_id)
+        metadata = await get_study_metadata_async(user_id, deck_id)
 
         if not metadata:
             logger.warning(f"Unauthorized access attempt to Deck {deck_id} by User {user_id}")
@@ -77,6 +92,9 @@ def study_page(deck_id: int = None):
     combo_label = None
     final_score_label = None
     stepper = None
+    match_count_label = None
+    start_btn = None
+    count_request = 0 # Latest live count request (older answers are dropped)
 
     DIFFICULTY_MAP = {
         1: ('spa', 'text-blue-400'),            # Easiest
@@ -88,7 +106,7 @@ def study_page(deck_id: int = None):
 
     # --- LOGIC CONTROLLERS ---
 
-    def render_hud(card: Card):
+    def render_hud(card: CardView):
         """Updates the Header icons based on the current card."""
         if not hud_container: return
         
@@ -107,19 +125,44 @@ def study_page(deck_id: int = None):
             icon_name, color_class = DIFFICULTY_MAP.get(diff, ('bolt', 'text-gray-500'))
             ui.icon(icon_name, size='sm').classes(f'{color_class} opacity-80')
 
-    def fill_buffer():
+    async def fill_buffer():
+        """Fetches one batch, sized from the observed answer pace and fetch latency."""
+        started = time.monotonic()
+        generation = state.fetch_generation
         try:
-            more_cards = get_next_batch(batch_size=5)
-            if more_cards:
-                local_buffer.extend(more_cards)
-                logger.info(f"Buffer refilled. +{len(more_cards)} cards.")
+            more_cards = await get_next_batch_async(batch_size=state.prefetch.batch_size())
         except Exception as e:
             logger.error(f"Failed to fetch batch: {e}")
-            ui.notify("Network error: Could not fetch cards.", type='negative')
+            with page_client:
+                ui.notify("Network error: Could not fetch cards.", type='negative')
+            return
+
+        state.prefetch.record_fetch(time.monotonic() - started)
+        if more_cards:
+            local_buffer.extend(more_cards)
+            logger.info(f"Buffer refilled. +{len(more_cards)} cards.")
+        elif generation == state.fetch_generation:
+            # A fetch issued before a MISS was requeued may come back empty: only a current one ends the run
+            state.queue_exhausted = True
+
+    def schedule_prefetch():
+        """Tops the buffer up in the background once it drops below the low water mark (one fetch in flight)."""
+        if state.queue_exhausted or len(local_buffer) >= state.prefetch.low_water():
+            return
+        if state.prefetch_task and not state.prefetch_task.done():
+            return
+        state.prefetch_task = background_tasks.create(fill_buffer(), name='study-prefetch')
+
+    async def wait_for_cards():
+        """Only blocks when the buffer is empty: joins the running prefetch, or fetches directly."""
+        if state.prefetch_task and not state.prefetch_task.done():
+            await state.prefetch_task
+        if not local_buffer and not state.queue_exhausted:
+            await fill_buffer()
 
-    def finish_run():
+    async def finish_run():
         try:
-            finalize_session()
+            await finalize_session_async()
         except Exception as e:
             logger.error(f"Error finalizing session: {e}")
             
@@ -127,13 +170,13 @@ def study_page(deck_id: int = None):
         if final_score_label: 
             final_score_label.set_text(T("session_complete_msg").format(count=state.cards_done))
 
-    def load_next_card():
+    async def load_next_card():
         if not local_buffer:
-            fill_buffer()
+            await wait_for_cards()
         
         if not local_buffer:
             logger.info("Buffer empty. Finishing run.")
-            finish_run()
+            await finish_run()
             return
 
         card = local_buffer.pop(0)
@@ -145,6 +188,7 @@ def study_page(deck_id: int = None):
         if back_content: back_content.set_content(card.back_content)
 
         render_hud(card)
+        state.shown_at = time.monotonic()
         
         # Reset View State
         if back_container: back_container.set_visibility(False)
@@ -161,11 +205,10 @@ def study_page(deck_id: int = None):
         if progress_label: progress_label.set_text(f"{state.cards_done} / {state.total_cards}")
         if progress_bar: progress_bar.set_value(progress_val)
         
-        if len(local_buffer) < 3:
-            fill_buffer()
+        schedule_prefetch()
 
     def reveal():
-        if state.is_revealed: return
+        if state.is_revealed or state.is_loading: return
         state.is_revealed = True
         
         if reveal_btn: reveal_btn.set_visibility(False)
@@ -179,18 +222,32 @@ def study_page(deck_id: int = None):
             emoji_lbl.classes(add='animate-bounce', remove='animate-pulse')
             emoji_lbl.update()
 
-    def submit_answer(result: str):
+    async def submit_answer(result: str):
         """
         result: 'KNOW' | 'MISS' | 'DISCARD'
         """
         if not state.current_card: 
             logger.warning("Attempted to submit answer with no current card.")
             return
+        if state.is_loading:
+            return # Ignore repeated input while the next card is being awaited
         
+        latency_ms = None
+        if state.shown_at is not None:
+            latency_ms = int((time.monotonic() - state.shown_at) * 1000)
+            state.prefetch.record_answer(latency_ms / 1000)
+
         try:
-            update_session_state(state.current_card.id, result)
+            await update_session_state_async(state.current_card.id, result, latency_ms)
         except Exception as e:
+            # Nothing was recorded: keep the card on screen so the answer can be sent again
             logger.error(f"Failed to update session state: {e}")
+            ui.notify(T("answer_not_saved"), type='warning')
+            return
+        if result == 'MISS':
+            # The missed card is now requeued server-side: fetches issued before this point are stale
+            state.fetch_generation += 1
+            state.queue_exhausted = False
         
         # Update Local State
         if result == 'KNOW':
@@ -205,36 +262,70 @@ def study_page(deck_id: int = None):
         
         if combo_label: combo_label.set_text(f"x{state.combo} COMBO")
         
-        load_next_card()
+        state.is_loading = True
+        try:
+            await load_next_card()
+        finally:
+            state.is_loading = False
 
-    async def start_run():
-        # Parse Inputs
+    def current_filters():
+        """Returns: (difficulty range, selected tag IDs or None, due only) from the setup inputs."""
         diff_range = (int(diff_slider.value['min']), int(diff_slider.value['max']))
         
         selected_tags = []
         if tag_select.value:
             selected_tags = [t_id for t_id, name in state.available_tags.items() if name in tag_select.value]
 
+        return diff_range, selected_tags or None, due_toggle.value
+
+    async def refresh_match_count():
+        """Live 'matching cards' feedback on every filter change (served from the deck's cached index)."""
+        nonlocal count_request
+        count_request += 1
+        request = count_request
+
+        diff_range, tag_ids, due_only = current_filters()
+        try:
+            count = await count_matching_cards_async(deck_id, diff_range, tag_ids, due_only)
+        except Exception as e:
+            logger.error(f"Failed to count matching cards: {e}")
+            return
+        if request != count_request:
+            return # A newer input change already has (or will have) its answer
+
+        if match_count_label: match_count_label.set_text(T("matching_cards").format(count=count))
+        if start_btn: start_btn.set_enabled(count > 0)
+
+    async def start_run():
+        # Parse Inputs
+        diff_range, selected_tags, due_only = current_filters()
         do_shuffle = shuffle_toggle.value
         
+        # A refill of a previous run must not land in (or advance) the new one
+        if state.prefetch_task and not state.prefetch_task.done():
+            await state.prefetch_task
+        local_buffer.clear()
+        state.queue_exhausted = False
+
         try:
-            total_count = initialize_session(
+            total_count = await initialize_session_async(
                 active_deck_id=deck_id,
                 difficulty_range=diff_range,
-                tag_ids=selected_tags if selected_tags else None,
-                shuffle=do_shuffle
+                tag_ids=selected_tags,
+                shuffle=do_shuffle,
+                due_only=due_only
             )
             state.total_cards = total_count
             state.cards_done = 0
             state.combo = 0
             
-            fill_buffer()
+            await fill_buffer()
             
             if not local_buffer:
                 ui.notify(T("no_cards_found_filter"), type='warning')
                 return
 
-            load_next_card()
+            await load_next_card()
             if stepper: stepper.next()
             
         except Exception as e:
@@ -242,16 +333,16 @@ def study_page(deck_id: int = None):
             ui.notify(f"Could not start session: {str(e)}", type='negative')
 
     # --- KEYBOARD ---
-    def handle_key(e: events.KeyEventArguments):
+    async def handle_key(e: events.KeyEventArguments):
         if not stepper or stepper.value != 'step_arena': return
         if not e.action.keydown: return
         
         if not state.is_revealed:
             if e.key == ' ': reveal()
         else:
-            if e.key == '1' or e.key == 'ArrowLeft': submit_answer('MISS')
-            elif e.key == '2' or e.key == 'ArrowRight': submit_answer('KNOW')
-            elif e.key == 'ArrowDown': submit_answer('DISCARD')
+            if e.key == '1' or e.key == 'ArrowLeft': await submit_answer('MISS')
+            elif e.key == '2' or e.key == 'ArrowRight': await submit_answer('KNOW')
+            elif e.key == 'ArrowDown': await submit_answer('DISCARD')
 
     keyboard = ui.keyboard(on_key=handle_key)
 
@@ -295,11 +386,16 @@ def study_page(deck_id: int = None):
                         tag_select.value = []
 
                     shuffle_toggle = ui.switch(T("shuffle_deck"), value=True).props('color="green"')
+                    due_toggle = ui.switch(T("due_cards_only"), value=False).props('color="green"')
 
-                    with ui.row().classes('w-full justify-end mt-4'):
-                        ui.button(T("start_studying"), on_click=start_run, icon='play_arrow')\
+                    with ui.row().classes('w-full justify-between items-center mt-4'):
+                        match_count_label = ui.label("").classes('text-sm font-mono text-indigo-200')
+                        start_btn = ui.button(T("start_studying"), on_click=start_run, icon='play_arrow')\
                             .classes('bg-indigo-600 hover:bg-indigo-500 text-white font-bold')
 
+                    for filter_input in (diff_slider, tag_select, due_toggle):
+                        filter_input.on_value_change(refresh_match_count)
+
             # --- STEP 2: ARENA ---
             with ui.step(name='step_arena', title=T("focus_mode")).props("active-icon='quiz'"):
                 
@@ -355,3 +451,6 @@ def study_page(deck_id: int = None):
                     
                     ui.button(T("return2bookshelf"), on_click=lambda: ui.navigate.to('/app/my-bookshelf')) \
                         .classes('bg-indigo-600 text-white px-8 py-2 text-lg font-bold shadow-lg hover:scale-105 transition-transform')
+
+    # Initial count for the default filters
+    await refresh_match_count()
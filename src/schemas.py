@@ -1,6 +1,8 @@
 # src/schemas.py
 from pydantic import BaseModel, Field, field_validator
-from typing import List, Optional, Dict, TypedDict
+from dataclasses import dataclass
+from datetime import datetime
+from typing import List, Optional, Dict, Tuple, TypedDict
 
 class CardImportDTO(BaseModel):
     front_content: str
@@ -9,13 +11,23 @@ class CardImportDTO(BaseModel):
     base_difficulty: Optional[int] = 3
     source: Optional[str] = None
 
-class DeckImportDTO(BaseModel):
+class DeckMetadataDTO(BaseModel):
+    """
+    Deck-level fields of an import file (everything but the cards).
+    Used on its own by the streaming import, which never holds the whole card list.
+    """
     title: str
     description: Optional[str] = ""
     is_public: bool = False
     version: int = 1
     front_language: str = "en"
     back_language: str = "en"
+
+class DeckImportDTO(DeckMetadataDTO):
+    """
+    Fully in-memory import (cards included). Capped, since the whole file is held at once;
+    large decks go through the streaming import instead.
+    """
     cards: List[CardImportDTO]
 
     @field_validator('cards')
@@ -32,22 +44,64 @@ class SessionStats(TypedDict):
     combo: int
     mistakes: Dict[str, int]  # {"card_id": count}
 
-class SessionState(TypedDict):
-    """
-    The 'Hot State' stored in app.storage.user.
-    It tracks the Master Queue and the Server's cursor position.
-    """
+# --- READ MODELS (Immutable, shared between clients) ---
+# Built by the services from column-level selects: no ORM instance state per row.
+
+@dataclass(frozen=True, slots=True)
+class CardView:
+    """What the study loop needs of a Card: no ORM instance state, safe to share across sessions."""
+    id: int
     deck_id: int
-    
-    # All Card IDs for this run, in order.
-    queue: List[int]
-    
-    # "Server Anchor".
-    # Tracks how many cards have been dispensed (buffered) to the frontend.
-    # We use this to know where to slice the queue for the NEXT batch request.
-    fetch_index: int 
-    
-    stats: SessionStats
-    
-    # Timestamp string (ISO format) for analytics later
-    start_time: str
+    front_content: str
+    back_content: str
+    base_difficulty: int
+
+@dataclass(frozen=True, slots=True)
+class LibraryFilters:
+    """Public library facet selection (None = any). Hashable: part of the page cache key."""
+    front_language: Optional[str] = None
+    back_language: Optional[str] = None
+    size: Optional[str] = None          # Key of facet_service.DECK_SIZE_BUCKETS
+    tag_id: Optional[int] = None
+
+    def __bool__(self) -> bool:
+        return any(v is not None for v in (self.front_language, self.back_language, self.size, self.tag_id))
+
+@dataclass(frozen=True, slots=True)
+class DeckSummary:
+    """One deck of the public library grid."""
+    id: int
+    title: str
+    description: Optional[str]
+    author: str
+    created_at: datetime
+    front_lang: str
+    back_lang: str
+    card_count: int
+    adoption_count: int = 0             # Bookshelves holding the deck
+    on_bookshelf: bool = False          # Already active for the requesting user
+
+    @property
+    def timestamp(self) -> str:
+        return self.created_at.strftime("%Y-%m-%d")
+
+@dataclass(frozen=True, slots=True)
+class ActiveDeckSummary:
+    """One deck of the user's bookshelf, with its precomputed study stats."""
+    active_id: int
+    deck_id: int
+    title: str
+    description: Optional[str]
+    front_lang: str
+    back_lang: str
+    is_favorite: bool
+    total_sessions: int
+    last_played_at: Optional[datetime]
+    card_count: int
+    accuracy: Optional[int]             # % of KNOW among graded answers (None = never graded)
+    mastered_cards: int
+    hardest_cards: Tuple[Dict, ...]     # ({"card_id", "lapses", "front"}, ...)
+
+    @property
+    def last_played(self) -> str:
+        return self.last_played_at.strftime("%Y-%m-%d") if self.last_played_at else "Never"
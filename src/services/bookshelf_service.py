@@ -2,54 +2,123 @@
 from typing import List, Tuple, Dict, Optional
 from sqlmodel import Session, select, func, col, delete
 from datetime import datetime
-from src.database import engine
-from src.models import ActiveDeck, Deck, User
+from src.database import engine, create_async_session
+from src.models import ActiveDeck, Deck, User, DeckStats
+from src.schemas import ActiveDeckSummary
+from src.core.pagination import apply_keyset, build_page, read_cursor, needs_first_page, listing_totals
+from src.core.sql_profiler import profiled
+from src.services.scheduler_service import delete_review_states
+from src.services.stats_service import delete_deck_stats, summarize_deck_stats
+from src.services.popularity_service import record_adoption
 
-def get_user_favorites(user_id: int) -> List[Dict]:
+# --- PAGINATION ---
+BOOKSHELF_KEY_LENGTH = 3        # Cursor = (last_played_at, created_at, id)
+# Sort value for never-played decks: keeps them last, and NULL-free keys compare correctly
+NEVER_PLAYED = datetime(1970, 1, 1)
+
+def bookshelf_total_key(user_id: int) -> tuple:
+    """Key of the user's bookshelf total in `listing_totals` (invalidate on add/remove)."""
+    return ("bookshelf", user_id)
+
+# --- STATEMENT BUILDERS (Shared by the sync and async variants) ---
+
+def _summaries_statement():
+    """Exactly the columns ActiveDeckSummary needs (column-level: no ORM instances are built)."""
+    return (
+        select(
+            ActiveDeck.id.label("active_id"),
+            ActiveDeck.deck_id,
+            Deck.title,
+            Deck.description,
+            Deck.front_language,
+            Deck.back_language,
+            ActiveDeck.is_favorite,
+            ActiveDeck.total_sessions_played,
+            ActiveDeck.last_played_at,
+            ActiveDeck.created_at,
+            Deck.card_count,            # Denormalized, no card loading
+            DeckStats.correct,          # Precomputed rollup, PK lookup (NULL if never studied)
+            DeckStats.wrong,
+            DeckStats.mastered_cards,
+            DeckStats.hardest_json,
+        )
+        .select_from(ActiveDeck)
+        .join(Deck, ActiveDeck.deck_id == Deck.id)
+        .outerjoin(DeckStats, DeckStats.active_deck_id == ActiveDeck.id)
+    )
+
+def _favorites_statement(user_id: int):
+    return (
+        _summaries_statement()
+        .where(ActiveDeck.user_id == user_id)
+        .where(ActiveDeck.is_favorite == True)
+        .order_by(col(ActiveDeck.last_played_at).desc())
+    )
+
+def _bookshelf_count_statement(user_id: int):
+    return select(func.count(ActiveDeck.id)).where(ActiveDeck.user_id == user_id)
+
+def _bookshelf_statement(user_id: int, cursor, page_size: int):
+    statement = (
+        _summaries_statement()
+        .where(ActiveDeck.user_id == user_id)
+    )
+    # Order by last played (most recent first), then created date; id breaks ties
+    sort_keys = (
+        func.coalesce(ActiveDeck.last_played_at, NEVER_PLAYED),
+        col(ActiveDeck.created_at),
+        col(ActiveDeck.id),
+    )
+    return apply_keyset(statement, sort_keys, cursor, page_size)
+
+def _bookshelf_key(row) -> tuple:
+    return (row.last_played_at or NEVER_PLAYED, row.created_at, row.active_id)
+
+def _owned_active_deck_statement(user_id: int, active_deck_id: int):
+    return select(ActiveDeck).where(
+        ActiveDeck.id == active_deck_id,
+        ActiveDeck.user_id == user_id
+    )
+
+# --- SYNC API ---
+
+@profiled()
+def get_user_favorites(user_id: int) -> List[ActiveDeckSummary]:
     """
     Fetches all active decks marked as favorite by the user.
     """
     with Session(engine) as session:
-        statement = (
-            select(ActiveDeck, Deck)
-            .join(Deck, ActiveDeck.deck_id == Deck.id)
-            .where(ActiveDeck.user_id == user_id)
-            .where(ActiveDeck.is_favorite == True)
-            .order_by(col(ActiveDeck.last_played_at).desc())
-        )
-        results = session.exec(statement).all()
+        results = session.exec(_favorites_statement(user_id)).all()
         return _serialize_active_decks(results)
 
+@profiled()
 def get_user_bookshelf(
-    user_id: int, 
-    page: int = 1, 
+    user_id: int,
+    cursor: Optional[str] = None,
     page_size: int = 9
-) -> Tuple[List[Dict], int]:
+) -> Tuple[List[ActiveDeckSummary], Dict]:
     """
-    Fetches ALL active decks for the user (Paginated).
-    Returns (Serialized List, Total Count).
+    Fetches ALL active decks for the user (Keyset-paginated).
+    cursor: Opaque token from a previous page_info (None = first page).
+    Returns (Serialized List, Page Info: 'total', 'next_cursor', 'prev_cursor').
     """
-    offset = (page - 1) * page_size
-    
+    position = read_cursor(cursor, BOOKSHELF_KEY_LENGTH)
     with Session(engine) as session:
-        # 1. Total Count
-        count_statement = select(func.count(ActiveDeck.id)).where(ActiveDeck.user_id == user_id)
-        total_count = session.exec(count_statement).one()
-        
+        # 1. Total Count (cached per user, invalidated on add/remove)
+        total_count = listing_totals.get(bookshelf_total_key(user_id))
+        if total_count is None:
+            total_count = session.exec(_bookshelf_count_statement(user_id)).one()
+            listing_totals.set(bookshelf_total_key(user_id), total_count)
+
         # 2. Fetch Data
-        statement = (
-            select(ActiveDeck, Deck)
-            .join(Deck, ActiveDeck.deck_id == Deck.id)
-            .where(ActiveDeck.user_id == user_id)
-            # Order by last played (most recent first), then created date
-            .order_by(col(ActiveDeck.last_played_at).desc(), col(ActiveDeck.created_at).desc())
-            .offset(offset)
-            .limit(page_size)
-        )
-        results = session.exec(statement).all()
-        
-        return _serialize_active_decks(results), total_count
+        results = session.exec(_bookshelf_statement(user_id, position, page_size)).all()
+        if needs_first_page(results, position, page_size):
+            position = None
+            results = session.exec(_bookshelf_statement(user_id, position, page_size)).all()
+
+        return _bookshelf_page(results, position, page_size, total_count)
 
+@profiled()
 def toggle_favorite_status(active_deck_id: int) -> bool:
     """
     Toggles the is_favorite boolean for a specific ActiveDeck.
@@ -59,55 +128,112 @@ def toggle_favorite_status(active_deck_id: int) -> bool:
         active_deck = session.get(ActiveDeck, active_deck_id)
         if not active_deck:
             return False
-            
+
         active_deck.is_favorite = not active_deck.is_favorite
         session.add(active_deck)
         session.commit()
         session.refresh(active_deck)
         return active_deck.is_favorite
 
-def _serialize_active_decks(results) -> List[Dict]:
-    """Helper to format SQL results into a UI-friendly dictionary."""
-    data = []
-    for active_row, deck_row in results:
-        # Format date safely
-        last_played = "Never"
-        if active_row.last_played_at:
-            last_played = active_row.last_played_at.strftime("%Y-%m-%d")
-
-        data.append({
-            "active_id": active_row.id,
-            "deck_id": deck_row.id,
-            "title": deck_row.title,
-            "description": deck_row.description,
-            "front_lang": deck_row.front_language,
-            "back_lang": deck_row.back_language,
-            "is_favorite": active_row.is_favorite,
-            "total_sessions": active_row.total_sessions_played,
-            "last_played": last_played,
-            "card_count": len(deck_row.cards) # Lazy load triggers here
-        })
-    return data
+def _bookshelf_page(rows, cursor, page_size: int, total_count: int) -> Tuple[List[ActiveDeckSummary], Dict]:
+    rows, next_cursor, prev_cursor = build_page(rows, cursor, page_size, _bookshelf_key)
+    page_info = {"total": total_count, "next_cursor": next_cursor, "prev_cursor": prev_cursor}
+    return _serialize_active_decks(rows), page_info
+
+def _serialize_active_decks(results) -> List[ActiveDeckSummary]:
+    """Builds the bookshelf read models straight from the selected columns."""
+    return [
+        ActiveDeckSummary(
+            active_id=row.active_id,
+            deck_id=row.deck_id,
+            title=row.title,
+            description=row.description,
+            front_lang=row.front_language,
+            back_lang=row.back_language,
+            is_favorite=row.is_favorite,
+            total_sessions=row.total_sessions_played,
+            last_played_at=row.last_played_at,
+            card_count=row.card_count,
+            **summarize_deck_stats(row.correct, row.wrong, row.mastered_cards, row.hardest_json)
+        )
+        for row in results
+    ]
 
+@profiled()
 def remove_deck_from_bookshelf(user_id: int, active_deck_id: int) -> bool:
     with Session(engine) as session:
         # 1. Fetch the Active Deck ensuring it belongs to the user
-        active_deck = session.exec(
-            select(ActiveDeck).where(
-                ActiveDeck.id == active_deck_id,
-                ActiveDeck.user_id == user_id
-            )
-        ).first()
+        active_deck = session.exec(_owned_active_deck_statement(user_id, active_deck_id)).first()
 
         if not active_deck:
             return False
 
-        # session.exec(
-        #         delete(StudyLog).where(StudyLog.active_deck_id == active_deck_id)
-        #     )
-            
-        # 3. Delete the Active Deck itself
+        # 2. Delete its scheduling data and stats (they reference it)
+        delete_review_states(session, active_deck_id)
+        delete_deck_stats(session, active_deck_id)
+
+        # 3. Delete the Active Deck itself and withdraw it from the deck's popularity
         session.delete(active_deck)
-        
+        record_adoption(session, active_deck.deck_id, active_deck.created_at, delta=-1)
+
         session.commit()
+        listing_totals.invalidate(bookshelf_total_key(user_id))
+        return True
+
+# --- ASYNC API (For NiceGUI handlers: awaits instead of blocking the event loop) ---
+
+@profiled()
+async def get_user_favorites_async(user_id: int) -> List[ActiveDeckSummary]:
+    """Async variant of `get_user_favorites`."""
+    async with create_async_session() as session:
+        results = (await session.exec(_favorites_statement(user_id))).all()
+        return _serialize_active_decks(results)
+
+@profiled()
+async def get_user_bookshelf_async(
+    user_id: int,
+    cursor: Optional[str] = None,
+    page_size: int = 9
+) -> Tuple[List[ActiveDeckSummary], Dict]:
+    """Async variant of `get_user_bookshelf`."""
+    position = read_cursor(cursor, BOOKSHELF_KEY_LENGTH)
+    async with create_async_session() as session:
+        total_count = listing_totals.get(bookshelf_total_key(user_id))
+        if total_count is None:
+            total_count = (await session.exec(_bookshelf_count_statement(user_id))).one()
+            listing_totals.set(bookshelf_total_key(user_id), total_count)
+
+        results = (await session.exec(_bookshelf_statement(user_id, position, page_size))).all()
+        if needs_first_page(results, position, page_size):
+            position = None
+            results = (await session.exec(_bookshelf_statement(user_id, position, page_size))).all()
+        return _bookshelf_page(results, position, page_size, total_count)
+
+@profiled()
+async def toggle_favorite_status_async(active_deck_id: int) -> bool:
+    """Async variant of `toggle_favorite_status`."""
+    async with create_async_session() as session:
+        active_deck = await session.get(ActiveDeck, active_deck_id)
+        if not active_deck:
+            return False
+
+        active_deck.is_favorite = not active_deck.is_favorite
+        session.add(active_deck)
+        await session.commit()
+        return active_deck.is_favorite
+
+@profiled()
+async def remove_deck_from_bookshelf_async(user_id: int, active_deck_id: int) -> bool:
+    """Async variant of `remove_deck_from_bookshelf`."""
+    async with create_async_session() as session:
+        active_deck = (await session.exec(_owned_active_deck_statement(user_id, active_deck_id))).first()
+        if not active_deck:
+            return False
+
+        await session.run_sync(delete_review_states, active_deck_id)
+        await session.run_sync(delete_deck_stats, active_deck_id)
+        await session.delete(active_deck)
+        await session.run_sync(record_adoption, active_deck.deck_id, active_deck.created_at, -1)
+        await session.commit()
+        listing_totals.invalidate(bookshelf_total_key(user_id))
         return True
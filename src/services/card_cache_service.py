@@ -0,0 +1,153 @@
+# src/services/card_cache_service.py
+import threading
+from collections import OrderedDict
+from typing import Dict, Hashable, Iterable, List, Set, Tuple
+from sqlmodel import Session, select, col
+from src.database import engine, create_async_session
+from src.models import Card, Deck
+from src.schemas import CardView
+from src.core.log_manager import logger
+from src.services.deck_index_service import deck_stamp
+
+# --- CONSTANTS ---
+CARD_CACHE_MAX_BYTES = 32 * 1024 * 1024     # Approximate bound (card text + per-entry overhead)
+ENTRY_OVERHEAD_BYTES = 240                  # CardView + LRU bookkeeping per entry (approx.)
+METRICS_LOG_EVERY = 1000                    # Batch lookups between two metrics log lines
+
+class CardCache:
+    """
+    Process-wide LRU of immutable CardViews keyed by card ID, bounded by (approximate) memory.
+    Every entry carries the stamp (Deck.version, Deck.card_count) of its deck; observing a
+    different stamp for a deck drops all of that deck's entries at once.
+    """
+
+    def __init__(self, max_bytes: int = CARD_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[int, Tuple[CardView, int]]" = OrderedDict()    # id -> (view, size)
+        self._deck_stamps: Dict[int, Hashable] = {}
+        self._deck_cards: Dict[int, Set[int]] = {}
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self._lookups = 0
+
+    # --- PUBLIC API ---
+
+    def observe_deck(self, deck_id: int, stamp: Hashable):
+        """Records the current stamp of a deck (seen on a DB read); stale entries of the deck are dropped."""
+        with self._lock:
+            self._observe(deck_id, stamp)
+
+    def get_many(self, card_ids: Iterable[int]) -> Dict[int, CardView]:
+        """Returns: The cached views among `card_ids` (refreshed as most recently used)."""
+        found: Dict[int, CardView] = {}
+        with self._lock:
+            for card_id in card_ids:
+                entry = self._entries.get(card_id)
+                if entry is None:
+                    self.misses += 1
+                    continue
+                self._entries.move_to_end(card_id)
+                found[card_id] = entry[0]
+                self.hits += 1
+            self._lookups += 1
+            log_metrics = self._lookups % METRICS_LOG_EVERY == 0
+        if log_metrics:
+            logger.info(f"Card cache: {self.stats()}")
+        return found
+
+    def put_many(self, rows: Iterable[Tuple[CardView, Hashable]]):
+        """rows: (view, stamp of its deck at read time)."""
+        with self._lock:
+            for view, stamp in rows:
+                self._observe(view.deck_id, stamp)
+                self._remove(view.id)
+                size = ENTRY_OVERHEAD_BYTES + len(view.front_content) + len(view.back_content)
+                self._entries[view.id] = (view, size)
+                self._deck_cards.setdefault(view.deck_id, set()).add(view.id)
+                self._bytes += size
+
+            while self._bytes > self.max_bytes and self._entries:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def stats(self) -> Dict:
+        """Metrics snapshot: hits, misses, hit_ratio, evictions, invalidations, entries, bytes."""
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 3) if lookups else 0.0,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+        }
+
+    # --- INTERNALS (caller holds the lock) ---
+
+    def _observe(self, deck_id: int, stamp: Hashable):
+        known = self._deck_stamps.get(deck_id)
+        if known == stamp:
+            return
+        if known is not None:
+            stale = self._deck_cards.pop(deck_id, set())
+            for card_id in stale:
+                self._remove(card_id)
+            self.invalidations += len(stale)
+        self._deck_stamps[deck_id] = stamp
+
+    def _remove(self, card_id: int):
+        entry = self._entries.pop(card_id, None)
+        if entry is None:
+            return
+        view, size = entry
+        self._bytes -= size
+        deck_cards = self._deck_cards.get(view.deck_id)
+        if deck_cards is not None:
+            deck_cards.discard(card_id)
+
+# Process-wide cache
+card_cache = CardCache()
+
+# --- LOADERS ---
+
+def _card_views_statement(card_ids: List[int]):
+    # Column-level select: no ORM instances; the deck stamp comes with the rows
+    return (
+        select(Card.id, Card.deck_id, Card.front_content, Card.back_content, Card.base_difficulty, Deck.version, Deck.card_count)
+        .join(Deck, Deck.id == Card.deck_id)
+        .where(col(Card.id).in_(card_ids))
+    )
+
+def _cache_rows(rows) -> Dict[int, CardView]:
+    loaded = [
+        (CardView(card_id, deck_id, front, back, difficulty), deck_stamp(version, card_count))
+        for card_id, deck_id, front, back, difficulty, version, card_count in rows
+    ]
+    card_cache.put_many(loaded)
+    return {view.id: view for view, _ in loaded}
+
+def get_card_views(card_ids: List[int]) -> Dict[int, CardView]:
+    """
+    Views of the given cards: served from the shared cache, the misses in one query.
+    Returns: card_id -> CardView (unknown IDs are absent).
+    """
+    views = card_cache.get_many(card_ids)
+    missing = [card_id for card_id in card_ids if card_id not in views]
+    if missing:
+        with Session(engine) as session:
+            views.update(_cache_rows(session.exec(_card_views_statement(missing)).all()))
+    return views
+
+async def get_card_views_async(card_ids: List[int]) -> Dict[int, CardView]:
+    """Async variant of `get_card_views`."""
+    views = card_cache.get_many(card_ids)
+    missing = [card_id for card_id in card_ids if card_id not in views]
+    if missing:
+        async with create_async_session() as session:
+            views.update(_cache_rows((await session.exec(_card_views_statement(missing))).all()))
+    return views
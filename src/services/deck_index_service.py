@@ -0,0 +1,88 @@
+# src/services/deck_index_service.py
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional, Tuple
+from sqlmodel import Session, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from src.models import Card, CardTagLink, Deck
+from src.core.bitmap_index import DeckBitmapIndex
+from src.core.log_manager import logger
+
+# --- CONSTANTS ---
+MAX_INDEXED_DECKS = 64      # LRU bound (an index costs ~ cards x (8 + tags / 8) bytes)
+
+# --- CACHE ---
+_indexes: "OrderedDict[int, DeckBitmapIndex]" = OrderedDict()
+_lock = threading.Lock()
+
+def deck_stamp(version: int, card_count: int) -> Tuple[int, int]:
+    """
+    Freshness stamp of a deck's cards (Deck.version + Deck.card_count): changes whenever
+    the deck is re-versioned or cards are added/removed (through adjust_deck_card_count).
+    Shared by every per-deck in-memory cache.
+    """
+    return (version, card_count)
+
+def _cards_statement(deck_id: int):
+    return select(Card.id, Card.base_difficulty).where(Card.deck_id == deck_id)
+
+def _links_statement(deck_id: int):
+    return (
+        select(CardTagLink.card_id, CardTagLink.tag_id)
+        .join(Card, Card.id == CardTagLink.card_id)
+        .where(Card.deck_id == deck_id)
+    )
+
+def _cached(deck_id: int, stamp) -> Optional[DeckBitmapIndex]:
+    with _lock:
+        index = _indexes.get(deck_id)
+        if index is None or index.stamp != stamp:
+            return None
+        _indexes.move_to_end(deck_id)
+        return index
+
+def _store(deck_id: int, index: DeckBitmapIndex, started: float) -> DeckBitmapIndex:
+    with _lock:
+        _indexes[deck_id] = index
+        _indexes.move_to_end(deck_id)
+        while len(_indexes) > MAX_INDEXED_DECKS:
+            _indexes.popitem(last=False)
+    logger.info(f"Built bitmap index of Deck {deck_id} ({len(index)} cards) in {(time.perf_counter() - started) * 1000:.1f} ms.")
+    return index
+
+# --- PUBLIC API ---
+
+def get_deck_index(session: Session, deck_id: int) -> Optional[DeckBitmapIndex]:
+    """
+    Filter index of a deck, built lazily and rebuilt when the deck changed.
+    Costs one primary-key lookup when cached.
+    Returns: None if the deck does not exist.
+    """
+    deck = session.get(Deck, deck_id)
+    if deck is None:
+        return None
+    stamp = deck_stamp(deck.version, deck.card_count)
+    index = _cached(deck_id, stamp)
+    if index is not None:
+        return index
+
+    started = time.perf_counter()
+    cards = session.exec(_cards_statement(deck_id)).all()
+    links = session.exec(_links_statement(deck_id)).all()
+    return _store(deck_id, DeckBitmapIndex(stamp, cards, links), started)
+
+async def get_deck_index_async(session: AsyncSession, deck_id: int) -> Optional[DeckBitmapIndex]:
+    """Async variant of `get_deck_index`."""
+    deck = await session.get(Deck, deck_id)
+    if deck is None:
+        return None
+    stamp = deck_stamp(deck.version, deck.card_count)
+    index = _cached(deck_id, stamp)
+    if index is not None:
+        return index
+
+    started = time.perf_counter()
+    cards = (await session.exec(_cards_statement(deck_id))).all()
+    links = (await session.exec(_links_statement(deck_id))).all()
+    return _store(deck_id, DeckBitmapIndex(stamp, cards, links), started)
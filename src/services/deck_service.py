@@ -1,65 +1,267 @@
 # src/services/deck_service.py
 from nicegui import ui, app
-from typing import List, Tuple, Optional, Dict
-from sqlmodel import Session, select, func, col
-from src.database import engine
+from dataclasses import replace
+from datetime import datetime, timezone
+from typing import Iterable, List, Set, Tuple, Optional, Dict
+from sqlmodel import Session, select, func, col, update
+from src.database import engine, create_async_session
 from src.models import CardTagLink, Deck, Tag, User, ActiveDeck, Card
+from src.schemas import DeckSummary, LibraryFilters
+from src.core.log_manager import logger
+from src.core.sql_profiler import profiled
+from src.core.pagination import apply_keyset, build_page, read_cursor, needs_first_page, listing_totals
+from src.core.response_cache import ResponseCache
+from src.services.bookshelf_service import bookshelf_total_key
+from src.services.search_service import to_match_query, search_hits_subquery, search_relevance
+from src.services.facet_service import apply_library_filters, load_facet_counts, load_facet_counts_async
+from src.services.popularity_service import LIBRARY_SORTS, DEFAULT_LIBRARY_SORT, library_sort_key, record_adoption
+
+# --- PAGINATION ---
+PUBLIC_DECKS_TOTAL_KEY = ("public_decks",)
+PUBLIC_DECKS_KEY_LENGTH = 2     # Cursor = (created_at | adoption_count | trending_score, id)
+PUBLIC_SEARCH_KEY_LENGTH = 2    # Cursor = (relevance, id)
+PUBLIC_LIBRARY_TTL_SECONDS = 30 # How long a shared library page may be served
+
+# Serialized public library pages, keyed by (filters, sort, cursor, page_size), their totals
+# and the facet counts. Per-user data never goes in. Popularity orderings are refreshed by the
+# TTL only: bookshelf adds/removes don't invalidate the shared pages.
+public_library_cache = ResponseCache("public_library", PUBLIC_LIBRARY_TTL_SECONDS)
+
+# --- STATEMENT BUILDERS (Shared by the sync and async variants) ---
+
+def _public_decks_count_statement(filters: Optional[LibraryFilters] = None):
+    return apply_library_filters(select(func.count(Deck.id)).where(Deck.is_public == True), filters)
+
+def _public_deck_columns():
+    # Column-level select: only what DeckSummary shows (no ORM instances)
+    return (
+        Deck.id, Deck.title, Deck.description, User.name.label("author"), Deck.created_at,
+        Deck.front_language, Deck.back_language, Deck.card_count,
+        Deck.adoption_count, Deck.trending_score
+    )
+
+def _public_decks_statement(cursor, page_size: int, filters: Optional[LibraryFilters] = None, sort: str = DEFAULT_LIBRARY_SORT):
+    # We join User to display the author's name without N+1 queries.
+    # Card counts and popularity come from denormalized Deck columns (no card/ActiveDeck counting)
+    # Keyset on (sort column, id): page N costs the same as page 1 (no OFFSET scan)
+    statement = (
+        select(*_public_deck_columns())
+        .join(User, Deck.owner_id == User.id)
+        .where(Deck.is_public == True)
+    )
+    statement = apply_library_filters(statement, filters)
+    return apply_keyset(statement, library_sort_key(sort), cursor, page_size)
+
+def _public_deck_sort_key(sort: str):
+    """Cursor key of a library ordering (matches `library_sort_key`)."""
+    field = LIBRARY_SORTS.get(sort, LIBRARY_SORTS[DEFAULT_LIBRARY_SORT])
+    return lambda row: (getattr(row, field), row.id)
+
+def _public_search_count_statement(match_query: str, filters: Optional[LibraryFilters] = None):
+    hits = search_hits_subquery(match_query)
+    statement = (
+        select(func.count())
+        .select_from(hits)
+        .join(Deck, Deck.id == hits.c.deck_id)
+        .where(Deck.is_public == True)
+    )
+    return apply_library_filters(statement, filters)
+
+def _public_search_statement(match_query: str, cursor, page_size: int, filters: Optional[LibraryFilters] = None):
+    # FTS5 finds the matching decks (title/description or any card); keyset on (relevance, id)
+    hits = search_hits_subquery(match_query)
+    relevance = search_relevance(hits, Deck.card_count)
+    statement = (
+        select(*_public_deck_columns(), relevance.label("relevance"))
+        .select_from(hits)
+        .join(Deck, Deck.id == hits.c.deck_id)
+        .join(User, Deck.owner_id == User.id)
+        .where(Deck.is_public == True)
+    )
+    statement = apply_library_filters(statement, filters)
+    return apply_keyset(statement, (relevance, col(Deck.id)), cursor, page_size)
+
+def _public_search_key(row) -> tuple:
+    return (row.relevance, row.id)
+
+def _active_deck_ids_statement(user_id: int, deck_ids: List[int]):
+    return (
+        select(ActiveDeck.deck_id)
+        .where(ActiveDeck.user_id == user_id)
+        .where(col(ActiveDeck.deck_id).in_(deck_ids))
+    )
+
+def _active_deck_statement(user_id: int, deck_id: int):
+    return select(ActiveDeck).where(
+        ActiveDeck.user_id == user_id,
+        ActiveDeck.deck_id == deck_id
+    )
+
+def _study_deck_statement(active_deck_id: int):
+    return (
+        select(ActiveDeck, Deck.title)
+        .join(Deck, ActiveDeck.deck_id == Deck.id)
+        .where(ActiveDeck.id == active_deck_id)
+    )
+
+def _deck_tags_statement(deck_id: int):
+    return (
+        select(Tag)
+        .join(CardTagLink)
+        .join(Card)
+        .where(Card.deck_id == deck_id)
+        .distinct()
+    )
+
+def _serialize_public_decks(results) -> List[DeckSummary]:
+    return [
+        DeckSummary(
+            id=row.id,
+            title=row.title,
+            description=row.description,
+            author=row.author,
+            created_at=row.created_at,
+            front_lang=row.front_language,
+            back_lang=row.back_language,
+            card_count=row.card_count,
+            adoption_count=row.adoption_count,
+        )
+        for row in results
+    ]
+
+def _public_decks_page(rows, cursor, page_size: int, total_count: int, key_of) -> Tuple[Tuple[DeckSummary, ...], Dict]:
+    rows, next_cursor, prev_cursor = build_page(rows, cursor, page_size, key_of)
+    page_info = {"total": total_count, "next_cursor": next_cursor, "prev_cursor": prev_cursor}
+    # Immutable: the page is shared through the cache
+    return tuple(_serialize_public_decks(rows)), page_info
+
+def _flag_bookshelf(decks, active_deck_ids: Set[int]) -> List[DeckSummary]:
+    return [replace(deck, on_bookshelf=True) if deck.id in active_deck_ids else deck for deck in decks]
+
+def invalidate_public_library():
+    """Call after creating/changing a public deck: drops the cached library pages, totals and facet counts."""
+    listing_totals.invalidate(PUBLIC_DECKS_TOTAL_KEY)
+    public_library_cache.invalidate()
+
+# --- SYNC API ---
+
+@profiled()
 def get_public_decks(
-    page: int = 1, 
-    page_size: int = 9
-) -> Tuple[List[dict], int]:
+    cursor: Optional[str] = None,
+    page_size: int = 9,
+    user_id: Optional[int] = None,
+    filters: Optional[LibraryFilters] = None,
+    sort: str = DEFAULT_LIBRARY_SORT
+) -> Tuple[List[DeckSummary], Dict]:
     """
-    Retrieves a paginated list of public decks.
+    Retrieves one page of public decks using keyset pagination.
+    Pages are shared by every visitor through `public_library_cache`.
+    cursor: Opaque token from a previous page_info (None = first page).
+    user_id: If given, decks already on the user's bookshelf are flagged `on_bookshelf` (one query).
+    filters: Facet selection (language pair, size bucket, tag); cursors belong to one selection.
+    sort: One of LIBRARY_SORTS: "newest", "most_added" (bookshelf count) or "trending" (recent adds
+          weigh more); cursors belong to one ordering.
     Returns:
         Tuple containing:
-        1. List of dicts with deck details and author name.
-        2. Total count of public decks (for pagination math).
+        1. List of DeckSummary (deck details and author name).
+        2. Page info: 'total' (cached count of matching public decks), 'next_cursor', 'prev_cursor'
+           (None when there is no page in that direction).
     """
-    offset = (page - 1) * page_size
-    
+    filters = filters or None
+    decks, page_info = public_library_cache.get_or_compute(
+        (filters, sort, cursor, page_size), lambda: _load_public_decks(cursor, page_size, filters, sort)
+    )
+    if user_id is not None and decks:
+        decks = _flag_bookshelf(decks, get_active_deck_ids(user_id, [deck.id for deck in decks]))
+    return list(decks), dict(page_info)
+
+def _public_total(session: Session, filters: Optional[LibraryFilters]) -> int:
+    """Count of the listing (cached: it only feeds the "Page X of Y" label)."""
+    if filters:
+        return public_library_cache.get_or_compute(
+            ("total", filters), lambda: session.exec(_public_decks_count_statement(filters)).one()
+        )
+    total_count = listing_totals.get(PUBLIC_DECKS_TOTAL_KEY)
+    if total_count is None:
+        total_count = session.exec(_public_decks_count_statement()).one()
+        listing_totals.set(PUBLIC_DECKS_TOTAL_KEY, total_count)
+    return total_count
+
+def _load_public_decks(cursor: Optional[str], page_size: int, filters: Optional[LibraryFilters], sort: str) -> Tuple[Tuple[DeckSummary, ...], Dict]:
+    position = read_cursor(cursor, PUBLIC_DECKS_KEY_LENGTH)
     with Session(engine) as session:
-        # 1. Get Total Count (for pagination UI)
-        count_statement = select(func.count(Deck.id)).where(Deck.is_public == True)
-        total_count = session.exec(count_statement).one()
-        
+        # 1. Total Count
+        total_count = _public_total(session, filters)
+
         # 2. Get Data (Deck + Author Name)
-        # We join User to display the author's name without N+1 queries
-        statement = (
-            select(Deck, User.name)
-            .join(User, Deck.owner_id == User.id)
-            .where(Deck.is_public == True)
-            .order_by(col(Deck.created_at).desc())
-            .offset(offset)
-            .limit(page_size)
-        )
-        
-        results = session.exec(statement).all()
-        
+        results = session.exec(_public_decks_statement(position, page_size, filters, sort)).all()
+        if needs_first_page(results, position, page_size):
+            position = None
+            results = session.exec(_public_decks_statement(position, page_size, filters, sort)).all()
+
         # 3. Serialize to a friendly format
-        deck_list = []
-        for deck, author_name in results:
-            deck_list.append({
-                "id": deck.id,
-                "title": deck.title,
-                "description": deck.description,
-                "author": author_name,
-                "timestamp": deck.created_at.strftime("%Y-%m-%d"),
-                "front_lang": deck.front_language,
-                "back_lang": deck.back_language,
-                "card_count": len(deck.cards), # Note: Accessing relationship triggers lazy load
-                "created_at": deck.created_at
-            })
-            
-        return deck_list, total_count
+        return _public_decks_page(results, position, page_size, total_count, _public_deck_sort_key(sort))
+
+@profiled()
+def search_public_decks(
+    text: str,
+    cursor: Optional[str] = None,
+    page_size: int = 9,
+    user_id: Optional[int] = None,
+    filters: Optional[LibraryFilters] = None
+) -> Tuple[List[DeckSummary], Dict]:
+    """
+    Full-text search of the public library (deck title/description, card faces and tags),
+    best matches first, keyset-paginated like `get_public_decks`. Every word must match
+    (as a prefix). Results are always ranked by relevance (no `sort`). Text without any
+    searchable word lists the library instead (newest first).
+    Returns: Same shape as `get_public_decks` ('total' = number of matching decks).
+    """
+    match_query = to_match_query(text)
+    if match_query is None:
+        return get_public_decks(cursor, page_size, user_id, filters)
+    filters = filters or None
+    decks, page_info = public_library_cache.get_or_compute(
+        ("search", match_query, filters, cursor, page_size),
+        lambda: _load_public_search(match_query, cursor, page_size, filters)
+    )
+    if user_id is not None and decks:
+        decks = _flag_bookshelf(decks, get_active_deck_ids(user_id, [deck.id for deck in decks]))
+    return list(decks), dict(page_info)
+
+def _load_public_search(match_query: str, cursor: Optional[str], page_size: int, filters: Optional[LibraryFilters]) -> Tuple[Tuple[DeckSummary, ...], Dict]:
+    position = read_cursor(cursor, PUBLIC_SEARCH_KEY_LENGTH)
+    with Session(engine) as session:
+        # Shared by every page of the same search
+        total_count = public_library_cache.get_or_compute(
+            ("search_total", match_query, filters),
+            lambda: session.exec(_public_search_count_statement(match_query, filters)).one()
+        )
+        results = session.exec(_public_search_statement(match_query, position, page_size, filters)).all()
+        if needs_first_page(results, position, page_size):
+            position = None
+            results = session.exec(_public_search_statement(match_query, position, page_size, filters)).all()
+        return _public_decks_page(results, position, page_size, total_count, _public_search_key)
 
+@profiled()
+def get_library_facets() -> Dict:
+    """
+    Facet sidebar of the public library, from the precomputed counts (shared cache).
+    Returns: See `facet_service.load_facet_counts`.
+    """
+    def load():
+        with Session(engine) as session:
+            return load_facet_counts(session)
+    return public_library_cache.get_or_compute(("facets",), load)
 
+@profiled()
 def activate_deck(user_id: int, deck_id: int) -> bool:
     """
     Activates a deck for a user (Adds to bookshelf).
-    
+
     1. Checks if deck exists.
     2. Checks if already active (prevents duplicates).
-    3. Creates ActiveDeck entry.
+    3. Creates ActiveDeck entry and counts it in the deck's popularity (same transaction).
     """
     with Session(engine) as session:
         # 1. Check if Deck exists
@@ -69,41 +271,47 @@ def activate_deck(user_id: int, deck_id: int) -> bool:
 
         # 2. Check if already active (Idempotency)
         # We don't want to wipe progress if they click "Add" again.
-        statement = select(ActiveDeck).where(
-            ActiveDeck.user_id == user_id,
-            ActiveDeck.deck_id == deck_id
-        )
-        existing_active_deck = session.exec(statement).first()
-        
+        existing_active_deck = session.exec(_active_deck_statement(user_id, deck_id)).first()
+
         if existing_active_deck:
             return True # It is active, so operation is a "success"
 
         # 3. Create the ActiveDeck container
+        added_at = datetime.now(timezone.utc)
         new_active_deck = ActiveDeck(
-            deck_id=deck.id, 
+            deck_id=deck.id,
             user_id=user_id,
-            is_favorite=False
+            is_favorite=False,
+            created_at=added_at
         )
         session.add(new_active_deck)
+        record_adoption(session, deck.id, added_at)
         session.commit()
-        session.refresh(new_active_deck)
-        
-        session.commit()
+        listing_totals.invalidate(bookshelf_total_key(user_id))
         return True
 
+@profiled()
 def is_already_active(user_id: int, deck_id: int) -> bool:
     """
     Checks if a deck is already active for a user.
     """
     with Session(engine) as session:
-        statement = select(ActiveDeck).where(
-            ActiveDeck.user_id == user_id,
-            ActiveDeck.deck_id == deck_id
-        )
-        existing_active_deck = session.exec(statement).first()
-        
+        existing_active_deck = session.exec(_active_deck_statement(user_id, deck_id)).first()
         return existing_active_deck is not None
 
+@profiled()
+def get_active_deck_ids(user_id: int, deck_ids: Iterable[int]) -> Set[int]:
+    """
+    Set-based membership check: which of `deck_ids` the user already has active (one query).
+    Returns: The subset of `deck_ids` on the user's bookshelf.
+    """
+    deck_ids = list(deck_ids)
+    if not deck_ids:
+        return set()
+    with Session(engine) as session:
+        return set(session.exec(_active_deck_ids_statement(user_id, deck_ids)).all())
+
+@profiled()
 def get_study_metadata(user_id: int, active_deck_id: int) -> Optional[Dict]:
     """
     Validates ownership of an ActiveDeck and retrieves title and available tags.
@@ -111,22 +319,188 @@ def get_study_metadata(user_id: int, active_deck_id: int) -> Optional[Dict]:
     """
     with Session(engine) as session:
         # 1. Fetch & Validate Ownership
-        active_deck = session.get(ActiveDeck, active_deck_id)
-        
-        if not active_deck or active_deck.user_id != user_id:
+        row = session.exec(_study_deck_statement(active_deck_id)).first()
+
+        if not row or row[0].user_id != user_id:
             return None
+        active_deck, title = row
 
         # 2. Fetch Unique Tags for Filter
-        tag_query = (
-            select(Tag)
-            .join(CardTagLink)
-            .join(Card)
-            .where(Card.deck_id == active_deck.deck_id)
-            .distinct()
+        tags = session.exec(_deck_tags_statement(active_deck.deck_id)).all()
+
+        return {
+            "title": title,
+            "tags": {t.id: t.name for t in tags}
+        }
+
+# --- CARD COUNT MAINTENANCE ---
+
+def adjust_deck_card_count(session: Session, deck_id: int, delta: int):
+    """
+    Keeps Deck.card_count in sync. Must be called in the same transaction
+    as any card insert (delta > 0) or delete (delta < 0). Does NOT commit.
+    """
+    if delta:
+        session.exec(
+            update(Deck)
+            .where(Deck.id == deck_id)
+            .values(card_count=Deck.card_count + delta)
         )
-        tags = session.exec(tag_query).all()
-        
+
+def repair_deck_card_counts(deck_ids: Optional[List[int]] = None) -> int:
+    """
+    Backfill / repair: recomputes Deck.card_count from the card table.
+    Runs once automatically when the column is added to an existing database.
+    Returns: Number of decks whose count was corrected.
+    """
+    actual_count = (
+        select(func.count(Card.id))
+        .where(Card.deck_id == Deck.id)
+        .correlate(Deck)
+        .scalar_subquery()
+    )
+    statement = update(Deck).where(Deck.card_count != actual_count).values(card_count=actual_count)
+    if deck_ids:
+        statement = statement.where(col(Deck.id).in_(deck_ids))
+
+    with Session(engine) as session:
+        fixed = session.exec(statement).rowcount
+        session.commit()
+
+    if fixed:
+        public_library_cache.invalidate()
+        logger.warning(f"Repaired card_count on {fixed} deck(s).")
+    return fixed
+
+# --- ASYNC API (For NiceGUI handlers: awaits instead of blocking the event loop) ---
+
+@profiled()
+async def get_public_decks_async(
+    cursor: Optional[str] = None,
+    page_size: int = 9,
+    user_id: Optional[int] = None,
+    filters: Optional[LibraryFilters] = None,
+    sort: str = DEFAULT_LIBRARY_SORT
+) -> Tuple[List[DeckSummary], Dict]:
+    """Async variant of `get_public_decks`."""
+    filters = filters or None
+    decks, page_info = await public_library_cache.get_or_compute_async(
+        (filters, sort, cursor, page_size), lambda: _load_public_decks_async(cursor, page_size, filters, sort)
+    )
+    if user_id is not None and decks:
+        decks = _flag_bookshelf(decks, await get_active_deck_ids_async(user_id, [deck.id for deck in decks]))
+    return list(decks), dict(page_info)
+
+async def _public_total_async(session, filters: Optional[LibraryFilters]) -> int:
+    async def count():
+        return (await session.exec(_public_decks_count_statement(filters))).one()
+
+    if filters:
+        return await public_library_cache.get_or_compute_async(("total", filters), count)
+    total_count = listing_totals.get(PUBLIC_DECKS_TOTAL_KEY)
+    if total_count is None:
+        total_count = await count()
+        listing_totals.set(PUBLIC_DECKS_TOTAL_KEY, total_count)
+    return total_count
+
+async def _load_public_decks_async(cursor: Optional[str], page_size: int, filters: Optional[LibraryFilters], sort: str) -> Tuple[Tuple[DeckSummary, ...], Dict]:
+    position = read_cursor(cursor, PUBLIC_DECKS_KEY_LENGTH)
+    async with create_async_session() as session:
+        total_count = await _public_total_async(session, filters)
+        results = (await session.exec(_public_decks_statement(position, page_size, filters, sort))).all()
+        if needs_first_page(results, position, page_size):
+            position = None
+            results = (await session.exec(_public_decks_statement(position, page_size, filters, sort))).all()
+        return _public_decks_page(results, position, page_size, total_count, _public_deck_sort_key(sort))
+
+@profiled()
+async def search_public_decks_async(
+    text: str,
+    cursor: Optional[str] = None,
+    page_size: int = 9,
+    user_id: Optional[int] = None,
+    filters: Optional[LibraryFilters] = None
+) -> Tuple[List[DeckSummary], Dict]:
+    """Async variant of `search_public_decks`."""
+    match_query = to_match_query(text)
+    if match_query is None:
+        return await get_public_decks_async(cursor, page_size, user_id, filters)
+    filters = filters or None
+    decks, page_info = await public_library_cache.get_or_compute_async(
+        ("search", match_query, filters, cursor, page_size),
+        lambda: _load_public_search_async(match_query, cursor, page_size, filters)
+    )
+    if user_id is not None and decks:
+        decks = _flag_bookshelf(decks, await get_active_deck_ids_async(user_id, [deck.id for deck in decks]))
+    return list(decks), dict(page_info)
+
+async def _load_public_search_async(match_query: str, cursor: Optional[str], page_size: int, filters: Optional[LibraryFilters]) -> Tuple[Tuple[DeckSummary, ...], Dict]:
+    position = read_cursor(cursor, PUBLIC_SEARCH_KEY_LENGTH)
+    async with create_async_session() as session:
+        async def count():
+            return (await session.exec(_public_search_count_statement(match_query, filters))).one()
+
+        total_count = await public_library_cache.get_or_compute_async(("search_total", match_query, filters), count)
+        results = (await session.exec(_public_search_statement(match_query, position, page_size, filters))).all()
+        if needs_first_page(results, position, page_size):
+            position = None
+            results = (await session.exec(_public_search_statement(match_query, position, page_size, filters))).all()
+        return _public_decks_page(results, position, page_size, total_count, _public_search_key)
+
+@profiled()
+async def get_library_facets_async() -> Dict:
+    """Async variant of `get_library_facets`."""
+    async def load():
+        async with create_async_session() as session:
+            return await load_facet_counts_async(session)
+    return await public_library_cache.get_or_compute_async(("facets",), load)
+
+@profiled()
+async def activate_deck_async(user_id: int, deck_id: int) -> bool:
+    """Async variant of `activate_deck`."""
+    async with create_async_session() as session:
+        deck = await session.get(Deck, deck_id)
+        if not deck:
+            return False
+
+        existing_active_deck = (await session.exec(_active_deck_statement(user_id, deck_id))).first()
+        if existing_active_deck:
+            return True
+
+        added_at = datetime.now(timezone.utc)
+        session.add(ActiveDeck(deck_id=deck.id, user_id=user_id, is_favorite=False, created_at=added_at))
+        await session.run_sync(record_adoption, deck.id, added_at)
+        await session.commit()
+        listing_totals.invalidate(bookshelf_total_key(user_id))
+        return True
+
+@profiled()
+async def is_already_active_async(user_id: int, deck_id: int) -> bool:
+    """Async variant of `is_already_active`."""
+    async with create_async_session() as session:
+        existing_active_deck = (await session.exec(_active_deck_statement(user_id, deck_id))).first()
+        return existing_active_deck is not None
+
+@profiled()
+async def get_active_deck_ids_async(user_id: int, deck_ids: Iterable[int]) -> Set[int]:
+    """Async variant of `get_active_deck_ids`."""
+    deck_ids = list(deck_ids)
+    if not deck_ids:
+        return set()
+    async with create_async_session() as session:
+        return set((await session.exec(_active_deck_ids_statement(user_id, deck_ids))).all())
+
+@profiled()
+async def get_study_metadata_async(user_id: int, active_deck_id: int) -> Optional[Dict]:
+    """Async variant of `get_study_metadata`."""
+    async with create_async_session() as session:
+        row = (await session.exec(_study_deck_statement(active_deck_id))).first()
+        if not row or row[0].user_id != user_id:
+            return None
+        active_deck, title = row
+
+        tags = (await session.exec(_deck_tags_statement(active_deck.deck_id))).all()
         return {
-            "title": active_deck.deck.title,
+            "title": title,
             "tags": {t.id: t.name for t in tags}
         }
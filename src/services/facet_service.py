@@ -0,0 +1,198 @@
+# src/services/facet_service.py
+import time
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy import exists
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlmodel import Session, select, func, col, delete
+from sqlmodel.ext.asyncio.session import AsyncSession
+from src.database import engine
+from src.models import Card, CardTagLink, Deck, DeckTagLink, Tag, LanguagePairFacet, DeckSizeFacet, TagFacet
+from src.schemas import LibraryFilters
+from src.core.log_manager import logger
+
+# --- CONSTANTS ---
+# Deck size facet: bucket -> (min cards, max cards exclusive or None), in display order
+DECK_SIZE_BUCKETS: Dict[str, Tuple[int, Optional[int]]] = {
+    "small": (0, 50),
+    "medium": (50, 200),
+    "large": (200, None),
+}
+TOP_TAG_FACETS = 20         # Tags listed in the sidebar (most used first)
+
+def size_bucket(card_count: int) -> str:
+    for bucket, (low, high) in DECK_SIZE_BUCKETS.items():
+        if card_count >= low and (high is None or card_count < high):
+            return bucket
+    return next(reversed(DECK_SIZE_BUCKETS))
+
+# --- FILTERS (Shared by the public listing and search statements) ---
+
+def apply_library_filters(statement, filters: Optional[LibraryFilters]):
+    """Adds the WHERE clauses of a facet selection to a select over Deck."""
+    if not filters:
+        return statement
+    if filters.front_language is not None:
+        statement = statement.where(Deck.front_language == filters.front_language)
+    if filters.back_language is not None:
+        statement = statement.where(Deck.back_language == filters.back_language)
+    if filters.size in DECK_SIZE_BUCKETS:
+        low, high = DECK_SIZE_BUCKETS[filters.size]
+        statement = statement.where(Deck.card_count >= low)
+        if high is not None:
+            statement = statement.where(Deck.card_count < high)
+    if filters.tag_id is not None:
+        # Probe on the DeckTagLink primary key (tag_id, deck_id)
+        statement = statement.where(
+            exists().where(DeckTagLink.tag_id == filters.tag_id, DeckTagLink.deck_id == Deck.id)
+        )
+    return statement
+
+# --- INCREMENTAL UPDATE (Import time, same transaction as the deck) ---
+
+def _add_counts(db: Session, model, keys: List[Dict], delta: int = 1):
+    """deck_count += delta for every facet key (the row is created when missing)."""
+    if not keys:
+        return
+    statement = sqlite_insert(model)
+    statement = statement.on_conflict_do_update(
+        index_elements=list(keys[0]),
+        set_={"deck_count": model.deck_count + statement.excluded.deck_count}
+    )
+    db.exec(statement, params=[{**key, "deck_count": delta} for key in keys])
+
+def record_deck_facets(db: Session, deck_id: int):
+    """
+    Call once a deck's cards are all written: stores its distinct tags (DeckTagLink)
+    and, for a public deck, adds it to the facet counts. Does NOT commit.
+    """
+    db.exec(
+        sqlite_insert(DeckTagLink)
+        .from_select(
+            ["tag_id", "deck_id"],
+            select(CardTagLink.tag_id, Card.deck_id)
+            .join(Card, Card.id == CardTagLink.card_id)
+            .where(Card.deck_id == deck_id)
+            .distinct()
+        )
+        .on_conflict_do_nothing()
+    )
+
+    deck = db.exec(
+        select(Deck.is_public, Deck.front_language, Deck.back_language, Deck.card_count).where(Deck.id == deck_id)
+    ).one()
+    if not deck.is_public:
+        return
+
+    tag_ids = db.exec(select(DeckTagLink.tag_id).where(DeckTagLink.deck_id == deck_id)).all()
+    _add_counts(db, LanguagePairFacet, [{"front_language": deck.front_language, "back_language": deck.back_language}])
+    _add_counts(db, DeckSizeFacet, [{"bucket": size_bucket(deck.card_count)}])
+    _add_counts(db, TagFacet, [{"tag_id": tag_id} for tag_id in tag_ids])
+
+# --- FULL REBUILD ---
+
+def rebuild_facets() -> int:
+    """
+    Recomputes DeckTagLink and the facet counts from the deck/card tables. Runs once
+    automatically when the tables are added to an existing database; run it while no
+    import is writing.
+    Command line: python -m src.services.facet_service
+    Returns: Number of public decks counted.
+    """
+    started = time.perf_counter()
+    with Session(engine) as db:
+        for model in (DeckTagLink, LanguagePairFacet, DeckSizeFacet, TagFacet):
+            db.exec(delete(model))
+
+        db.exec(
+            sqlite_insert(DeckTagLink).from_select(
+                ["tag_id", "deck_id"],
+                select(CardTagLink.tag_id, Card.deck_id).join(Card, Card.id == CardTagLink.card_id).distinct()
+            )
+        )
+
+        public = Deck.is_public == True
+        pairs = db.exec(
+            select(Deck.front_language, Deck.back_language, func.count(Deck.id))
+            .where(public)
+            .group_by(Deck.front_language, Deck.back_language)
+        ).all()
+        if pairs:
+            db.exec(sqlite_insert(LanguagePairFacet), params=[
+                {"front_language": front, "back_language": back, "deck_count": count} for front, back, count in pairs
+            ])
+
+        sizes: Dict[str, int] = {}
+        for card_count, count in db.exec(select(Deck.card_count, func.count(Deck.id)).where(public).group_by(Deck.card_count)).all():
+            bucket = size_bucket(card_count)
+            sizes[bucket] = sizes.get(bucket, 0) + count
+        if sizes:
+            db.exec(sqlite_insert(DeckSizeFacet), params=[{"bucket": b, "deck_count": c} for b, c in sizes.items()])
+
+        tags = db.exec(
+            select(DeckTagLink.tag_id, func.count(DeckTagLink.deck_id))
+            .join(Deck, Deck.id == DeckTagLink.deck_id)
+            .where(public)
+            .group_by(DeckTagLink.tag_id)
+        ).all()
+        if tags:
+            db.exec(sqlite_insert(TagFacet), params=[{"tag_id": tag_id, "deck_count": count} for tag_id, count in tags])
+
+        public_decks = sum(count for _, _, count in pairs)
+        db.commit()
+
+    logger.info(f"Rebuilt library facets of {public_decks} public deck(s) in {(time.perf_counter() - started) * 1000:.0f} ms.")
+    return public_decks
+
+# --- READ API ---
+
+def _language_pairs_statement():
+    return (
+        select(LanguagePairFacet.front_language, LanguagePairFacet.back_language, LanguagePairFacet.deck_count)
+        .where(LanguagePairFacet.deck_count > 0)
+        .order_by(col(LanguagePairFacet.deck_count).desc())
+    )
+
+def _sizes_statement():
+    return select(DeckSizeFacet.bucket, DeckSizeFacet.deck_count).where(DeckSizeFacet.deck_count > 0)
+
+def _top_tags_statement():
+    return (
+        select(TagFacet.tag_id, Tag.name, TagFacet.deck_count)
+        .join(Tag, Tag.id == TagFacet.tag_id)
+        .where(TagFacet.deck_count > 0)
+        .order_by(col(TagFacet.deck_count).desc())
+        .limit(TOP_TAG_FACETS)
+    )
+
+def _facet_counts(language_pairs, sizes, tags) -> Dict:
+    # Tuples: the result is shared through the public library cache
+    sizes = dict(sizes)
+    return {
+        "language_pairs": tuple((front, back, count) for front, back, count in language_pairs),
+        "sizes": tuple((bucket, sizes[bucket]) for bucket in DECK_SIZE_BUCKETS if bucket in sizes),
+        "tags": tuple((tag_id, name, count) for tag_id, name, count in tags),
+    }
+
+def load_facet_counts(db: Session) -> Dict:
+    """
+    Precomputed public deck counts for the library sidebar (three small primary-key/index reads).
+    Returns: {"language_pairs": ((front, back, count), ...), "sizes": ((bucket, count), ...), "tags": ((tag_id, name, count), ...)}
+    """
+    return _facet_counts(
+        db.exec(_language_pairs_statement()).all(),
+        db.exec(_sizes_statement()).all(),
+        db.exec(_top_tags_statement()).all(),
+    )
+
+async def load_facet_counts_async(db: AsyncSession) -> Dict:
+    """Async variant of `load_facet_counts`."""
+    return _facet_counts(
+        (await db.exec(_language_pairs_statement())).all(),
+        (await db.exec(_sizes_statement())).all(),
+        (await db.exec(_top_tags_statement())).all(),
+    )
+
+if __name__ == "__main__":
+    from src.database import init_db
+    init_db()
+    print(f"Rebuilt library facets ({rebuild_facets()} public decks).")
@@ -0,0 +1,268 @@
+# src/services/import_job_service.py
+import os
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Dict, Iterator, Optional
+from nicegui.elements.upload_files import FileUpload
+from sqlmodel import Session, select, col, update
+from src.database import engine
+from src.models import ImportJob, ImportJobStatus
+from src.schemas import DeckMetadataDTO
+from src.services.import_service import save_deck_stream, STREAM_READ_CHUNK
+from src.core.log_manager import logger
+
+# --- CONSTANTS ---
+# SQLite has a single writer: extra workers would only queue on the write lock.
+IMPORT_WORKERS = 1
+MAX_PENDING_JOBS = 16           # Queued + running, across all users
+MAX_PENDING_JOBS_PER_USER = 1
+IMPORT_SPOOL_DIR = "db/import_spool"
+
+class ImportQueueFullError(Exception):
+    """Raised when the import queue (global or per-user) has no free slot."""
+    pass
+
+# --- WORKER POOL & LIVE STATE ---
+
+_executor = ThreadPoolExecutor(max_workers=IMPORT_WORKERS, thread_name_prefix="import-job")
+
+# Snapshot of every queued/running job, so polling never touches the DB while a job is active
+_live_lock = threading.Lock()
+_live_jobs: Dict[int, Dict] = {}
+_pending_by_user: Dict[int, int] = {}
+
+def _reserve_slot(user_id: int):
+    with _live_lock:
+        pending_total = sum(_pending_by_user.values())
+        if pending_total >= MAX_PENDING_JOBS:
+            raise ImportQueueFullError("The import queue is full. Please try again in a few minutes.")
+        if _pending_by_user.get(user_id, 0) >= MAX_PENDING_JOBS_PER_USER:
+            raise ImportQueueFullError("You already have an import in progress.")
+        _pending_by_user[user_id] = _pending_by_user.get(user_id, 0) + 1
+
+def _release_slot(user_id: int):
+    with _live_lock:
+        remaining = _pending_by_user.get(user_id, 0) - 1
+        if remaining > 0:
+            _pending_by_user[user_id] = remaining
+        else:
+            _pending_by_user.pop(user_id, None)
+
+def _set_live(job_id: int, **changes):
+    with _live_lock:
+        if job_id in _live_jobs:
+            _live_jobs[job_id].update(changes)
+
+def _enqueue(job_id: int, user_id: int, header: DeckMetadataDTO, cards_total: int):
+    """Publishes the job's live state and hands its spool file to the worker pool (slot already reserved)."""
+    with _live_lock:
+        _live_jobs[job_id] = {
+            "id": job_id,
+            "user_id": user_id,
+            "status": ImportJobStatus.QUEUED.value,
+            "deck_title": header.title,
+            "deck_id": None,
+            "cards_total": cards_total,
+            "cards_written": 0,
+            "error": None,
+        }
+    _executor.submit(_run_job, job_id, user_id, header, _spool_path(job_id))
+
+def _spool_path(job_id: int) -> str:
+    return os.path.join(IMPORT_SPOOL_DIR, f"{job_id}.json")
+
+def _read_file_chunks(path: str) -> Iterator[bytes]:
+    with open(path, "rb") as f:
+        while (chunk := f.read(STREAM_READ_CHUNK)):
+            yield chunk
+
+# --- PUBLIC API ---
+
+async def submit_import_job(user_id: int, header: DeckMetadataDTO, upload: FileUpload, cards_total: int) -> int:
+    """
+    Queues a deck import:
+    1. Reserves a queue slot (throttling).
+    2. Persists the job as QUEUED.
+    3. Spools the upload to disk (the worker re-streams it from there).
+    4. Hands it to the worker pool.
+    Returns: The ImportJob ID to poll with `get_import_job`.
+    """
+    _reserve_slot(user_id)
+    job_id = None
+    try:
+        job_id = await asyncio.to_thread(_create_job, user_id, header, cards_total)
+        os.makedirs(IMPORT_SPOOL_DIR, exist_ok=True)
+        path = _spool_path(job_id)
+        await upload.save(path)
+
+        _enqueue(job_id, user_id, header, cards_total)
+    except Exception as e:
+        _release_slot(user_id)
+        if job_id is not None:
+            with _live_lock:
+                _live_jobs.pop(job_id, None)
+            _remove_spool(job_id)
+            await asyncio.to_thread(_finish_job, job_id, ImportJobStatus.FAILED, error=str(e))
+        raise
+
+    logger.info(f"Import job {job_id} queued for User {user_id} ('{header.title}', {cards_total} cards)")
+    return job_id
+
+def get_import_job(user_id: int, job_id: int) -> Optional[Dict]:
+    """
+    Returns the job status dict (id, user_id, status, deck_title, deck_id, cards_total, cards_written, error).
+    Active jobs are served from memory; finished ones from the DB.
+    Returns None if not found or not owned by the user.
+    """
+    with _live_lock:
+        live = _live_jobs.get(job_id)
+        if live is not None:
+            return dict(live) if live["user_id"] == user_id else None
+
+    with Session(engine) as session:
+        job = session.get(ImportJob, job_id)
+        if not job or job.user_id != user_id:
+            return None
+        return {
+            "id": job.id,
+            "user_id": job.user_id,
+            "status": job.status,
+            "deck_title": job.deck_title,
+            "deck_id": job.deck_id,
+            "cards_total": job.cards_total,
+            "cards_written": job.cards_written,
+            "error": job.error,
+        }
+
+def recover_interrupted_import_jobs():
+    """
+    Startup hook: jobs left QUEUED/RUNNING by a previous process are queued again from
+    their spool file and stored header (a deck is committed in one transaction, so an
+    interrupted job left nothing behind). Jobs that can't restart are marked FAILED.
+    """
+    requeued, failed = [], 0
+    with Session(engine) as session:
+        jobs = session.exec(
+            select(ImportJob).where(
+                col(ImportJob.status).in_([ImportJobStatus.QUEUED.value, ImportJobStatus.RUNNING.value])
+            )
+        ).all()
+        for job in jobs:
+            header = None
+            if os.path.exists(_spool_path(job.id)):
+                try:
+                    header = DeckMetadataDTO.model_validate_json(job.header_json)
+                    _reserve_slot(job.user_id)
+                except Exception as e:
+                    logger.error(f"Import job {job.id} can't be resumed: {e}")
+                    header = None
+
+            if header is None:
+                job.status = ImportJobStatus.FAILED.value
+                job.error = "Interrupted by a server restart."
+                job.finished_at = datetime.now(timezone.utc)
+                _remove_spool(job.id)
+                failed += 1
+            else:
+                job.status = ImportJobStatus.QUEUED.value
+                job.started_at = None
+                requeued.append((job.id, job.user_id, job.cards_total, header))
+            session.add(job)
+        session.commit()
+
+    for job_id, user_id, cards_total, header in requeued:
+        _enqueue(job_id, user_id, header, cards_total)
+
+    if requeued:
+        logger.warning(f"Re-queued {len(requeued)} interrupted import job(s).")
+    if failed:
+        logger.warning(f"Marked {failed} interrupted import job(s) as failed.")
+
+def shutdown_import_workers():
+    """Shutdown hook: lets the running import finish, drops the queued ones."""
+    _executor.shutdown(wait=True, cancel_futures=True)
+
+# --- WORKER ---
+
+def _run_job(job_id: int, user_id: int, header: DeckMetadataDTO, path: str):
+    """Executed on the worker pool: streams the spooled file into the DB."""
+    claimed = None
+    try:
+        claimed = _start_job(job_id)
+        if not claimed:
+            logger.warning(f"Import job {job_id} is no longer queued (claimed elsewhere); skipping it.")
+            return
+        deck_id, cards_written = save_deck_stream(
+            user_id,
+            header,
+            _read_file_chunks(path),
+            on_progress=lambda written: _set_live(job_id, cards_written=written)
+        )
+        _finish_job(job_id, ImportJobStatus.DONE, deck_id=deck_id, cards_written=cards_written)
+    except Exception as e:
+        logger.error(f"Import job {job_id} failed: {e}")
+        _finish_job(job_id, ImportJobStatus.FAILED, error=str(e))
+    finally:
+        if claimed is not False:
+            # Left to whoever claimed the job
+            _remove_spool(job_id)
+        with _live_lock:
+            _live_jobs.pop(job_id, None)
+        _release_slot(user_id)
+
+def _create_job(user_id: int, header: DeckMetadataDTO, cards_total: int) -> int:
+    with Session(engine) as session:
+        job = ImportJob(
+            user_id=user_id,
+            deck_title=header.title,
+            header_json=header.model_dump_json(),
+            cards_total=cards_total,
+        )
+        session.add(job)
+        session.commit()
+        session.refresh(job)
+        return job.id
+
+def _start_job(job_id: int) -> bool:
+    """
+    Claims a QUEUED job (QUEUED -> RUNNING in one UPDATE): a job handed to two workers runs once.
+    Returns: False if the job was no longer queued.
+    """
+    with Session(engine) as session:
+        claimed = session.exec(
+            update(ImportJob)
+            .where(ImportJob.id == job_id, ImportJob.status == ImportJobStatus.QUEUED.value)
+            .values(status=ImportJobStatus.RUNNING.value, started_at=datetime.now(timezone.utc))
+        ).rowcount
+        session.commit()
+    if claimed:
+        _set_live(job_id, status=ImportJobStatus.RUNNING.value)
+    return bool(claimed)
+
+def _finish_job(
+    job_id: int,
+    status: ImportJobStatus,
+    deck_id: Optional[int] = None,
+    cards_written: int = 0,
+    error: Optional[str] = None
+):
+    with Session(engine) as session:
+        job = session.get(ImportJob, job_id)
+        if not job:
+            return
+        job.status = status.value
+        job.deck_id = deck_id
+        job.cards_written = cards_written
+        job.error = error
+        job.finished_at = datetime.now(timezone.utc)
+        session.add(job)
+        session.commit()
+    logger.info(f"Import job {job_id} finished with status '{status.value}' ({cards_written} cards written)")
+
+def _remove_spool(job_id: int):
+    try:
+        os.remove(_spool_path(job_id))
+    except FileNotFoundError:
+        pass
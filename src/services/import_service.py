@@ -1,18 +1,28 @@
 # src/services/import_service.py
 import json
-import bleach
+import time
 from collections import Counter
-from sqlmodel import Session, select
+from typing import Any, AsyncIterable, AsyncIterator, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Set, Tuple
+from sqlalchemy import insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlmodel import Session, select, col
 from src.database import engine
 from src.models import Deck, Card, Tag, CardTagLink
-from src.schemas import DeckImportDTO
+from src.schemas import DeckImportDTO, DeckMetadataDTO, CardImportDTO
+from src.core.json_stream import ObjectArrayStreamParser, JSONStreamError
 from src.core.log_manager import logger
+from src.services.deck_service import adjust_deck_card_count, invalidate_public_library
+from src.services.search_service import index_deck, index_cards
+from src.services.facet_service import record_deck_facets
+from src.services.sanitize_service import sanitize_cards, get_sanitize_stats
 
-ALLOWED_TAGS = ['b', 'i', 'strong', 'em', 'p', 'br', 'ul', 'ol', 'li', 'code', 'pre', 'h1', 'h2', 'h3', 'blockquote', 'span']
+# Max names per "IN (...)" lookup (SQLite caps bound parameters per statement)
+TAG_LOOKUP_CHUNK = 500
 
-def sanitize_html(content: str) -> str:
-    if not content: return ""
-    return bleach.clean(content, tags=ALLOWED_TAGS, strip=True)
+# --- STREAMING IMPORT ---
+STREAM_READ_CHUNK = 64 * 1024   # Bytes read from the upload per step
+STREAM_WRITE_CHUNK = 1000       # Cards handed to the bulk writer at once
+STREAM_PREVIEW_LIMIT = 50       # Cards kept in memory for the review step
 
 def parse_and_preview_deck(file_content: str) -> dict:
     """
@@ -32,10 +42,8 @@ def parse_and_preview_deck(file_content: str) -> dict:
     except Exception as e:
         raise ValueError(f"Schema Error: {e}")
 
-    # Sanitize content in-memory for the DTO
-    for card in deck_dto.cards:
-        card.front_content = sanitize_html(card.front_content)
-        card.back_content = sanitize_html(card.back_content)
+    # Sanitize content in-memory for the DTO (cached by content hash)
+    sanitize_cards(deck_dto.cards)
 
     # --- Generate Stats for the Confirmation Step ---
     all_tags = []
@@ -56,10 +64,161 @@ def parse_and_preview_deck(file_content: str) -> dict:
 
     return {"dto": deck_dto, "stats": stats}
 
+# --- STREAMING IMPORT (No card cap, flat memory) ---
+
+async def scan_deck_stream(byte_chunks: AsyncIterable[bytes]) -> dict:
+    """
+    Streaming counterpart of `parse_and_preview_deck`.
+    1. Parses the 'cards' array incrementally.
+    2. Validates every card (and the deck fields).
+    3. Calculates Stats without keeping the cards.
+    Returns: A dict containing the 'header', 'stats' and a sanitized 'preview' of the first cards.
+    """
+    tag_counts = Counter()
+    source_counts = Counter()
+    preview: List[CardImportDTO] = []
+    card_count = 0
+    parser = ObjectArrayStreamParser("cards")
+
+    async for card in _aiter_stream_cards(byte_chunks, parser):
+        card_count += 1
+        tag_counts.update(_clean_tag_names(card.tags))
+        if card.source: source_counts[card.source] += 1
+        if len(preview) < STREAM_PREVIEW_LIMIT:
+            preview.append(card)
+
+    header = _validate_stream_header(parser, card_count)
+    sanitize_cards(preview)
+
+    stats = {
+        "card_count": card_count,
+        "unique_tags": list(tag_counts.keys()),
+        "top_sources": source_counts.most_common(5)
+    }
+
+    return {"header": header, "stats": stats, "preview": preview}
+
+def save_deck_stream(
+    user_id: int,
+    header: DeckMetadataDTO,
+    byte_chunks: Iterable[bytes],
+    on_progress: Optional[Callable[[int], Any]] = None
+) -> Tuple[int, int]:
+    """
+    Streaming counterpart of `save_dto_to_db`. Blocking: runs on an import worker thread.
+    Re-reads the upload, validates & sanitizes each card and feeds the bulk writer
+    every STREAM_WRITE_CHUNK cards. Everything lands in one transaction, so a failure
+    half-way leaves no partial deck behind.
+    on_progress: Optional callback receiving the number of cards written so far.
+    Returns: (new deck ID, cards written).
+    """
+    started_at = time.perf_counter()
+    parser = ObjectArrayStreamParser("cards")
+    cards_written = 0
+    rows_written = 1
+
+    with Session(engine) as session:
+        new_deck = Deck(owner_id=user_id, **header.model_dump())
+        session.add(new_deck)
+        session.flush()
+        deck_id = new_deck.id
+        index_deck(session, deck_id, new_deck.title, new_deck.description)
+
+        def write_pending(cards: List[CardImportDTO]) -> int:
+            sanitize_cards(cards)
+            return bulk_insert_cards(session, deck_id, cards)
+
+        pending: List[CardImportDTO] = []
+        for card in _iter_stream_cards(byte_chunks, parser):
+            pending.append(card)
+            if len(pending) >= STREAM_WRITE_CHUNK:
+                rows_written += write_pending(pending)
+                cards_written += len(pending)
+                pending = []
+                if on_progress: on_progress(cards_written)
+
+        if pending:
+            rows_written += write_pending(pending)
+            cards_written += len(pending)
+            if on_progress: on_progress(cards_written)
+
+        _validate_stream_header(parser, cards_written)
+        record_deck_facets(session, deck_id)
+        session.commit()
+        if header.is_public:
+            invalidate_public_library()
+
+        elapsed = time.perf_counter() - started_at
+        rows_per_second = rows_written / elapsed if elapsed > 0 else float(rows_written)
+        logger.info(
+            f"Streaming Import Success: Deck '{header.title}' (ID: {deck_id}). "
+            f"{cards_written} cards, {rows_written} rows in {elapsed * 1000:.1f} ms "
+            f"({rows_per_second:,.0f} rows/s). Sanitizer cache: {get_sanitize_stats()}"
+        )
+        return deck_id, cards_written
+
+def _parse_stream_chunk(parser: ObjectArrayStreamParser, data: Optional[bytes], index: int) -> List[CardImportDTO]:
+    """Feeds one raw chunk (None = end of file) and returns its completed cards as validated DTOs."""
+    try:
+        raw_cards = parser.feed(data) if data is not None else parser.close()
+    except JSONStreamError as e:
+        raise ValueError(str(e))
+    return [_validate_stream_card(index + i, raw_card) for i, raw_card in enumerate(raw_cards, 1)]
+
+async def _aiter_stream_cards(
+    byte_chunks: AsyncIterable[bytes],
+    parser: ObjectArrayStreamParser
+) -> AsyncIterator[CardImportDTO]:
+    """Async source (the upload on the event loop): yields each card as a validated DTO."""
+    index = 0
+    async for data in byte_chunks:
+        for card in _parse_stream_chunk(parser, data, index):
+            index += 1
+            yield card
+    for card in _parse_stream_chunk(parser, None, index):
+        yield card
+
+def _iter_stream_cards(byte_chunks: Iterable[bytes], parser: ObjectArrayStreamParser) -> Iterator[CardImportDTO]:
+    """Blocking source (a spooled file on a worker thread): yields each card as a validated DTO."""
+    index = 0
+    for data in byte_chunks:
+        for card in _parse_stream_chunk(parser, data, index):
+            index += 1
+            yield card
+    yield from _parse_stream_chunk(parser, None, index)
+
+def _validate_stream_card(index: int, raw_card: Any) -> CardImportDTO:
+    if not isinstance(raw_card, dict):
+        raise ValueError(f"Schema Error: card #{index} must be a JSON object.")
+    try:
+        return CardImportDTO(**raw_card)
+    except Exception as e:
+        raise ValueError(f"Schema Error in card #{index}: {e}")
+
+def _validate_stream_header(parser: ObjectArrayStreamParser, card_count: int) -> DeckMetadataDTO:
+    """Validates the deck fields collected by the parser once the stream is exhausted."""
+    if not parser.array_seen:
+        raise ValueError("Schema Error: field 'cards' is required.")
+    if card_count == 0:
+        raise ValueError("Schema Error: Deck must contain at least one card.")
+    try:
+        return DeckMetadataDTO(**parser.header)
+    except Exception as e:
+        raise ValueError(f"Schema Error: {e}")
+
 def save_dto_to_db(user_id: int, deck_dto: DeckImportDTO) -> str:
     """
     Takes the already validated DTO and commits it to SQL.
+    Everything is written in a single transaction using set-based inserts:
+    1. Deck row (flushed once to obtain its ID).
+    2. Cards via executemany.
+    3. Tags resolved in one lookup; missing ones bulk-created.
+    4. CardTagLink rows via executemany.
+    5. Search index rows (deck + cards) via executemany.
+    6. Deck tags and public library facet counts.
     """
+    started_at = time.perf_counter()
+
     with Session(engine) as session:
         # A. Create Deck
         new_deck = Deck(
@@ -72,40 +231,106 @@ def save_dto_to_db(user_id: int, deck_dto: DeckImportDTO) -> str:
             back_language=deck_dto.back_language
         )
         session.add(new_deck)
+        session.flush()
+        index_deck(session, new_deck.id, new_deck.title, new_deck.description)
+
+        # B. Cards, Tags & Links
+        rows_written = 1 + bulk_insert_cards(session, new_deck.id, deck_dto.cards)
+        record_deck_facets(session, new_deck.id)
+
         session.commit()
-        session.refresh(new_deck)
-
-        # B. Process Cards
-        for card_dto in deck_dto.cards:
-            new_card = Card(
-                deck_id=new_deck.id,
-                front_content=card_dto.front_content, # Already sanitized in parse step
-                back_content=card_dto.back_content,
-                base_difficulty=card_dto.base_difficulty,
-                source=card_dto.source
-            )
-            session.add(new_card)
-            session.commit()
-            session.refresh(new_card)
-
-            # C. Handle Tags
-            if card_dto.tags:
-                for tag_name in card_dto.tags:
-                    clean_tag = tag_name.strip()
-                    if not clean_tag: continue
-                    
-                    statement = select(Tag).where(Tag.name == clean_tag)
-                    tag_obj = session.exec(statement).first()
-                    
-                    if not tag_obj:
-                        tag_obj = Tag(name=clean_tag)
-                        session.add(tag_obj)
-                        session.commit()
-                        session.refresh(tag_obj)
-                    
-                    link = CardTagLink(card_id=new_card.id, tag_id=tag_obj.id)
-                    session.add(link)
-        
-        session.commit()
-        logger.info(f"Import Success: Deck '{new_deck.title}' (ID: {new_deck.id})")
+        if deck_dto.is_public:
+            invalidate_public_library()
+
+        elapsed = time.perf_counter() - started_at
+        rows_per_second = rows_written / elapsed if elapsed > 0 else float(rows_written)
+        logger.info(
+            f"Import Success: Deck '{new_deck.title}' (ID: {new_deck.id}). "
+            f"{len(deck_dto.cards)} cards, {rows_written} rows in {elapsed * 1000:.1f} ms "
+            f"({rows_per_second:,.0f} rows/s)"
+        )
         return new_deck.title
+
+# --- BULK WRITER ---
+
+def bulk_insert_cards(session: Session, deck_id: int, cards: Sequence[CardImportDTO]) -> int:
+    """
+    Inserts a batch of (already sanitized) cards and their tag links into an open session.
+    Does NOT commit; the caller owns the transaction.
+    Returns: Number of rows written (cards + new tags + links).
+    """
+    if not cards:
+        return 0
+
+    # 1. Cards (executemany, IDs returned in parameter order)
+    card_rows = [
+        {
+            "deck_id": deck_id,
+            "front_content": card_dto.front_content,
+            "back_content": card_dto.back_content,
+            "base_difficulty": card_dto.base_difficulty,
+            "source": card_dto.source,
+        }
+        for card_dto in cards
+    ]
+    card_ids = session.exec(
+        insert(Card).returning(Card.id, sort_by_parameter_order=True),
+        params=card_rows
+    ).scalars().all()
+
+    # 2. Tags (one lookup for the whole batch)
+    card_tag_names = [_clean_tag_names(card_dto.tags) for card_dto in cards]
+    all_tag_names = {name for names in card_tag_names for name in names}
+    tag_map, created_tags = _resolve_tag_ids(session, all_tag_names)
+
+    # 3. Links (executemany)
+    link_rows = [
+        {"card_id": card_id, "tag_id": tag_map[name]}
+        for card_id, names in zip(card_ids, card_tag_names)
+        for name in names
+    ]
+    if link_rows:
+        session.exec(insert(CardTagLink), params=link_rows)
+
+    # 4. Denormalized Deck.card_count and search index (same transaction)
+    adjust_deck_card_count(session, deck_id, len(card_ids))
+    index_cards(session, card_ids, cards, card_tag_names)
+
+    return len(card_rows) + created_tags + len(link_rows)
+
+def _clean_tag_names(tags: Optional[List[str]]) -> List[str]:
+    """Strips tag names, dropping blanks and duplicates (keeps first-seen order)."""
+    if not tags:
+        return []
+    return list(dict.fromkeys(t.strip() for t in tags if t and t.strip()))
+
+def _resolve_tag_ids(session: Session, tag_names: Set[str]) -> Tuple[Dict[str, int], int]:
+    """
+    Maps tag names to their IDs, creating the missing tags in bulk.
+    Returns: (name -> id map, number of tags created).
+    """
+    if not tag_names:
+        return {}, 0
+
+    tag_map = _select_tag_ids(session, tag_names)
+    missing = [name for name in tag_names if name not in tag_map]
+
+    if missing:
+        # ON CONFLICT DO NOTHING: a concurrent import may have created the same tag
+        session.exec(
+            sqlite_insert(Tag).on_conflict_do_nothing(index_elements=["name"]),
+            params=[{"name": name} for name in missing]
+        )
+        tag_map.update(_select_tag_ids(session, missing))
+
+    return tag_map, len(missing)
+
+def _select_tag_ids(session: Session, tag_names: Iterable[str]) -> Dict[str, int]:
+    """Looks up existing tags by name, chunked to stay below SQLite's bound-parameter limit."""
+    names = list(tag_names)
+    tag_map: Dict[str, int] = {}
+    for i in range(0, len(names), TAG_LOOKUP_CHUNK):
+        chunk = names[i : i + TAG_LOOKUP_CHUNK]
+        rows = session.exec(select(Tag.name, Tag.id).where(col(Tag.name).in_(chunk))).all()
+        tag_map.update({name: tag_id for name, tag_id in rows})
+    return tag_map
@@ -0,0 +1,139 @@
+# src/services/popularity_service.py
+import math
+import time
+from datetime import datetime, timezone
+from typing import Dict, Optional, Tuple
+from sqlalchemy import bindparam
+from sqlmodel import Session, select, col, update
+from src.database import engine
+from src.models import ActiveDeck, Deck, NO_TRENDING_SCORE
+from src.core.log_manager import logger
+
+# --- CONSTANTS ---
+TRENDING_HALF_LIFE_DAYS = 7     # An add counts half as much for "trending" a week later
+# Deck.trending_score = log2(sum of 2^((added_at - epoch) / half-life)) over the deck's adds.
+# Decaying every deck by the same factor never changes their order, so the stored value is
+# never rewritten as time passes. The sum itself would overflow a double 2^1024 (7168 days,
+# ~2044) past the epoch: in log2 space the value only grows by 1 per half-life.
+TRENDING_EPOCH = datetime(2025, 1, 1, tzinfo=timezone.utc)
+# A withdrawal leaving less than this share of the score has lost its precision to rounding
+# (the withdrawn add dwarfed the older ones): the deck's score is then recomputed from its adds
+TRENDING_RECOMPUTE_BELOW = 2.0 ** -20
+_LN2 = math.log(2.0)
+
+# Public library orderings: sort -> Deck column sorted on (descending, then Deck.id)
+LIBRARY_SORTS: Dict[str, str] = {
+    "newest": "created_at",
+    "most_added": "adoption_count",
+    "trending": "trending_score",
+}
+DEFAULT_LIBRARY_SORT = "newest"
+
+def trend_exponent(added_at: datetime) -> float:
+    """log2 of the weight of one bookshelf add made at `added_at` (its half-lives since the epoch)."""
+    if added_at.tzinfo is None:
+        added_at = added_at.replace(tzinfo=timezone.utc)  # SQLite hands back naive UTC
+    days = (added_at - TRENDING_EPOCH).total_seconds() / 86400
+    return days / TRENDING_HALF_LIFE_DAYS
+
+def _log2_add(score: float, exponent: float) -> float:
+    """log2(2^score + 2^exponent), without leaving log space."""
+    if score <= NO_TRENDING_SCORE:
+        return exponent
+    high, low = max(score, exponent), min(score, exponent)
+    return high + math.log2(1.0 + 2.0 ** (low - high))
+
+def _log2_subtract(score: float, exponent: float) -> Optional[float]:
+    """log2(2^score - 2^exponent). Returns: None when too little is left to be trusted."""
+    if score <= NO_TRENDING_SCORE or exponent >= score:
+        return None
+    remaining = -math.expm1((exponent - score) * _LN2)    # 1 - 2^(exponent - score)
+    if remaining < TRENDING_RECOMPUTE_BELOW:
+        return None
+    return score + math.log2(remaining)
+
+def _deck_trending_score(db: Session, deck_id: int) -> float:
+    """The deck's score recomputed from its ActiveDeck rows."""
+    score = NO_TRENDING_SCORE
+    for added_at in db.exec(select(ActiveDeck.created_at).where(ActiveDeck.deck_id == deck_id)):
+        score = _log2_add(score, trend_exponent(added_at))
+    return score
+
+def library_sort_key(sort: str) -> Tuple:
+    """Returns: The keyset sort key of a library ordering ((column, Deck.id), unknown sorts = newest)."""
+    column = getattr(Deck, LIBRARY_SORTS.get(sort, LIBRARY_SORTS[DEFAULT_LIBRARY_SORT]))
+    return (col(column), col(Deck.id))
+
+# --- INCREMENTAL UPDATE (Same transaction as the ActiveDeck insert/delete) ---
+
+def record_adoption(db: Session, deck_id: int, added_at: datetime, delta: int = 1):
+    """
+    Adds (delta=1) or withdraws (delta=-1) one bookshelf add of a deck.
+    Call it once the ActiveDeck row is added/deleted in `db` (a recompute reads the rows).
+    added_at: ActiveDeck.created_at of that add. Does NOT commit.
+    The score update is read-modify-write (log space needs log/exp, which SQLite may lack):
+    the counter UPDATE runs first, so the write lock is held before the score is read.
+    """
+    db.exec(update(Deck).where(Deck.id == deck_id).values(adoption_count=Deck.adoption_count + delta))
+    count, score = db.exec(select(Deck.adoption_count, Deck.trending_score).where(Deck.id == deck_id)).one()
+
+    if count <= 0:
+        score = NO_TRENDING_SCORE
+    elif delta > 0:
+        score = _log2_add(score, trend_exponent(added_at))
+    else:
+        withdrawn = _log2_subtract(score, trend_exponent(added_at))
+        score = withdrawn if withdrawn is not None else _deck_trending_score(db, deck_id)
+    db.exec(update(Deck).where(Deck.id == deck_id).values(trending_score=score))
+
+# --- FULL REBUILD ---
+
+def has_linear_trending_scores() -> bool:
+    """
+    True if Deck.trending_score still holds the raw sum of weights (before scores were stored
+    in log2 space): an unheld deck at 0 instead of NO_TRENDING_SCORE, or a value no log2
+    score reaches. init_db then rebuilds the popularity once.
+    """
+    with Session(engine) as db:
+        return db.exec(
+            select(Deck.id).where(
+                ((Deck.adoption_count == 0) & (Deck.trending_score != NO_TRENDING_SCORE))
+                | (Deck.trending_score > 1e6)
+            ).limit(1)
+        ).first() is not None
+
+def rebuild_popularity() -> int:
+    """
+    Recomputes Deck.adoption_count and Deck.trending_score from the ActiveDeck table.
+    Runs once automatically when the columns are added to an existing database;
+    run it while nobody is adding or removing decks.
+    Command line: python -m src.services.popularity_service
+    Returns: Number of decks held in at least one bookshelf.
+    """
+    started = time.perf_counter()
+    with Session(engine) as db:
+        counts: Dict[int, int] = {}
+        scores: Dict[int, float] = {}
+        # Streamed: the scores are computed in Python (SQLite may lack math functions)
+        for deck_id, added_at in db.exec(select(ActiveDeck.deck_id, ActiveDeck.created_at)).yield_per(5000):
+            counts[deck_id] = counts.get(deck_id, 0) + 1
+            scores[deck_id] = _log2_add(scores.get(deck_id, NO_TRENDING_SCORE), trend_exponent(added_at))
+
+        db.exec(update(Deck).values(adoption_count=0, trending_score=NO_TRENDING_SCORE))
+        if counts:
+            # One executemany (bind names must differ from the column names)
+            db.connection().execute(
+                update(Deck.__table__)
+                .where(Deck.__table__.c.id == bindparam("b_id"))
+                .values(adoption_count=bindparam("b_count"), trending_score=bindparam("b_score")),
+                [{"b_id": deck_id, "b_count": counts[deck_id], "b_score": scores[deck_id]} for deck_id in counts]
+            )
+        db.commit()
+
+    logger.info(f"Rebuilt popularity of {len(counts)} deck(s) in {(time.perf_counter() - started) * 1000:.0f} ms.")
+    return len(counts)
+
+if __name__ == "__main__":
+    from src.database import init_db
+    init_db()
+    print(f"Rebuilt deck popularity ({rebuild_popularity()} decks in bookshelves).")
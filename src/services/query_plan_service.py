@@ -0,0 +1,97 @@
+# src/services/query_plan_service.py
+from datetime import datetime
+from typing import Any, List, Tuple
+from sqlmodel import SQLModel
+from src.database import engine
+from src.core.log_manager import logger
+from src.core.pagination import CURSOR_NEXT
+from src.schemas import LibraryFilters
+from src.services import deck_service, bookshelf_service, study_service, deck_index_service, card_cache_service, facet_service
+
+# Placeholder values: SQLite picks the plan from the schema, not from the bound values
+_SAMPLE_ID = 1
+_SAMPLE_TIME = datetime(2024, 1, 1)
+
+def _audited_statements() -> List[Tuple[str, Any]]:
+    """The hot service queries, built through the same builders the services use."""
+    public_cursor = ([_SAMPLE_TIME, _SAMPLE_ID], CURSOR_NEXT)
+    bookshelf_cursor = ([_SAMPLE_TIME, _SAMPLE_TIME, _SAMPLE_ID], CURSOR_NEXT)
+    return [
+        ("public decks count", deck_service._public_decks_count_statement()),
+        ("public decks (first page)", deck_service._public_decks_statement(None, 9)),
+        ("public decks (cursor page)", deck_service._public_decks_statement(public_cursor, 9)),
+        ("public decks (language pair)", deck_service._public_decks_statement(public_cursor, 9, LibraryFilters("en", "es"))),
+        ("public decks (most added)", deck_service._public_decks_statement(([3, _SAMPLE_ID], CURSOR_NEXT), 9, sort="most_added")),
+        ("public decks (trending)", deck_service._public_decks_statement(([1.5, _SAMPLE_ID], CURSOR_NEXT), 9, sort="trending")),
+        ("public decks (tag + size)", deck_service._public_decks_statement(public_cursor, 9, LibraryFilters(size="medium", tag_id=_SAMPLE_ID))),
+        ("facet language pairs", facet_service._language_pairs_statement()),
+        ("facet top tags", facet_service._top_tags_statement()),
+        ("public search count", deck_service._public_search_count_statement('"verb"*')),
+        ("public search (cursor page)", deck_service._public_search_statement('"verb"*', ([1.5, _SAMPLE_ID], CURSOR_NEXT), 9)),
+        ("active deck ids", deck_service._active_deck_ids_statement(_SAMPLE_ID, [_SAMPLE_ID, _SAMPLE_ID + 1])),
+        ("active deck lookup", deck_service._active_deck_statement(_SAMPLE_ID, _SAMPLE_ID)),
+        ("study deck metadata", deck_service._study_deck_statement(_SAMPLE_ID)),
+        ("deck tags", deck_service._deck_tags_statement(_SAMPLE_ID)),
+        ("favorites", bookshelf_service._favorites_statement(_SAMPLE_ID)),
+        ("bookshelf count", bookshelf_service._bookshelf_count_statement(_SAMPLE_ID)),
+        ("bookshelf (first page)", bookshelf_service._bookshelf_statement(_SAMPLE_ID, None, 9)),
+        ("bookshelf (cursor page)", bookshelf_service._bookshelf_statement(_SAMPLE_ID, bookshelf_cursor, 9)),
+        ("owned active deck", bookshelf_service._owned_active_deck_statement(_SAMPLE_ID, _SAMPLE_ID)),
+        ("deck index cards", deck_index_service._cards_statement(_SAMPLE_ID)),
+        ("deck index tag links", deck_index_service._links_statement(_SAMPLE_ID)),
+        ("card views", card_cache_service._card_views_statement([_SAMPLE_ID, _SAMPLE_ID + 1])),
+        ("due cards", study_service._candidates_statement(_SAMPLE_ID, (1, 5), None, (_SAMPLE_ID, _SAMPLE_TIME))),
+        ("due cards (tags)", study_service._candidates_statement(_SAMPLE_ID, (1, 5), [1, 2], (_SAMPLE_ID, _SAMPLE_TIME))),
+    ]
+
+def _driver_value(value: Any) -> Any:
+    """Minimal bind processing for EXPLAIN (the sqlite3 driver only takes plain types)."""
+    if isinstance(value, datetime):
+        return value.isoformat(" ")
+    if isinstance(value, bool):
+        return int(value)
+    return value
+
+def explain_query_plan(statement) -> List[str]:
+    """
+    Runs EXPLAIN QUERY PLAN for a SQLAlchemy/SQLModel select.
+    Returns: The plan 'detail' lines (e.g. 'SEARCH card USING INDEX ix_card_deck_difficulty (deck_id=?)').
+    """
+    compiled = statement.compile(engine, compile_kwargs={"render_postcompile": True})
+    params = tuple(_driver_value(compiled.params[name]) for name in compiled.positiontup)
+    with engine.connect() as conn:
+        rows = conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {compiled}", params).all()
+    return [row[-1] for row in rows]
+
+def _full_scans(plan: List[str]) -> List[str]:
+    """Plan lines that read a whole table ('SCAN deck', not 'SCAN deck USING INDEX ...')."""
+    tables = set(SQLModel.metadata.tables)
+    return [
+        line for line in plan
+        if line.startswith("SCAN ") and " USING " not in line and line.split()[1] in tables
+    ]
+
+def audit_query_plans() -> List[str]:
+    """
+    Startup check: explains every hot service query and warns about full table scans
+    (usually a missing or unusable index).
+    Returns: One message per offending query.
+    """
+    statements = _audited_statements()
+    problems = []
+    for name, statement in statements:
+        try:
+            plan = explain_query_plan(statement)
+        except Exception as e:
+            logger.warning(f"Query plan audit could not explain '{name}': {e}")
+            continue
+
+        scans = _full_scans(plan)
+        if scans:
+            problems.append(f"'{name}' does a full table scan: {'; '.join(scans)}")
+
+    for problem in problems:
+        logger.warning(f"Query plan audit: {problem}")
+    if not problems:
+        logger.info(f"Query plan audit: {len(statements)} queries checked, no full table scans.")
+    return problems
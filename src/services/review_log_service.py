@@ -0,0 +1,157 @@
+# src/services/review_log_service.py
+import asyncio
+import threading
+from collections import deque
+from datetime import datetime, timezone
+from itertools import islice
+from typing import Deque, Dict, List, Optional
+from sqlalchemy import insert
+from sqlmodel import Session
+from src.database import engine
+from src.models import ReviewEvent
+from src.core.log_manager import logger
+from src.services.scheduler_service import apply_reviews
+from src.services.stats_service import apply_review_stats
+
+# --- CONSTANTS ---
+FLUSH_BATCH_SIZE = 500              # Buffered events that wake the flusher before its interval
+FLUSH_INTERVAL_SECONDS = 1.0        # Max age of a buffered event under light load
+WRITE_CHUNK_SIZE = 2000             # Rows per INSERT transaction when draining a backlog
+MAX_BUFFERED_EVENTS = 20_000        # Memory bound: producers wait beyond this
+BACKPRESSURE_TIMEOUT_SECONDS = 10.0 # Max wait for room before an answer is rejected
+MAX_FLUSH_ATTEMPTS = 5              # A chunk that keeps failing is dropped (logged) instead of blocking the rest
+
+class ReviewLogFullError(RuntimeError):
+    """The buffer stayed full for BACKPRESSURE_TIMEOUT_SECONDS (the DB is not keeping up)."""
+
+def review_event(user_id: int, active_deck_id: int, card_id: int, result: str, latency_ms: Optional[int] = None) -> Dict:
+    """Row of ReviewEvent, timestamped now."""
+    return {
+        "user_id": user_id,
+        "active_deck_id": active_deck_id,
+        "card_id": card_id,
+        "result": result,
+        "latency_ms": latency_ms,
+        "reviewed_at": datetime.now(timezone.utc),
+    }
+
+class ReviewLogBuffer:
+    """
+    Write-behind buffer of answered cards.
+    `record` only appends to memory; a background thread drains the buffer in bulk inserts
+    (when FLUSH_BATCH_SIZE events are waiting or every FLUSH_INTERVAL_SECONDS), scheduling the
+    batch and updating the deck stats rollups in the same transaction. Events leave the buffer only once written, so memory stays
+    bounded by MAX_BUFFERED_EVENTS and a slow DB makes producers wait instead of piling up.
+    """
+
+    def __init__(self):
+        self._events: Deque[Dict] = deque()
+        self._cond = threading.Condition()     # Signals both "batch ready" and "room freed"
+        self._flush_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._flusher: Optional[threading.Thread] = None
+        self._failed_attempts = 0
+
+    # --- PUBLIC API ---
+
+    def record(self, event: Dict, timeout: float = BACKPRESSURE_TIMEOUT_SECONDS):
+        """Buffers one event, blocking while the buffer is full. Raises ReviewLogFullError on timeout."""
+        with self._cond:
+            if not self._cond.wait_for(lambda: len(self._events) < MAX_BUFFERED_EVENTS, timeout=timeout):
+                raise ReviewLogFullError(f"Review log buffer full ({MAX_BUFFERED_EVENTS} events pending)")
+            self._append(event)
+        self._ensure_flusher()
+
+    async def record_async(self, event: Dict, timeout: float = BACKPRESSURE_TIMEOUT_SECONDS):
+        """`record` for the event loop: the (rare) wait for room happens in a worker thread."""
+        with self._cond:
+            if len(self._events) < MAX_BUFFERED_EVENTS:
+                self._append(event)
+                event = None
+        if event is not None:
+            await asyncio.to_thread(self.record, event, timeout)
+        self._ensure_flusher()
+
+    def pending(self) -> int:
+        with self._cond:
+            return len(self._events)
+
+    def flush(self) -> int:
+        """
+        Writes every buffered event (safe to call from any thread).
+        Returns: Number of events written.
+        """
+        written = 0
+        with self._flush_lock:
+            while True:
+                with self._cond:
+                    chunk = list(islice(self._events, WRITE_CHUNK_SIZE))
+                if not chunk:
+                    return written
+                try:
+                    self._write(chunk)
+                    self._failed_attempts = 0
+                except Exception as e:
+                    self._failed_attempts += 1
+                    if self._failed_attempts < MAX_FLUSH_ATTEMPTS:
+                        logger.error(f"Review log flush failed ({len(chunk)} events kept): {e}")
+                        return written
+                    logger.error(f"Review log flush failed {self._failed_attempts} times; dropping {len(chunk)} events: {e}")
+                    self._failed_attempts = 0
+                else:
+                    written += len(chunk)
+
+                with self._cond:
+                    for _ in chunk:
+                        self._events.popleft()
+                    self._cond.notify_all()
+
+    def shutdown(self):
+        """Stops the background flusher and writes whatever is pending."""
+        self._stop.set()
+        with self._cond:
+            self._cond.notify_all()
+        if self._flusher is not None:
+            self._flusher.join(timeout=FLUSH_INTERVAL_SECONDS * 2)
+        self.flush()
+
+    # --- INTERNALS ---
+
+    def _append(self, event: Dict):
+        """Caller holds self._cond."""
+        self._events.append(event)
+        if len(self._events) >= FLUSH_BATCH_SIZE:
+            self._cond.notify_all()
+
+    def _write(self, events: List[Dict]):
+        with Session(engine) as db:
+            db.exec(insert(ReviewEvent), params=events)
+            transitions = apply_reviews(db, [(e["active_deck_id"], e["card_id"], e["result"], e["reviewed_at"]) for e in events])
+            apply_review_stats(db, events, transitions)
+            db.commit()
+
+    def _ensure_flusher(self):
+        with self._cond:
+            if self._flusher is not None or self._stop.is_set():
+                return
+            self._flusher = threading.Thread(target=self._flush_loop, name="review-log-flusher", daemon=True)
+            self._flusher.start()
+
+    def _flush_loop(self):
+        while not self._stop.is_set():
+            with self._cond:
+                self._cond.wait_for(
+                    lambda: len(self._events) >= FLUSH_BATCH_SIZE or self._stop.is_set(),
+                    timeout=FLUSH_INTERVAL_SECONDS
+                )
+            if not self._stop.is_set():
+                self.flush()
+                if self._failed_attempts:
+                    self._stop.wait(FLUSH_INTERVAL_SECONDS)    # Back off instead of spinning on a full buffer
+
+# Process-wide buffer
+review_log = ReviewLogBuffer()
+
+def shutdown_review_log():
+    """Shutdown hook: writes the buffered review events."""
+    review_log.shutdown()
@@ -0,0 +1,174 @@
+# src/services/sanitize_service.py
+import hashlib
+import threading
+from collections import OrderedDict
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, Iterable, List, Optional, Tuple
+import bleach
+from nicegui import run
+from src.schemas import CardImportDTO
+from src.core.log_manager import logger
+
+ALLOWED_TAGS = ['b', 'i', 'strong', 'em', 'p', 'br', 'ul', 'ol', 'li', 'code', 'pre', 'h1', 'h2', 'h3', 'blockquote', 'span']
+
+# --- TUNING ---
+CACHE_MAX_ENTRIES = 50_000          # Sanitized fragments kept in the LRU
+CACHE_MAX_CHARS = 32 * 1024 * 1024  # Upper bound on cached text (approx. memory)
+PARALLEL_THRESHOLD = 512            # Uncached fragments needed before fanning out to processes
+PARALLEL_BATCH = 256                # Fragments per process-pool task
+
+def sanitize_html(content: str) -> str:
+    """Raw (uncached) sanitizer. Top-level so it can run in worker processes."""
+    if not content: return ""
+    return bleach.clean(content, tags=ALLOWED_TAGS, strip=True)
+
+def _sanitize_batch(contents: List[str]) -> List[str]:
+    """Process-pool task: sanitizes a batch of fragments."""
+    return [sanitize_html(c) for c in contents]
+
+def _content_key(content: str) -> bytes:
+    return hashlib.blake2b(content.encode('utf-8'), digest_size=16).digest()
+
+class SanitizeCache:
+    """
+    Thread-safe LRU of sanitized fragments keyed by a hash of the raw content.
+    Bounded both by entry count and by total cached characters.
+    """
+
+    def __init__(self, max_entries: int = CACHE_MAX_ENTRIES, max_chars: int = CACHE_MAX_CHARS):
+        self.max_entries = max_entries
+        self.max_chars = max_chars
+        self._data: "OrderedDict[bytes, str]" = OrderedDict()
+        self._chars = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: bytes) -> Optional[str]:
+        with self._lock:
+            value = self._data.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key: bytes, value: str):
+        with self._lock:
+            previous = self._data.pop(key, None)
+            if previous is not None:
+                self._chars -= len(previous)
+            self._data[key] = value
+            self._chars += len(value)
+            while self._data and (len(self._data) > self.max_entries or self._chars > self.max_chars):
+                _, evicted = self._data.popitem(last=False)
+                self._chars -= len(evicted)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._chars = 0
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._data),
+                "chars": self._chars,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_ratio": (self.hits / lookups) if lookups else 0.0,
+            }
+
+# Process-wide cache (shared by every import)
+sanitize_cache = SanitizeCache()
+
+def get_sanitize_stats() -> Dict[str, float]:
+    """Hit/miss counters of the sanitizer cache."""
+    return sanitize_cache.stats()
+
+# --- BATCH API ---
+
+def _plan(contents: List[str]) -> Tuple[List[Optional[str]], Dict[bytes, Tuple[str, List[int]]]]:
+    """
+    Resolves what the cache already knows.
+    Returns: (results with None holes, {key: (raw content, [positions])} for the misses).
+    Duplicates within the batch are sanitized only once.
+    """
+    results: List[Optional[str]] = [None] * len(contents)
+    pending: Dict[bytes, Tuple[str, List[int]]] = {}
+
+    for i, content in enumerate(contents):
+        if not content:
+            results[i] = ""
+            continue
+        key = _content_key(content)
+        if key in pending:
+            pending[key][1].append(i)
+            continue
+        cached = sanitize_cache.get(key)
+        if cached is not None:
+            results[i] = cached
+        else:
+            pending[key] = (content, [i])
+
+    return results, pending
+
+def _apply(results: List[Optional[str]], pending: Dict[bytes, Tuple[str, List[int]]], cleaned: List[str]) -> List[str]:
+    for (key, (_, positions)), value in zip(pending.items(), cleaned):
+        sanitize_cache.put(key, value)
+        for i in positions:
+            results[i] = value
+    return results
+
+def sanitize_many(contents: List[str]) -> List[str]:
+    """
+    Sanitizes a list of fragments going through the cache.
+    Small workloads run inline; large ones fan out to the NiceGUI process pool.
+    Blocking: call it from a worker thread, never from the event loop with large inputs.
+    """
+    results, pending = _plan(contents)
+    raw = [content for content, _ in pending.values()]
+
+    if len(raw) < PARALLEL_THRESHOLD:
+        cleaned = _sanitize_batch(raw)
+    else:
+        cleaned = _sanitize_parallel(raw)
+
+    return _apply(results, pending, cleaned)
+
+def _sanitize_parallel(raw: List[str]) -> List[str]:
+    pool = run.process_pool
+    if pool is None:
+        # No process pool (e.g. scripts outside ui.run): stay in-process
+        return _sanitize_batch(raw)
+
+    batches = [raw[i : i + PARALLEL_BATCH] for i in range(0, len(raw), PARALLEL_BATCH)]
+    try:
+        return [value for part in pool.map(_sanitize_batch, batches) for value in part]
+    except (BrokenProcessPool, RuntimeError) as e:
+        logger.warning(f"Process pool unavailable for sanitization, running inline: {e}")
+        return _sanitize_batch(raw)
+
+# --- CARD HELPERS ---
+
+def _card_faces(cards: List[CardImportDTO]) -> List[str]:
+    faces = []
+    for card in cards:
+        faces.append(card.front_content)
+        faces.append(card.back_content)
+    return faces
+
+def _assign_faces(cards: List[CardImportDTO], cleaned: List[str]):
+    for i, card in enumerate(cards):
+        card.front_content = cleaned[2 * i]
+        card.back_content = cleaned[2 * i + 1]
+
+def sanitize_cards(cards: Iterable[CardImportDTO]):
+    """Sanitizes both faces of every card in place (in parallel for large batches)."""
+    cards = list(cards)
+    _assign_faces(cards, sanitize_many(_card_faces(cards)))
@@ -0,0 +1,86 @@
+# src/services/scheduler_service.py
+from datetime import datetime
+from typing import Dict, List, Optional, Sequence, Set, Tuple
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlmodel import Session, select, col, delete
+from src.models import CardReviewState, ActiveDeck
+from src.core.srs import ReviewState, GRADE_BY_RESULT, review
+
+# Max card IDs per "IN (...)" lookup (SQLite caps bound parameters per statement)
+STATE_LOOKUP_CHUNK = 500
+
+_STATE_FIELDS = ("due_at", "interval_days", "ease", "repetitions", "lapses", "last_reviewed_at")
+
+# (active_deck_id, card_id, result, reviewed_at)
+Review = Tuple[int, int, str, datetime]
+# (state before the batch or None if never reviewed, state after the batch)
+Transition = Tuple[Optional[ReviewState], ReviewState]
+
+def existing_active_deck_ids(db: Session, active_deck_ids: Sequence[int]) -> Set[int]:
+    """Answers may outlive their ActiveDeck (removed from the bookshelf before the flush)."""
+    if not active_deck_ids:
+        return set()
+    return set(db.exec(select(ActiveDeck.id).where(col(ActiveDeck.id).in_(list(active_deck_ids)))).all())
+
+def _load_states(db: Session, active_deck_id: int, card_ids: List[int]) -> Dict[Tuple[int, int], ReviewState]:
+    states = {}
+    for i in range(0, len(card_ids), STATE_LOOKUP_CHUNK):
+        chunk = card_ids[i : i + STATE_LOOKUP_CHUNK]
+        rows = db.exec(
+            select(CardReviewState).where(
+                CardReviewState.active_deck_id == active_deck_id,
+                col(CardReviewState.card_id).in_(chunk)
+            )
+        ).all()
+        for row in rows:
+            states[(active_deck_id, row.card_id)] = ReviewState(**{f: getattr(row, f) for f in _STATE_FIELDS})
+    return states
+
+def apply_reviews(db: Session, reviews: Sequence[Review]) -> Dict[Tuple[int, int], Transition]:
+    """
+    Runs the SM-2 scheduler over a batch of answers (in answer order) and upserts
+    the resulting CardReviewState rows: one lookup per deck + one executemany.
+    'DISCARD' answers are ignored. Does NOT commit.
+    Returns: (active_deck_id, card_id) -> (before, after) for every state written.
+    """
+    graded = [(a, c, GRADE_BY_RESULT[r], t) for a, c, r, t in reviews if r in GRADE_BY_RESULT]
+    if not graded:
+        return {}
+
+    existing = existing_active_deck_ids(db, {a for a, _, _, _ in graded})
+    graded = [g for g in graded if g[0] in existing]
+    if not graded:
+        return {}
+
+    # 1. Current states of every card touched by the batch
+    cards_by_deck: Dict[int, List[int]] = {}
+    for active_deck_id, card_id, _, _ in graded:
+        cards_by_deck.setdefault(active_deck_id, []).append(card_id)
+
+    states: Dict[Tuple[int, int], ReviewState] = {}
+    for active_deck_id, card_ids in cards_by_deck.items():
+        states.update(_load_states(db, active_deck_id, list(dict.fromkeys(card_ids))))
+    before = dict(states)
+
+    # 2. Schedule (repeated answers to one card chain in order)
+    for active_deck_id, card_id, grade, reviewed_at in graded:
+        key = (active_deck_id, card_id)
+        states[key] = review(states.get(key, ReviewState()), grade, reviewed_at)
+
+    # 3. Upsert
+    touched = dict.fromkeys((a, c) for a, c, _, _ in graded)
+    rows = [
+        {"active_deck_id": a, "card_id": c, **{f: getattr(states[(a, c)], f) for f in _STATE_FIELDS}}
+        for a, c in touched
+    ]
+    statement = sqlite_insert(CardReviewState)
+    statement = statement.on_conflict_do_update(
+        index_elements=["active_deck_id", "card_id"],
+        set_={f: statement.excluded[f] for f in _STATE_FIELDS}
+    )
+    db.exec(statement, params=rows)
+    return {key: (before.get(key), states[key]) for key in touched}
+
+def delete_review_states(db: Session, active_deck_id: int):
+    """Drops the scheduling data of an ActiveDeck (before deleting it). Does NOT commit."""
+    db.exec(delete(CardReviewState).where(CardReviewState.active_deck_id == active_deck_id))
@@ -0,0 +1,179 @@
+# src/services/search_service.py
+import html
+import re
+import time
+from typing import List, Optional, Sequence, Tuple
+from sqlalchemy import func, literal_column, table, column, union_all
+from sqlmodel import Session, select, col
+from src.database import engine
+from src.models import Card, CardTagLink, Tag
+from src.core.log_manager import logger
+
+# --- CONSTANTS ---
+FTS_TOKENIZER = "unicode61 remove_diacritics 2"     # Case/accent-insensitive ("canción" finds "cancion")
+FTS_PREFIXES = "3"                  # Prefix index: "ver"* is an index lookup, not a term scan
+MAX_QUERY_TERMS = 8                 # Extra words in a search box are dropped
+MIN_PREFIX_TERM_CHARS = 3           # Shorter terms match whole words only (a 2-letter prefix matches nearly everything)
+DECK_TITLE_WEIGHT = 10.0            # bm25 column weights of deck hits
+DECK_DESCRIPTION_WEIGHT = 3.0
+CARD_COVERAGE_WEIGHT = 1.0          # Relevance added when every card of a deck matches
+REBUILD_CHUNK = 5000                # Cards read per step when rebuilding the card index
+
+# FTS5 virtual tables (not SQLModel models: create_all can't build them)
+# deck_fts: external content over `deck` (title, description), rowid = Deck.id
+# card_fts: contentless (rowid = Card.id), faces as plain text + tag names
+_SEARCH_TABLES_DDL = {
+    "deck_fts": (
+        "CREATE VIRTUAL TABLE deck_fts USING fts5("
+        f"title, description, content='deck', content_rowid='id', tokenize='{FTS_TOKENIZER}', prefix='{FTS_PREFIXES}')"
+    ),
+    "card_fts": (
+        "CREATE VIRTUAL TABLE card_fts USING fts5("
+        f"front, back, tags, content='', tokenize='{FTS_TOKENIZER}', prefix='{FTS_PREFIXES}')"
+    ),
+}
+
+deck_fts = table("deck_fts", column("rowid"), column("title"), column("description"))
+card_fts = table("card_fts", column("rowid"), column("front"), column("back"), column("tags"))
+
+_HTML_TAG_RE = re.compile(r"<[^>]*>")
+_TERM_RE = re.compile(r"\w+", re.UNICODE)
+
+def plain_text(content: Optional[str]) -> str:
+    """Card faces are sanitized HTML: their words without the markup (search index, previews)."""
+    return html.unescape(_HTML_TAG_RE.sub(" ", content or ""))
+
+# --- QUERY PARSING ---
+
+def to_match_query(text: str) -> Optional[str]:
+    """
+    Turns free text from a search box into a safe FTS5 MATCH expression: every word
+    quoted (no FTS syntax reaches the engine), prefix-matched, all words required.
+    Returns: None when the text holds no searchable word.
+    """
+    terms = list(dict.fromkeys(t.lower() for t in _TERM_RE.findall(text or "")))[:MAX_QUERY_TERMS]
+    if not terms:
+        return None
+    return " ".join(f'"{t}"*' if len(t) >= MIN_PREFIX_TERM_CHARS else f'"{t}"' for t in terms)
+
+# --- STATEMENT BUILDERS ---
+
+def search_hits_subquery(match_query: str):
+    """
+    (deck_id, deck_score, matched_cards) of every deck matching `match_query` in its
+    title/description (bm25, higher is better) or in any of its cards. Cards are only
+    counted: bm25 per card costs more than the whole lookup for common terms.
+    Public or not: callers filter (and rank with `search_relevance`).
+    """
+    deck_hits = (
+        select(
+            deck_fts.c.rowid.label("deck_id"),
+            (-func.bm25(literal_column("deck_fts"), DECK_TITLE_WEIGHT, DECK_DESCRIPTION_WEIGHT)).label("deck_score"),
+            literal_column("0").label("matched_cards")
+        )
+        .where(literal_column("deck_fts").match(match_query))
+    )
+    card_hits = (
+        select(Card.deck_id, literal_column("0.0"), func.count())
+        .select_from(card_fts)
+        .join(Card, Card.id == card_fts.c.rowid)
+        .where(literal_column("card_fts").match(match_query))
+        .group_by(Card.deck_id)
+    )
+    hits = union_all(deck_hits, card_hits).subquery()
+    return (
+        select(
+            hits.c.deck_id,
+            func.sum(hits.c.deck_score).label("deck_score"),
+            func.sum(hits.c.matched_cards).label("matched_cards")
+        )
+        .group_by(hits.c.deck_id)
+        .subquery("search_hits")
+    )
+
+def search_relevance(hits, card_count):
+    """Ranking of a search hit: deck bm25 plus the share of the deck's cards that match."""
+    return hits.c.deck_score + CARD_COVERAGE_WEIGHT * hits.c.matched_cards / func.max(card_count, 1)
+
+# --- INDEX MAINTENANCE (Import time, same transaction as the rows) ---
+
+def index_deck(session: Session, deck_id: int, title: str, description: Optional[str]):
+    """Adds a new deck to the search index. Does NOT commit."""
+    session.exec(
+        deck_fts.insert().values(rowid=deck_id, title=title, description=description or "")
+    )
+
+def index_cards(session: Session, card_ids: Sequence[int], cards: Sequence, card_tag_names: Sequence[List[str]]):
+    """
+    Adds freshly inserted cards to the search index (one executemany). Does NOT commit.
+    cards: Objects with front_content / back_content, in the same order as card_ids.
+    """
+    rows = [
+        {"rowid": card_id, "front": plain_text(card.front_content), "back": plain_text(card.back_content), "tags": " ".join(names)}
+        for card_id, card, names in zip(card_ids, cards, card_tag_names)
+    ]
+    if rows:
+        session.exec(card_fts.insert(), params=rows)
+
+# --- SCHEMA & REBUILD ---
+
+def create_search_tables() -> List[str]:
+    """
+    Creates the missing FTS tables (idempotent). Called by init_db.
+    Returns: Names of the tables created.
+    """
+    created = []
+    with engine.begin() as conn:
+        existing = {row[0] for row in conn.exec_driver_sql("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        for name, ddl in _SEARCH_TABLES_DDL.items():
+            if name not in existing:
+                conn.exec_driver_sql(ddl)
+                created.append(name)
+    return created
+
+def _card_documents(session: Session, after_id: int) -> List[Tuple[int, str, str, Optional[str]]]:
+    return session.exec(
+        select(Card.id, Card.front_content, Card.back_content, func.group_concat(Tag.name, " "))
+        .outerjoin(CardTagLink, CardTagLink.card_id == Card.id)
+        .outerjoin(Tag, Tag.id == CardTagLink.tag_id)
+        .where(Card.id > after_id)
+        .group_by(Card.id)
+        .order_by(col(Card.id))
+        .limit(REBUILD_CHUNK)
+    ).all()
+
+def rebuild_search_index() -> int:
+    """
+    Rebuilds both FTS indexes from the deck/card tables. Runs once automatically when
+    the tables are added to an existing database; run it while no import is writing.
+    Command line: python -m src.services.search_service
+    Returns: Number of cards indexed.
+    """
+    started = time.perf_counter()
+    indexed = 0
+    with Session(engine) as session:
+        conn = session.connection()
+        conn.exec_driver_sql("INSERT INTO deck_fts(deck_fts) VALUES ('rebuild')")
+        # Contentless: old rows can't be deleted one by one without their text, so start over
+        conn.exec_driver_sql("INSERT INTO card_fts(card_fts) VALUES ('delete-all')")
+
+        last_id = 0
+        while True:
+            rows = _card_documents(session, last_id)
+            if not rows:
+                break
+            session.exec(card_fts.insert(), params=[
+                {"rowid": card_id, "front": plain_text(front), "back": plain_text(back), "tags": tags or ""}
+                for card_id, front, back, tags in rows
+            ])
+            indexed += len(rows)
+            last_id = rows[-1][0]
+        session.commit()
+
+    logger.info(f"Rebuilt search index: {indexed} cards in {(time.perf_counter() - started) * 1000:.0f} ms.")
+    return indexed
+
+if __name__ == "__main__":
+    from src.database import init_db
+    init_db()
+    print(f"Rebuilt search index ({rebuild_search_index()} cards).")
@@ -0,0 +1,202 @@
+# src/services/stats_service.py
+import json
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Sequence, Tuple
+from sqlalchemy import case
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlmodel import Session, select, func, col, delete
+from src.database import engine
+from src.models import ActiveDeck, Card, CardReviewState, DeckStats, ReviewEvent
+from src.core.srs import MASTERED_INTERVAL_DAYS, is_mastered
+from src.core.log_manager import logger
+from src.services.scheduler_service import Transition, existing_active_deck_ids
+from src.services.search_service import plain_text
+
+# --- CONSTANTS ---
+HARDEST_CARDS_KEPT = 3      # Cards listed per deck (ranked by lapses)
+HARDEST_FRONT_CHARS = 60    # Preview of the card front stored in the rollup
+
+_COUNTER_FIELDS = ("reviews", "correct", "wrong", "mastered_cards")
+
+def _front_preview(content: Optional[str]) -> str:
+    """Plain-text start of a card front (shown in a label: tags stripped before cutting)."""
+    text = " ".join(plain_text(content).split())
+    return text if len(text) <= HARDEST_FRONT_CHARS else text[: HARDEST_FRONT_CHARS - 1] + "…"
+
+def _rank_hardest(entries: Dict[int, dict]) -> List[dict]:
+    """Same order as the rebuild query: most lapses first, card id breaks ties."""
+    return sorted(entries.values(), key=lambda e: (-e["lapses"], e["card_id"]))[:HARDEST_CARDS_KEPT]
+
+def _upsert_stats(db: Session, rows: List[Dict]):
+    statement = sqlite_insert(DeckStats)
+    statement = statement.on_conflict_do_update(
+        index_elements=["active_deck_id"],
+        set_={f: statement.excluded[f] for f in (*_COUNTER_FIELDS, "hardest_json", "updated_at")}
+    )
+    db.exec(statement, params=rows)
+
+# --- INCREMENTAL UPDATE (Review log flush) ---
+
+def apply_review_stats(db: Session, events: Sequence[Dict], transitions: Dict[Tuple[int, int], Transition]) -> int:
+    """
+    Folds a flushed batch into the DeckStats rollups: the batch's answers and the
+    scheduler transitions it produced (mastered delta, lapses). Cost depends on the
+    batch only, never on the history size. Does NOT commit.
+    Returns: Number of rollups written.
+    """
+    deck_ids = existing_active_deck_ids(db, {e["active_deck_id"] for e in events})
+    if not deck_ids:
+        return 0
+
+    current = {
+        row.active_deck_id: row
+        for row in db.exec(select(DeckStats).where(col(DeckStats.active_deck_id).in_(list(deck_ids)))).all()
+    }
+    totals: Dict[int, Dict[str, int]] = {}
+    hardest: Dict[int, Dict[int, dict]] = {}
+    for active_deck_id in deck_ids:
+        row = current.get(active_deck_id)
+        totals[active_deck_id] = {f: getattr(row, f) if row else 0 for f in _COUNTER_FIELDS}
+        hardest[active_deck_id] = {e["card_id"]: e for e in json.loads(row.hardest_json)} if row else {}
+
+    # 1. Answer counters
+    for event in events:
+        counters = totals.get(event["active_deck_id"])
+        if counters is None:
+            continue
+        counters["reviews"] += 1
+        if event["result"] == 'KNOW':
+            counters["correct"] += 1
+        elif event["result"] == 'MISS':
+            counters["wrong"] += 1
+
+    # 2. Scheduling outcomes (lapses only grow, so merging into the kept top stays exact)
+    for (active_deck_id, card_id), (before, after) in transitions.items():
+        totals[active_deck_id]["mastered_cards"] += is_mastered(after) - is_mastered(before)
+        if after.lapses:
+            known = hardest[active_deck_id].get(card_id, {})
+            hardest[active_deck_id][card_id] = {"card_id": card_id, "lapses": after.lapses, "front": known.get("front")}
+
+    ranked = {active_deck_id: _rank_hardest(entries) for active_deck_id, entries in hardest.items()}
+    missing = {e["card_id"] for entries in ranked.values() for e in entries if e["front"] is None}
+    if missing:
+        fronts = dict(db.exec(select(Card.id, Card.front_content).where(col(Card.id).in_(list(missing)))).all())
+        for entries in ranked.values():
+            for entry in entries:
+                if entry["front"] is None:
+                    entry["front"] = _front_preview(fronts.get(entry["card_id"]))
+
+    now = datetime.now(timezone.utc)
+    rows = [
+        {"active_deck_id": a, **totals[a], "hardest_json": json.dumps(ranked[a]), "updated_at": now}
+        for a in deck_ids
+    ]
+    _upsert_stats(db, rows)
+    return len(rows)
+
+def delete_deck_stats(db: Session, active_deck_id: int):
+    """Drops the rollup of an ActiveDeck (before deleting it). Does NOT commit."""
+    db.exec(delete(DeckStats).where(DeckStats.active_deck_id == active_deck_id))
+
+# --- FULL REBUILD ---
+
+def rebuild_deck_stats(active_deck_ids: Optional[List[int]] = None) -> int:
+    """
+    Recomputes the rollups from the raw ReviewEvent / CardReviewState tables
+    (all active decks, or only `active_deck_ids`). Runs once automatically when the
+    table is added to an existing database; run it while no study session is flushing.
+    Command line: python -m src.services.stats_service
+    Returns: Number of rollups written.
+    """
+    def only_requested(statement, column):
+        return statement.where(col(column).in_(active_deck_ids)) if active_deck_ids else statement
+
+    with Session(engine) as db:
+        deck_ids = db.exec(only_requested(select(ActiveDeck.id), ActiveDeck.id)).all()
+        totals = {a: dict.fromkeys(_COUNTER_FIELDS, 0) for a in deck_ids}
+        hardest: Dict[int, List[dict]] = {a: [] for a in deck_ids}
+
+        # 1. Answer counters. Events older than their ActiveDeck belong to a removed one whose id was reused.
+        counts = (
+            select(
+                ReviewEvent.active_deck_id,
+                func.count(ReviewEvent.id),
+                func.sum(case((ReviewEvent.result == 'KNOW', 1), else_=0)),
+                func.sum(case((ReviewEvent.result == 'MISS', 1), else_=0)),
+            )
+            .join(ActiveDeck, ActiveDeck.id == ReviewEvent.active_deck_id)
+            .where(ReviewEvent.reviewed_at >= ActiveDeck.created_at)
+            .group_by(ReviewEvent.active_deck_id)
+        )
+        for active_deck_id, reviews, correct, wrong in db.exec(only_requested(counts, ReviewEvent.active_deck_id)).all():
+            totals[active_deck_id].update(reviews=reviews, correct=correct, wrong=wrong)
+
+        # 2. Mastered cards
+        mastered = (
+            select(CardReviewState.active_deck_id, func.count(CardReviewState.id))
+            .where(CardReviewState.interval_days >= MASTERED_INTERVAL_DAYS)
+            .group_by(CardReviewState.active_deck_id)
+        )
+        for active_deck_id, count in db.exec(only_requested(mastered, CardReviewState.active_deck_id)).all():
+            totals[active_deck_id]["mastered_cards"] = count
+
+        # 3. Hardest cards: top lapses per deck in one pass
+        rank = func.row_number().over(
+            partition_by=CardReviewState.active_deck_id,
+            order_by=(col(CardReviewState.lapses).desc(), col(CardReviewState.card_id))
+        ).label("rank")
+        ranked = only_requested(
+            select(CardReviewState.active_deck_id, CardReviewState.card_id, CardReviewState.lapses, rank)
+            .where(CardReviewState.lapses > 0),
+            CardReviewState.active_deck_id
+        ).subquery()
+        top = (
+            select(ranked.c.active_deck_id, ranked.c.card_id, ranked.c.lapses, Card.front_content)
+            .join(Card, Card.id == ranked.c.card_id)
+            .where(ranked.c.rank <= HARDEST_CARDS_KEPT)
+            .order_by(ranked.c.active_deck_id, ranked.c.rank)
+        )
+        for active_deck_id, card_id, lapses, front in db.exec(top).all():
+            hardest[active_deck_id].append({"card_id": card_id, "lapses": lapses, "front": _front_preview(front)})
+
+        db.exec(only_requested(delete(DeckStats), DeckStats.active_deck_id))
+        now = datetime.now(timezone.utc)
+        rows = [
+            {"active_deck_id": a, **totals[a], "hardest_json": json.dumps(hardest[a]), "updated_at": now}
+            for a in deck_ids
+        ]
+        if rows:
+            _upsert_stats(db, rows)
+        db.commit()
+
+    logger.info(f"Rebuilt review stats of {len(rows)} active deck(s).")
+    return len(rows)
+
+def has_markup_previews() -> bool:
+    """
+    True if some rollup still stores an HTML card front (written before previews were plain text).
+    init_db then rebuilds the rollups once.
+    """
+    with Session(engine) as db:
+        return db.exec(
+            select(DeckStats.active_deck_id).where(DeckStats.hardest_json.op("GLOB")("*<[a-zA-Z/]*>*")).limit(1)
+        ).first() is not None
+
+# --- READ HELPERS ---
+
+def summarize_deck_stats(correct: Optional[int], wrong: Optional[int], mastered_cards: Optional[int], hardest_json: Optional[str]) -> Dict:
+    """
+    UI-ready view of the rollup columns (all None when outer-joined for a never-studied deck).
+    Returns: {"accuracy", "mastered_cards", "hardest_cards"}
+    """
+    graded = (correct or 0) + (wrong or 0)
+    return {
+        "accuracy": round(100 * correct / graded) if graded else None,
+        "mastered_cards": mastered_cards or 0,
+        "hardest_cards": tuple(json.loads(hardest_json)) if hardest_json else (),
+    }
+
+if __name__ == "__main__":
+    from src.database import init_db
+    init_db()
+    print(f"Rebuilt review stats of {rebuild_deck_stats()} active deck(s).")
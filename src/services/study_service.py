@@ -1,128 +1,240 @@
 # src/services/study_service.py
 from typing import List, Tuple, Optional, Dict
 from datetime import datetime, timezone
+import asyncio
 import random
-import json
 from src.core.log_manager import logger
+from src.core.sql_profiler import profiled
 
 from nicegui import app
-from sqlmodel import Session, select
-from src.database import engine
-from src.models import Card, ActiveDeck, CardTagLink
-from src.schemas import SessionState  # Assumed to be defined in schemas.py
+from sqlalchemy import and_, or_
+from sqlmodel import Session, select, update, func, col
+from src.database import engine, create_async_session
+from src.models import Card, ActiveDeck, CardTagLink, CardReviewState
+from src.services.study_session_store import session_store, StudySession
+from src.services.review_log_service import review_log, review_event
+from src.core.compact_queue import CompactQueue
+from src.core.bitmap_index import DeckBitmapIndex
+from src.services.deck_index_service import get_deck_index, get_deck_index_async
+from src.services.card_cache_service import card_cache, get_card_views, get_card_views_async
+from src.schemas import CardView
 
 # --- CONSTANTS ---
-SESSION_KEY = 'active_study_session'
+# Where sessions used to live (whole blob in app.storage.user); only cleaned up now
+LEGACY_SESSION_KEY = 'active_study_session'
 DEFAULT_BATCH_SIZE = 5
 
+def _current_user_id() -> Optional[int]:
+    return app.storage.user.get('id')
+
 # --- FILTERING LOGIC ---
 
+def _candidates_statement(
+    deck_id: int,
+    difficulty_range: Tuple[int, int],
+    tag_ids: Optional[List[int]],
+    due: Optional[Tuple[int, datetime]] = None
+):
+    """
+    Builds the candidate Card ID query for the user-defined filters.
+    due: Optional (active_deck_id, now): only cards whose review is due, never-reviewed cards
+         included (they have no CardReviewState yet). Each deck card probes its state
+         through the unique (active_deck_id, card_id) index.
+    """
+    query = select(Card.id).where(Card.deck_id == deck_id)
+    if due:
+        active_deck_id, now = due
+        query = (
+            query
+            .outerjoin(CardReviewState, and_(
+                CardReviewState.active_deck_id == active_deck_id,
+                CardReviewState.card_id == Card.id
+            ))
+            .where(or_(col(CardReviewState.id).is_(None), CardReviewState.due_at <= now))
+        )
+
+    # Filter: Difficulty
+    min_diff, max_diff = difficulty_range
+    query = query.where(Card.base_difficulty >= min_diff)
+    query = query.where(Card.base_difficulty <= max_diff)
+
+    # Filter: Tags (Optional)
+    if tag_ids:
+        query = query.join(CardTagLink).where(CardTagLink.tag_id.in_(tag_ids))
+
+    return query
+
+def _due_filter(active_deck_id: int, due_only: bool) -> Optional[Tuple[int, datetime]]:
+    return (active_deck_id, datetime.now(timezone.utc)) if due_only else None
+
+def _shuffle_seed(shuffle: bool) -> Optional[int]:
+    # Shuffling only picks a seed: the order is recomputed lazily from fetch_index.
+    return random.getrandbits(63) if shuffle else None
+
+def _order_candidates(results, shuffle: bool) -> CompactQueue:
+    # Deduplicated & sorted into ID runs (joins may create duplicates).
+    return CompactQueue.from_ids(results, seed=_shuffle_seed(shuffle))
+
+def _indexed_candidates(index: DeckBitmapIndex, deck_id: int, difficulty_range: Tuple[int, int], tag_ids: Optional[List[int]], shuffle: bool) -> CompactQueue:
+    # The deck row was just read: cached card views of an older version are dropped now
+    card_cache.observe_deck(deck_id, index.stamp)
+    # Bitwise AND/OR on the deck's bitmap index: no candidate query, no ID list materialized
+    bits = index.match(difficulty_range, tag_ids)
+    return CompactQueue.from_runs(index.id_runs(bits), seed=_shuffle_seed(shuffle))
+
 def _fetch_session_candidates(
     active_deck_id: int, 
     difficulty_range: Tuple[int, int] = (1, 5), 
     tag_ids: Optional[List[int]] = None,
-    shuffle: bool = True
-) -> List[int]:
+    shuffle: bool = True,
+    due_only: bool = False
+) -> CompactQueue:
     """
-    Internal helper: Generates the List of Card IDs for the study session. This applies the user-defined filters.
-    Returns: List of Card IDs.
+    Internal helper: Generates the queue of Card IDs for the study session. This applies the user-defined filters.
+    due_only: Restrict to cards the scheduler says are due now, plus the never-reviewed ones.
+    Returns: CompactQueue of Card IDs (sorted candidate runs + shuffle seed).
     """
     with Session(engine) as session:
         # 1. Validate Deck Ownership via ActiveDeck
         active_deck = session.get(ActiveDeck, active_deck_id)
         if not active_deck:
             raise ValueError("Active Deck not found.")
-            
-        # 2. Build Query
-        query = select(Card.id).where(Card.deck_id == active_deck.deck_id)
-        
-        # 3. Filter: Difficulty
-        min_diff, max_diff = difficulty_range
-        query = query.where(Card.base_difficulty >= min_diff)
-        query = query.where(Card.base_difficulty <= max_diff)
-        
-        # 4. Filter: Tags (Optional)
-        if tag_ids:
-            query = query.join(CardTagLink).where(CardTagLink.tag_id.in_(tag_ids))
-        
-        # 5. Execute
-        results = session.exec(query).all()
-        # Deduplicate results (in case joins created duplicates)
-        card_ids = list(set(results))
-
-        # 6. Order/Shuffle
-        if shuffle:
-            random.shuffle(card_ids)
-        else:
-            card_ids.sort() # Deterministic order if not shuffled
-            
-        return card_ids
+
+        # 2. Due cards come from the scheduler's table; everything else from the deck's bitmap index
+        if due_only:
+            results = session.exec(_candidates_statement(active_deck.deck_id, difficulty_range, tag_ids, _due_filter(active_deck_id, due_only))).all()
+            return _order_candidates(results, shuffle)
+        index = get_deck_index(session, active_deck.deck_id)
+
+    return _indexed_candidates(index, active_deck.deck_id, difficulty_range, tag_ids, shuffle)
+
+async def _fetch_session_candidates_async(
+    active_deck_id: int,
+    difficulty_range: Tuple[int, int] = (1, 5),
+    tag_ids: Optional[List[int]] = None,
+    shuffle: bool = True,
+    due_only: bool = False
+) -> CompactQueue:
+    """Async variant of `_fetch_session_candidates`."""
+    async with create_async_session() as session:
+        active_deck = await session.get(ActiveDeck, active_deck_id)
+        if not active_deck:
+            raise ValueError("Active Deck not found.")
+
+        if due_only:
+            results = (await session.exec(_candidates_statement(active_deck.deck_id, difficulty_range, tag_ids, _due_filter(active_deck_id, due_only)))).all()
+            return _order_candidates(results, shuffle)
+        index = await get_deck_index_async(session, active_deck.deck_id)
+
+    return _indexed_candidates(index, active_deck.deck_id, difficulty_range, tag_ids, shuffle)
+
+# --- LIVE COUNT (Setup step) ---
+
+def _matching_count_statement(deck_id: int, difficulty_range: Tuple[int, int], tag_ids: Optional[List[int]], due: Tuple[int, datetime]):
+    candidates = _candidates_statement(deck_id, difficulty_range, tag_ids, due).distinct().subquery()
+    return select(func.count()).select_from(candidates)
+
+def count_matching_cards(
+    active_deck_id: int,
+    difficulty_range: Tuple[int, int] = (1, 5),
+    tag_ids: Optional[List[int]] = None,
+    due_only: bool = False
+) -> int:
+    """
+    Number of cards a session with these filters would contain, cheap enough for every input change:
+    a popcount on the deck's cached bitmap index (due_only: one COUNT probing each card's review state).
+    Returns: 0 if the Active Deck does not exist.
+    """
+    with Session(engine) as session:
+        active_deck = session.get(ActiveDeck, active_deck_id)
+        if not active_deck:
+            return 0
+        if due_only:
+            return session.exec(_matching_count_statement(active_deck.deck_id, difficulty_range, tag_ids, _due_filter(active_deck_id, True))).one()
+        return get_deck_index(session, active_deck.deck_id).count(difficulty_range, tag_ids)
+
+async def count_matching_cards_async(
+    active_deck_id: int,
+    difficulty_range: Tuple[int, int] = (1, 5),
+    tag_ids: Optional[List[int]] = None,
+    due_only: bool = False
+) -> int:
+    """Async variant of `count_matching_cards`."""
+    async with create_async_session() as session:
+        active_deck = await session.get(ActiveDeck, active_deck_id)
+        if not active_deck:
+            return 0
+        if due_only:
+            return (await session.exec(_matching_count_statement(active_deck.deck_id, difficulty_range, tag_ids, _due_filter(active_deck_id, True)))).one()
+        index = await get_deck_index_async(session, active_deck.deck_id)
+        return index.count(difficulty_range, tag_ids)
 
 # --- SESSION LIFECYCLE (Set/Reset) ---
 
-def initialize_session(
+def _store_new_session(
     active_deck_id: int,
+    queue: CompactQueue,
     difficulty_range: Tuple[int, int],
     tag_ids: List[int],
     shuffle: bool
 ) -> int:
-    """
-    Initializes the Game State in app.storage.user.
-    Returns: Total number of cards in the queue.
-    """
-    # 1. Generate the Queue
-    queue = _fetch_session_candidates(active_deck_id, difficulty_range, tag_ids, shuffle)
-
+    """Starts a server-side session for a freshly generated queue."""
     if not queue:
         raise ValueError("No cards match the selected filters.")
     logger.info(f"Initialized session with {len(queue)} cards for ActiveDeck ID {active_deck_id} using filters: difficulty_range={difficulty_range}, tag_ids={tag_ids}, shuffle={shuffle}")
 
-    # 2. Construct the State Object (TypedDict)
-    new_state: SessionState = {
-        "deck_id": active_deck_id,
-        "start_time": datetime.now(timezone.utc).isoformat(),
-        
-        # The Map
-        "queue": queue,
-        "initial_count": len(queue),
-        
-        # server-side cursor: How many cards have we sent to the client?
-        "fetch_index": 0,
-        
-        # Stats
-        "stats": {
-            "correct": 0,
-            "wrong": 0,
-            "combo": 0,
-            "mistakes": {}
-        }
-    }
-    
-    # 3. Persist to Cookie-Storage
-    app.storage.user[SESSION_KEY] = new_state
+    # The store keeps it in memory and persists it in the background (see study_session_store.py)
+    session_store.start(_current_user_id(), active_deck_id, queue)
+    app.storage.user.pop(LEGACY_SESSION_KEY, None)
     
     return len(queue)
 
+@profiled()
+def initialize_session(
+    active_deck_id: int,
+    difficulty_range: Tuple[int, int],
+    tag_ids: List[int],
+    shuffle: bool,
+    due_only: bool = False
+) -> int:
+    """
+    Initializes the Game State in the server-side session store.
+    due_only: Build a "due now" queue from the scheduler instead of the whole (filtered) deck.
+    Returns: Total number of cards in the queue.
+    """
+    queue = _fetch_session_candidates(active_deck_id, difficulty_range, tag_ids, shuffle, due_only)
+    return _store_new_session(active_deck_id, queue, difficulty_range, tag_ids, shuffle)
+
+@profiled()
+async def initialize_session_async(
+    active_deck_id: int,
+    difficulty_range: Tuple[int, int],
+    tag_ids: List[int],
+    shuffle: bool,
+    due_only: bool = False
+) -> int:
+    """Async variant of `initialize_session`."""
+    queue = await _fetch_session_candidates_async(active_deck_id, difficulty_range, tag_ids, shuffle, due_only)
+    return _store_new_session(active_deck_id, queue, difficulty_range, tag_ids, shuffle)
+
 def clear_session():
     """Removes the current session from storage."""
-    if SESSION_KEY in app.storage.user:
-        del app.storage.user[SESSION_KEY]
+    session_store.discard(_current_user_id())
 
 # --- BATCH FETCHING ---
 
-def get_next_batch(batch_size: int = DEFAULT_BATCH_SIZE) -> List[Card]:
+def _next_batch_ids(state: Optional[StudySession], batch_size: int) -> List[int]:
     """
-    Fetches the next N cards from the queue based on fetch_index.
-    Minimizes DB calls by buffering.
+    Determines the next slice of the queue based on fetch_index.
+    state: The user's session (None when there is no active session).
+    Returns: Batch IDs (empty when there is nothing left to fetch).
     """
-    state: SessionState = app.storage.user.get(SESSION_KEY)
     if not state:
         logger.warning("No active study session found when fetching next batch.")
         return []
 
-    # 1. Determine Slice
-    queue = state['queue']
-    start_idx = state['fetch_index']
+    queue = state.queue
+    start_idx = state.fetch_index
     
     if start_idx >= len(queue):
         logger.warning("Fetch index beyond queue length; no more cards to fetch.")
@@ -138,60 +250,105 @@ def get_next_batch(batch_size: int = DEFAULT_BATCH_SIZE) -> List[Card]:
     
     if not batch_ids:
         logger.warning("No batch IDs found in the specified range; returning empty list. This should not happen if the queue and fetch_index are managed correctly.")
-        return []
 
-    # 2. Bulk Fetch Content
-    with Session(engine) as session:
-        statement = select(Card).where(Card.id.in_(batch_ids))
-        cards = session.exec(statement).all()
-        
-        # Re-order results to match the queue order (SQL 'IN' does not guarantee order)
-        card_map = {c.id: c for c in cards}
-        ordered_cards = [card_map[uid] for uid in batch_ids if uid in card_map]
-
-    # 3. Update Cursor
-    state['fetch_index'] += len(ordered_cards)
-    app.storage.user[SESSION_KEY] = state
+    return batch_ids
+
+def _advance_cursor(state: StudySession, batch_ids: List[int], card_map: Dict[int, CardView]) -> List[CardView]:
+    """Re-orders fetched cards to match the queue and moves the server cursor."""
+    # Neither the cache nor SQL 'IN' preserve the queue order
+    ordered_cards = [card_map[uid] for uid in batch_ids if uid in card_map]
+
+    # Only the new cursor position is written (not the whole session)
+    session_store.record_fetch(state.user_id, state.fetch_index + len(ordered_cards))
     
-    logger.info(f"Fetched batch of {len(ordered_cards)} cards; updated fetch_index to {state['fetch_index']}. Initial index range was {start_idx}-{end_idx}.")
+    logger.info(f"Fetched batch of {len(ordered_cards)} cards; updated fetch_index to {state.fetch_index}.")
 
     return ordered_cards
 
+@profiled()
+def get_next_batch(batch_size: int = DEFAULT_BATCH_SIZE) -> List[CardView]:
+    """
+    Fetches the next N cards from the queue based on fetch_index.
+    Minimizes DB calls by buffering; cards of hot decks come from the shared card cache.
+    """
+    state = session_store.get(_current_user_id())
+    batch_ids = _next_batch_ids(state, batch_size)
+    if not batch_ids:
+        return []
+
+    return _advance_cursor(state, batch_ids, get_card_views(batch_ids))
+
+@profiled()
+async def get_next_batch_async(batch_size: int = DEFAULT_BATCH_SIZE) -> List[CardView]:
+    """Async variant of `get_next_batch`."""
+    # A session missing from memory is loaded off the event loop
+    state = await session_store.get_async(_current_user_id())
+    batch_ids = _next_batch_ids(state, batch_size)
+    if not batch_ids:
+        return []
+
+    return _advance_cursor(state, batch_ids, await get_card_views_async(batch_ids))
+
 # --- STATE MUTATION (Gameplay Updates) ---
 
-def update_session_state(card_id: int, result: str):
+def _answered_event(state: Optional[StudySession], card_id: int, result: str, latency_ms: Optional[int]) -> Optional[Dict]:
+    """Returns: The review event of an answer (None without a session). Buffer it before `record_answer`."""
+    if state is None:
+        return None
+    return review_event(state.user_id, state.active_deck_id, card_id, result, latency_ms)
+
+def update_session_state(card_id: int, result: str, latency_ms: Optional[int] = None):
     """
     Updates the session stats based on user action.
     result: 'KNOW' | 'MISS' | 'DISCARD'
+    latency_ms: Time from the card being shown to the answer.
+    Constant cost: one in-memory transition + one buffered review event, no DB write
+    (see StudySession.apply and review_log_service.py).
+    Raises: ReviewLogFullError (the answer is then not applied either, the user can retry).
     """
-    state: SessionState = app.storage.user.get(SESSION_KEY)
-    if not state: return
-
-    if result == 'KNOW':
-        state['stats']['correct'] += 1
-        state['stats']['combo'] += 1
-        
-    elif result == 'MISS':
-        state['stats']['wrong'] += 1
-        state['stats']['combo'] = 0
-        
-        # Increment mistake count for this card
-        sid = str(card_id)
-        state['stats']['mistakes'][sid] = state['stats']['mistakes'].get(sid, 0) + 1
-        
-        # Move the failed card to the end of the queue so it appears again. There was a weird note here. If something breaks, check the logic.
-        state['queue'].append(card_id)
-        
-    elif result == 'DISCARD':
-        # Just ignore it, stats don't change, card is effectively consumed
-        pass
-
-    app.storage.user[SESSION_KEY] = state
+    state = session_store.get(_current_user_id())
+    event = _answered_event(state, card_id, result, latency_ms)
+    if event is not None:
+        # Event first: the session never counts an answer whose review would be lost
+        review_log.record(event)
+        session_store.record_answer(state.user_id, card_id, result)
+
+async def update_session_state_async(card_id: int, result: str, latency_ms: Optional[int] = None):
+    """Async variant of `update_session_state` (waits off the event loop if the review log is full)."""
+    state = await session_store.get_async(_current_user_id())
+    event = _answered_event(state, card_id, result, latency_ms)
+    if event is not None:
+        await review_log.record_async(event)
+        session_store.record_answer(state.user_id, card_id, result)
+
+def _close_session(user_id: Optional[int]) -> bool:
+    state = session_store.get(user_id)
+    if state:
+        with Session(engine) as session:
+            session.exec(
+                update(ActiveDeck)
+                .where(ActiveDeck.id == state.active_deck_id)
+                .values(
+                    total_sessions_played=ActiveDeck.total_sessions_played + 1,
+                    last_played_at=datetime.now(timezone.utc)
+                )
+            )
+            session.commit()
+        # The run's answers must be durable (and scheduled) once it is reported finished
+        review_log.flush()
+
+    session_store.discard(user_id)
+    return state is not None
 
 def finalize_session() -> bool:
     """
     Called when queue is empty or user quits.
-    Writes the SessionLog to the Database.
+    Counts the played session on its ActiveDeck, flushes the buffered review events and closes it.
+    Returns: True if there was a session to finalize.
     """
-    clear_session()
+    return _close_session(_current_user_id())
 
+async def finalize_session_async() -> bool:
+    """Async variant of `finalize_session`."""
+    # The user is resolved on the event loop (request context); the DB work runs in a thread
+    return await asyncio.to_thread(_close_session, _current_user_id())
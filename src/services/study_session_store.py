@@ -0,0 +1,319 @@
+# src/services/study_session_store.py
+import asyncio
+import json
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy import insert
+from sqlmodel import Session, select, delete, col
+from src.database import engine
+from src.models import StudySessionSnapshot, StudySessionEvent
+from src.schemas import SessionStats
+from src.core.compact_queue import CompactQueue
+from src.core.log_manager import logger
+
+# --- CONSTANTS ---
+FLUSH_INTERVAL_SECONDS = 2.0    # Background write-behind period
+COMPACT_AFTER_EVENTS = 500      # Events replayed on load before a new snapshot is written
+IDLE_EVICT_SECONDS = 30 * 60    # Flushed sessions untouched this long leave memory (reloaded on demand)
+MAX_FLUSH_ATTEMPTS = 5          # A batch that keeps failing is dropped (logged) instead of blocking the rest
+
+EVENT_FETCH = "fetch"
+EVENT_ANSWER = "answer"
+
+class StudySession:
+    """
+    In-memory state of one user's study run.
+    Every mutation goes through `apply`, both live and when replaying the event log.
+    """
+    __slots__ = (
+        "user_id", "active_deck_id", "start_time", "queue", "fetch_index",
+        "correct", "wrong", "combo", "mistakes", "seq", "events_since_snapshot", "last_access",
+    )
+
+    def __init__(self, user_id: int, active_deck_id: int, queue: CompactQueue, start_time: Optional[datetime] = None):
+        self.user_id = user_id
+        self.active_deck_id = active_deck_id
+        self.start_time = start_time or datetime.now(timezone.utc)
+        # Card IDs in study order (seeded, computed on demand); missed cards go to its tail
+        self.queue = queue
+        # Server cursor: how many cards have been dispensed (buffered) to the frontend
+        self.fetch_index = 0
+        self.correct = 0
+        self.wrong = 0
+        self.combo = 0
+        self.mistakes: Dict[int, int] = {}
+        self.seq = 0                        # Last event applied
+        self.events_since_snapshot = 0
+        self.last_access = time.monotonic()
+
+    def apply(self, kind: str, card_id: Optional[int] = None, result: Optional[str] = None, fetch_index: Optional[int] = None):
+        """O(1) state transition for one event."""
+        if kind == EVENT_FETCH:
+            self.fetch_index = fetch_index
+
+        elif kind == EVENT_ANSWER:
+            if result == 'KNOW':
+                self.correct += 1
+                self.combo += 1
+
+            elif result == 'MISS':
+                self.wrong += 1
+                self.combo = 0
+                self.mistakes[card_id] = self.mistakes.get(card_id, 0) + 1
+                # Move the failed card to the end of the queue so it appears again
+                self.queue.append(card_id)
+
+            # 'DISCARD': stats don't change, card is effectively consumed
+
+        self.seq += 1
+        self.events_since_snapshot += 1
+
+    def stats(self) -> SessionStats:
+        return {
+            "correct": self.correct,
+            "wrong": self.wrong,
+            "combo": self.combo,
+            "mistakes": {str(k): v for k, v in self.mistakes.items()},
+        }
+
+    def snapshot_row(self) -> Dict:
+        """Full state as a StudySessionSnapshot row (only at start and on compaction)."""
+        return {
+            "user_id": self.user_id,
+            "active_deck_id": self.active_deck_id,
+            "start_time": self.start_time,
+            "queue_json": json.dumps(self.queue.to_dict(), separators=(",", ":")),
+            "fetch_index": self.fetch_index,
+            "correct": self.correct,
+            "wrong": self.wrong,
+            "combo": self.combo,
+            "mistakes_json": json.dumps(self.mistakes),
+            "event_seq": self.seq,
+            "updated_at": datetime.now(timezone.utc),
+        }
+
+    @classmethod
+    def from_snapshot(cls, row: StudySessionSnapshot) -> "StudySession":
+        queue = CompactQueue.from_dict(json.loads(row.queue_json))
+        session = cls(row.user_id, row.active_deck_id, queue, row.start_time)
+        session.fetch_index = row.fetch_index
+        session.correct = row.correct
+        session.wrong = row.wrong
+        session.combo = row.combo
+        session.mistakes = {int(k): v for k, v in json.loads(row.mistakes_json).items()}
+        session.seq = row.event_seq
+        return session
+
+class StudySessionStore:
+    """
+    Server-side home of the running study sessions (replaces the app.storage.user blob).
+    Reads and writes hit memory; the DB receives the deltas through a write-behind
+    queue flushed by a background thread, so an answer costs O(1) whatever the deck size.
+    """
+
+    def __init__(self):
+        self._sessions: Dict[int, StudySession] = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        # Pending writes in order: ("snapshot", row) | ("event", row) | ("delete", user_id)
+        self._ops: List[Tuple[str, object]] = []
+        self._stop = threading.Event()
+        self._flusher: Optional[threading.Thread] = None
+        self._failed_attempts = 0
+
+    # --- PUBLIC API ---
+
+    def start(self, user_id: int, active_deck_id: int, queue: CompactQueue) -> StudySession:
+        """Replaces the user's session with a fresh one."""
+        session = StudySession(user_id, active_deck_id, queue)
+        with self._lock:
+            self._sessions[user_id] = session
+            self._ops.append(("delete", user_id))
+            self._ops.append(("snapshot", session.snapshot_row()))
+        self._ensure_flusher()
+        return session
+
+    def get(self, user_id: int) -> Optional[StudySession]:
+        """Returns the user's session (loaded from the DB if it was evicted or the server restarted)."""
+        session = self._cached(user_id)
+        if session is not None:
+            return session
+
+        # Not in memory: pending writes must land first so the DB state is current
+        self.flush()
+        loaded = self._load(user_id)
+        if loaded is None:
+            return None
+        with self._lock:
+            # Another request may have loaded/started it meanwhile
+            session = self._sessions.setdefault(user_id, loaded)
+        self._ensure_flusher()
+        return session
+
+    async def get_async(self, user_id: int) -> Optional[StudySession]:
+        """Async variant of `get`: a miss (flush + DB load) runs in a worker thread, not on the event loop."""
+        session = self._cached(user_id)
+        if session is not None:
+            return session
+        return await asyncio.to_thread(self.get, user_id)
+
+    def record_fetch(self, user_id: int, fetch_index: int):
+        self._record(user_id, EVENT_FETCH, fetch_index=fetch_index)
+
+    def record_answer(self, user_id: int, card_id: int, result: str):
+        self._record(user_id, EVENT_ANSWER, card_id=card_id, result=result)
+
+    def discard(self, user_id: int):
+        with self._lock:
+            self._sessions.pop(user_id, None)
+            self._ops.append(("delete", user_id))
+
+    def flush(self):
+        """Writes the pending deltas in one transaction (safe to call from any thread)."""
+        with self._flush_lock:
+            with self._lock:
+                ops, self._ops = self._ops, []
+            if not ops:
+                return
+            try:
+                self._write(ops)
+                self._failed_attempts = 0
+            except Exception as e:
+                self._failed_attempts += 1
+                if self._failed_attempts >= MAX_FLUSH_ATTEMPTS:
+                    logger.error(f"Study session flush failed {self._failed_attempts} times; dropping {len(ops)} pending writes: {e}")
+                    self._failed_attempts = 0
+                    with self._lock:
+                        self._ops[:0] = self._resync_ops(ops)
+                    return
+                logger.error(f"Study session flush failed ({len(ops)} pending writes kept): {e}")
+                with self._lock:
+                    self._ops[:0] = ops
+
+    def shutdown(self):
+        """Stops the background flusher and writes whatever is pending."""
+        self._stop.set()
+        if self._flusher is not None:
+            self._flusher.join(timeout=FLUSH_INTERVAL_SECONDS * 2)
+        self.flush()
+
+    # --- INTERNALS ---
+
+    def _cached(self, user_id: int) -> Optional[StudySession]:
+        """In-memory lookup only (touches the session's idle clock)."""
+        with self._lock:
+            session = self._sessions.get(user_id)
+            if session is not None:
+                session.last_access = time.monotonic()
+            return session
+
+    def _record(self, user_id: int, kind: str, **fields):
+        with self._lock:
+            session = self._sessions.get(user_id)
+            if session is None:
+                return
+            session.apply(kind, **fields)
+            session.last_access = time.monotonic()
+            self._ops.append(("event", {"user_id": user_id, "seq": session.seq, "kind": kind, **fields}))
+
+            if session.events_since_snapshot >= COMPACT_AFTER_EVENTS:
+                self._ops.append(("snapshot", session.snapshot_row()))
+                session.events_since_snapshot = 0
+
+    def _resync_ops(self, dropped: List[Tuple[str, object]]) -> List[Tuple[str, object]]:
+        """
+        Caller holds self._lock. Replaces a dropped batch: later events must never be replayed
+        over a missing or older snapshot. A session still in memory is rewritten in full
+        (delete + snapshot of its current state, which includes the dropped events); for the
+        others only the batch's delete/snapshot ops are kept.
+        """
+        resync: List[Tuple[str, object]] = []
+        rewritten = set()
+        for op, payload in dropped:
+            user_id = payload if op == "delete" else payload["user_id"]
+            session = self._sessions.get(user_id)
+            if session is not None:
+                if user_id not in rewritten:
+                    rewritten.add(user_id)
+                    resync.append(("delete", user_id))
+                    resync.append(("snapshot", session.snapshot_row()))
+                    session.events_since_snapshot = 0
+            elif op != "event":
+                resync.append((op, payload))
+        return resync
+
+    def _write(self, ops: List[Tuple[str, object]]):
+        events: List[Dict] = []
+
+        with Session(engine) as db:
+            def write_events():
+                if events:
+                    db.exec(insert(StudySessionEvent), params=events)
+                    events.clear()
+
+            for op, payload in ops:
+                if op == "event":
+                    events.append({"card_id": None, "result": None, "fetch_index": None, **payload})
+                    continue
+
+                write_events()
+                if op == "snapshot":
+                    db.merge(StudySessionSnapshot(**payload))
+                    db.flush()
+                    # Folded into the snapshot: no longer needed for replay
+                    db.exec(delete(StudySessionEvent).where(
+                        StudySessionEvent.user_id == payload["user_id"],
+                        StudySessionEvent.seq <= payload["event_seq"]
+                    ))
+                elif op == "delete":
+                    db.exec(delete(StudySessionEvent).where(StudySessionEvent.user_id == payload))
+                    db.exec(delete(StudySessionSnapshot).where(StudySessionSnapshot.user_id == payload))
+
+            write_events()
+            db.commit()
+
+    def _load(self, user_id: int) -> Optional[StudySession]:
+        with Session(engine) as db:
+            row = db.get(StudySessionSnapshot, user_id)
+            if row is None:
+                return None
+            session = StudySession.from_snapshot(row)
+            events = db.exec(
+                select(StudySessionEvent)
+                .where(StudySessionEvent.user_id == user_id, StudySessionEvent.seq > row.event_seq)
+                .order_by(col(StudySessionEvent.seq))
+            ).all()
+
+        for event in events:
+            session.apply(event.kind, card_id=event.card_id, result=event.result, fetch_index=event.fetch_index)
+        logger.info(f"Restored study session of User {user_id} ({len(events)} events replayed).")
+        return session
+
+    def _evict_idle(self):
+        cutoff = time.monotonic() - IDLE_EVICT_SECONDS
+        with self._lock:
+            if self._ops:
+                return  # Only evict what is already durable
+            for user_id in [uid for uid, s in self._sessions.items() if s.last_access < cutoff]:
+                del self._sessions[user_id]
+
+    def _ensure_flusher(self):
+        with self._lock:
+            if self._flusher is not None or self._stop.is_set():
+                return
+            self._flusher = threading.Thread(target=self._flush_loop, name="study-session-flusher", daemon=True)
+            self._flusher.start()
+
+    def _flush_loop(self):
+        while not self._stop.wait(FLUSH_INTERVAL_SECONDS):
+            self.flush()
+            self._evict_idle()
+
+# Process-wide store
+session_store = StudySessionStore()
+
+def shutdown_study_sessions():
+    """Shutdown hook: flushes pending study session writes."""
+    session_store.shutdown()